@@ -26,13 +26,96 @@ class Settings(BaseSettings):
     PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "")
     PINECONE_INDEX_NAME: str = "legal-documents"
     
+    # Vector Index
+    VECTOR_STORE: str = "pinecone"  # "pinecone", "local" for the embedded index, or "fake" (in-memory, offline)
+    VECTOR_STORE_PATH: str = "data/vectors"
+    VECTOR_STORE_DTYPE: str = "float32"  # "float32" or "float16"
+    VECTOR_STORE_INDEX: str = "flat"  # "flat" (exact) or "ivf" (approximate)
+    VECTOR_STORE_IVF_LISTS: int = 0  # 0 = sqrt(number of vectors)
+    VECTOR_STORE_IVF_PROBES: int = 8  # Lists scanned per query
+    VECTOR_STORE_IVF_MIN_VECTORS: int = 50000  # Below this, IVF mode still searches exactly
+    VECTOR_STORE_QUANTIZATION: str = "none"  # "none", "int8" or "pq": compressed codes scanned first, then exact rescore
+    VECTOR_STORE_PQ_SUBVECTORS: int = 0  # PQ code bytes per vector; 0 = dimension / 4
+    VECTOR_STORE_RESCORE: int = 0  # Candidates rescored exactly, as a multiple of top_k; 0 = 4 for int8, 16 for pq
+    VECTOR_STORE_POOL_SIZE: int = 8  # Vector index requests in flight at once
+    VECTOR_STORE_BATCH_SIZE: int = 100  # Vectors per upsert request
+    VECTOR_STORE_MAX_RETRIES: int = 5  # Retries of a request that failed transiently
+    HYBRID_SEARCH: bool = True  # Fuse BM25 keyword matches with vector matches
+    LEXICAL_INDEX_PATH: str = "data/lexical.sqlite3"
+    HYBRID_CANDIDATES: int = 50  # Matches taken from each ranker before fusion
+    HYBRID_RRF_K: int = 60  # Reciprocal rank fusion constant
+    DOCUMENT_VECTORS: bool = True  # Store a centroid embedding per document at ingestion
+    TWO_STAGE_SEARCH: bool = False  # Pick documents by centroid first, then search only their chunks
+    TWO_STAGE_DOCUMENTS: int = 5  # Documents kept by the first stage
+    QUERY_CACHE_ENABLED: bool = True
+    QUERY_CACHE_PATH: str = "data/query_cache"
+    QUERY_CACHE_MAX_MB: int = 256
+    QUERY_CACHE_EMBEDDING_TTL_SECONDS: int = 7 * 24 * 3600
+    QUERY_CACHE_RESULT_TTL_SECONDS: int = 3600  # Results are also dropped when the user's documents change
+    QUERY_BATCH_MAX_QUERIES: int = 1000
+    RERANK_ENABLED: bool = True
+    RERANK_CANDIDATES: int = 30  # Matches retrieved for re-ranking before the best top_k are kept
+    RERANK_SCORER: str = "overlap"  # "overlap", or "cross-encoder" (needs sentence-transformers)
+    RERANK_MODEL: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    RERANK_DUPLICATE_THRESHOLD: float = 0.5  # Share of a chunk's shingles already selected that makes it a duplicate
+    RERANK_RETRIEVAL_WEIGHT: float = 1.0  # Weight of the retrieval rank against the scorer's in the fused ranking (0 = scorer only)
+    
     # Document Processing
     MAX_DOCUMENT_SIZE_MB: int = 10
+    UPLOAD_CHUNK_BYTES: int = 1024 * 1024  # Uploads are copied in blocks of this size
     SUPPORTED_DOCUMENT_TYPES: List[str] = ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]
+    CHUNK_SIZE_TOKENS: int = 200
+    CHUNK_OVERLAP_TOKENS: int = 30
+    PDF_EXTRACTION_WORKERS: int = os.cpu_count() or 1
+    PDF_PAGE_BATCH_SIZE: int = 8  # Pages extracted per worker task
+    PDF_EXTRACTION_WINDOW: int = 4  # Page batches in flight at once
+    PDF_MIN_TEXT_CHARS: int = 20  # Below this, an image-covered page is treated as a scan
+    PDF_TABLE_MIN_BLOCKS: int = 8  # Fewest text blocks for a page to be considered a table
+    PDF_ROUTE_CACHE_PATH: str = "data/pdf_routes.sqlite3"
+    INGEST_BATCH_SIZE: int = 100  # Chunks per embedding/upsert batch
+    INGEST_QUEUE_SIZE: int = 4  # Batches buffered between ingestion stages
+    
+    # Background Ingestion
+    UPLOAD_DIR: str = "data/uploads"
+    JOB_DB_PATH: str = "data/jobs.sqlite3"
+    JOB_WORKERS: int = 2
+    JOB_LEASE_SECONDS: int = 60  # A running job is re-claimed if not renewed in time
+    JOB_PROGRESS_INTERVAL: float = 5.0
+    JOB_POLL_INTERVAL: float = 2.0
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_BACKOFF_SECONDS: float = 30.0  # Wait before a failed job's first retry, doubled on each further failure
+    JOB_RETRY_MAX_BACKOFF_SECONDS: float = 600.0
+    CHUNK_STORE_PATH: str = "data/chunks.sqlite3"
     
     # LLM Settings
     DEFAULT_MODEL: str = "gpt-4"
-    EMBEDDING_MODEL: str = "text-embedding-ada-002"
+    LLM_BACKEND: str = "gemini"  # "gemini", or "fake" for offline development
+    LLM_MODEL: str = "gemini-pro"
+    LLM_MAX_CONCURRENCY: int = 8  # Generation requests in flight at once
+    LLM_TIMEOUT_SECONDS: float = 60.0  # Per attempt; for streams, per gap between pieces
+    LLM_MAX_RETRIES: int = 3
+    LLM_CACHE_ENABLED: bool = True  # Cache summaries, clause extractions and document analyses
+    LLM_CACHE_PATH: str = "data/llm_cache.sqlite3"
+    LLM_CACHE_MAX_MB: int = 256
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    SUMMARY_STORE_PATH: str = "data/summaries.sqlite3"
+    SUMMARY_GROUP_TOKENS: int = 4000  # Most tokens summarized in one call
+    SUMMARY_GROUP_CHUNKS: int = 8  # Average chunks per map group
+    SUMMARY_FAN_IN: int = 8  # Average summaries merged per reduce call
+    SUMMARY_MAX_CONCURRENCY: int = 4  # Summaries of one document generated at once
+    CHAT_CONTEXT_TOKENS: int = 4000  # Prompt budget for document chat: excerpts, history and question
+    CHAT_HISTORY_TOKENS: int = 1000  # Most of the budget given to previous turns
+    CHAT_RETRIEVAL_CANDIDATES: int = 20  # Chunks retrieved per turn to fill the budget from
+    CHAT_TOKENIZER: str = "cl100k_base"  # tiktoken encoding used to count prompt tokens
+    EMBEDDING_MODEL: str = "models/embedding-001"
+    EMBEDDING_DIMENSION: int = 768
+    EMBEDDING_BACKEND: str = "gemini"  # "gemini", or "fake" for offline development
+    EMBEDDING_BATCH_SIZE: int = 100  # Texts per batch embedding request
+    EMBEDDING_MAX_CONCURRENCY: int = 4  # Batch requests in flight at once
+    EMBEDDING_MAX_RETRIES: int = 5
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "data/embedding_cache.sqlite3"
+    EMBEDDING_CACHE_MAX_MB: int = 1024
     
     class Config:
         case_sensitive = True
@@ -0,0 +1,227 @@
+from typing import Dict, Iterable, List, Optional
+import os
+import sqlite3
+import threading
+import time
+from .metrics import metrics
+
+
+class DiskCache:
+    """Persistent key/value cache in a SQLite file with LRU eviction.
+
+    The store is bounded by total value size (and optionally entry count); when
+    a write pushes it over the limit, the least recently read entries are
+    evicted. Entries can also carry a TTL. Because it lives in a WAL-mode SQLite
+    file, every uvicorn worker on the host shares the same cache.
+
+    The entry count and total size are kept in a `state` table, updated in the
+    same transaction as every write, so checking the budget costs a lookup
+    rather than a scan. Expired entries still count towards the budget until
+    the next eviction removes them.
+
+    Hits and misses are counted in the metrics registry as `<name>.hits` and
+    `<name>.misses`.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        name: str,
+        max_bytes: int,
+        max_entries: Optional[int] = None,
+        ttl_seconds: Optional[float] = None
+    ):
+        self.path = path
+        self.name = name
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                expires_at REAL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_expires_at ON entries (expires_at)")
+        conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        # Caches created before the totals were kept start from a count of their entries
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM state WHERE key = 'entries'").fetchone() is None:
+                entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+                self._set_state(conn, "entries", entries)
+                self._set_state(conn, "bytes", size)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; callers typically run in asyncio.to_thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _state(conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _set_state(conn: sqlite3.Connection, key: str, value: int):
+        conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    @staticmethod
+    def _add_to_totals(conn: sqlite3.Connection, entries: int, size: int):
+        conn.execute("UPDATE state SET value = value + ? WHERE key = 'entries'", (entries,))
+        conn.execute("UPDATE state SET value = value + ? WHERE key = 'bytes'", (size,))
+
+    @staticmethod
+    def _sizes(conn: sqlite3.Connection, keys: List[str]) -> Dict[str, int]:
+        """Sizes of whichever of `keys` are stored, expired or not."""
+        sizes: Dict[str, int] = {}
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            sizes.update(conn.execute(f"SELECT key, size FROM entries WHERE key IN ({placeholders})", batch).fetchall())
+        return sizes
+
+    def _over_budget(self, stats: Dict[str, int]) -> bool:
+        return stats["bytes"] > self.max_bytes or bool(self.max_entries and stats["entries"] > self.max_entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the cached value for `key`, or None."""
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        """Return the cached values for whichever of `keys` are present."""
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, bytes] = {}
+        if not keys:
+            return found
+        conn = self._conn()
+        now = time.time()
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT key, value FROM entries WHERE key IN ({placeholders}) AND (expires_at IS NULL OR expires_at > ?)",
+                (*batch, now)
+            ).fetchall()
+            found.update(rows)
+        if found:
+            conn.executemany("UPDATE entries SET last_access = ? WHERE key = ?", [(now, key) for key in found])
+        metrics.increment(f"{self.name}.hits", len(found))
+        metrics.increment(f"{self.name}.misses", len(keys) - len(found))
+        return found
+
+    def set(self, key: str, value: bytes, ttl_seconds: Optional[float] = None):
+        """Store a value, replacing any existing entry."""
+        self.set_many({key: value}, ttl_seconds)
+
+    def set_many(self, items: Dict[str, bytes], ttl_seconds: Optional[float] = None):
+        """Store several values in one transaction, then evict if that put the cache over budget."""
+        if not items:
+            return
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        conn = self._conn()
+        # IMMEDIATE, so another worker cannot change an entry between reading its old size and replacing it
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            replaced = self._sizes(conn, list(items))
+            conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access, expires_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, value, len(value), now, expires_at) for key, value in items.items()]
+            )
+            self._add_to_totals(
+                conn,
+                len(items) - len(replaced),
+                sum(len(value) for value in items.values()) - sum(replaced.values())
+            )
+            stats = {"entries": self._state(conn, "entries"), "bytes": self._state(conn, "bytes")}
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if self._over_budget(stats):
+            self._evict()
+
+    def delete(self, key: str):
+        """Remove an entry if present."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            size = self._sizes(conn, [key]).get(key)
+            if size is not None:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._add_to_totals(conn, -1, -size)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        """Remove every entry."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entries")
+            self._set_state(conn, "entries", 0)
+            self._set_state(conn, "bytes", 0)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of entries and total bytes stored."""
+        conn = self._conn()
+        return {"entries": self._state(conn, "entries"), "bytes": self._state(conn, "bytes")}
+
+    def _evict(self):
+        """Drop expired entries, then least recently used ones until within budget."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            expired, expired_size = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE expires_at <= ?", (now,)
+            ).fetchone()
+            if expired:
+                conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+                self._add_to_totals(conn, -expired, -expired_size)
+            # Another worker may have evicted since the write that got us here
+            stats = self.stats()
+            over_bytes = stats["bytes"] - self.max_bytes
+            over_entries = stats["entries"] - self.max_entries if self.max_entries else 0
+            victims = []
+            if over_bytes > 0 or over_entries > 0:
+                # Evict down to 90% of the budget so we don't evict on every write
+                target_bytes = stats["bytes"] - self.max_bytes * 0.9 if over_bytes > 0 else 0
+                target_entries = over_entries + (self.max_entries // 10 if self.max_entries else 0) if over_entries > 0 else 0
+                freed_bytes = 0
+                for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+                    if freed_bytes >= target_bytes and len(victims) >= target_entries:
+                        break
+                    victims.append((key,))
+                    freed_bytes += size
+                conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                self._add_to_totals(conn, -len(victims), -freed_bytes)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        metrics.increment(f"{self.name}.evictions", len(victims))
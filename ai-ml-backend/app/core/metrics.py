@@ -0,0 +1,52 @@
+from typing import Dict, Any
+from collections import defaultdict, deque
+import threading
+
+
+class Metrics:
+    """Process-local counters and timings, exposed at GET /health/metrics."""
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._max_samples = max_samples
+        self._counters: Dict[str, float] = defaultdict(float)
+        self._timings: Dict[str, Dict[str, Any]] = {}
+
+    def increment(self, name: str, value: float = 1):
+        """Add `value` to a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def observe(self, name: str, seconds: float):
+        """Record one duration sample."""
+        with self._lock:
+            timing = self._timings.get(name)
+            if timing is None:
+                timing = self._timings[name] = {"count": 0, "total": 0.0, "max": 0.0, "samples": deque(maxlen=self._max_samples)}
+            timing["count"] += 1
+            timing["total"] += seconds
+            timing["max"] = max(timing["max"], seconds)
+            timing["samples"].append(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return all counters, and count/mean/percentiles for every timing."""
+        with self._lock:
+            timings = {}
+            for name, timing in self._timings.items():
+                samples = sorted(timing["samples"])
+                timings[name] = {
+                    "count": timing["count"],
+                    "mean": timing["total"] / timing["count"],
+                    "p50": self._percentile(samples, 0.50),
+                    "p95": self._percentile(samples, 0.95),
+                    "p99": self._percentile(samples, 0.99),
+                    "max": timing["max"]
+                }
+            return {"counters": dict(self._counters), "timings": timings}
+
+    @staticmethod
+    def _percentile(samples, fraction: float) -> float:
+        return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+
+metrics = Metrics()
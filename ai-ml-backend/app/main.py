@@ -4,9 +4,10 @@ from fastapi.security import OAuth2PasswordBearer
 from typing import List, Optional
 import uvicorn
 
-from .routers import documents, auth, health
+from .routers import documents, auth, health, chat
 from .core.config import settings
 from .core.security import verify_token
+from .core.limits import BodySizeLimitMiddleware
 
 app = FastAPI(
     title="AI Legal Assistant API",
@@ -23,10 +24,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Refuse oversized uploads while they stream in (with slack for the other form fields)
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    max_bytes=settings.MAX_DOCUMENT_SIZE_MB * 1024 * 1024 + 64 * 1024,
+    paths=["/documents/upload"],
+)
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Authentication"])
 app.include_router(documents.router, prefix="/documents", tags=["Documents"])
 app.include_router(health.router, prefix="/health", tags=["Health"])
+app.include_router(chat.router, prefix="/chat", tags=["Chat"])
+
+@app.on_event("startup")
+async def start_ingestion_workers():
+    documents.worker_pool.start()
+
+@app.on_event("shutdown")
+async def stop_ingestion_workers():
+    await documents.worker_pool.stop()
 
 @app.get("/")
 async def root():
@@ -1,34 +1,75 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional
+from fastapi.responses import StreamingResponse
+from typing import Dict, List, Optional
 from pydantic import BaseModel
-from app.services.chat_service import ChatService
-from app.dependencies import get_current_user
-from app.models.user import User
+import asyncio
+from contextlib import aclosing
+from ..core.security import verify_token
+from ..services.chat_service import ChatService
+from ..services.gemini_service import GeminiService
+from ..services.llm_streaming import sse_event, SSE_HEADERS
+from .documents import chunk_store, embeddings_service
 
 router = APIRouter()
-chat_service = ChatService()
+# Shares the documents router's stores, so chat retrieves from the same index ingestion writes to
+chat_service = ChatService(chunk_store, embeddings_service)
+gemini_service = GeminiService()
 
 class ChatRequest(BaseModel):
     message: str
     document_id: str
     session_id: Optional[str] = None
+    stream: bool = False
 
 class ChatResponse(BaseModel):
     response: str
     session_id: str
     document_id: str
+    usage: Optional[Dict[str, int]] = None
 
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
-    current_user: User = Depends(get_current_user)
+    token: dict = Depends(verify_token)
 ):
     """
     Chat with the AI assistant about a specific document
+
+    The prompt holds the document excerpts most relevant to the message, not
+    the whole document; `usage` reports its token count and the tokens saved
+    against sending the full text.
+
+    With `stream` set, the response is a Server-Sent Events stream of `token`
+    events, then `done` with the usage (or `error`); the exchange is added to
+    the chat history once the response is complete.
     """
     try:
+        document = await asyncio.to_thread(chat_service.chunk_store.get_document, request.document_id)
+        if not document or document["user_id"] != token.get("sub"):
+            raise HTTPException(status_code=404, detail="Document not found")
+
         # Start new session if not provided
-        session_id = request.session_id or await chat_service.start_chat(request.document_id)
+        if request.session_id and not chat_service.owns_session(request.session_id, token.get("sub"), request.document_id):
+            raise HTTPException(status_code=404, detail="Chat session not found")
+        session_id = request.session_id or await chat_service.start_chat(request.document_id, token.get("sub"))
+
+        if request.stream:
+            async def events():
+                usage = {}
+                try:
+                    async with aclosing(chat_service.stream_chat_with_document(
+                        session_id=session_id,
+                        message=request.message,
+                        document_id=request.document_id,
+                        usage=usage
+                    )) as reply:
+                        async for text in reply:
+                            yield sse_event("token", {"text": text})
+                    yield sse_event("done", {"session_id": session_id, "document_id": request.document_id, "usage": usage})
+                except Exception as e:
+                    yield sse_event("error", {"detail": f"Failed to process chat: {str(e)}"})
+
+            return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
         
         # Get response from chat service
         response = await chat_service.chat_with_document(
@@ -38,6 +79,8 @@ async def chat(
         )
         
         return ChatResponse(**response)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -47,11 +90,13 @@ class ChatHistoryResponse(BaseModel):
 @router.get("/history/{session_id}", response_model=ChatHistoryResponse)
 async def get_chat_history(
     session_id: str,
-    current_user: User = Depends(get_current_user)
+    token: dict = Depends(verify_token)
 ):
     """
     Get chat history for a session
     """
+    if not chat_service.owns_session(session_id, token.get("sub")):
+        raise HTTPException(status_code=404, detail="Chat session not found")
     try:
         history = await chat_service.get_chat_history(session_id)
         return ChatHistoryResponse(messages=history)
@@ -61,25 +106,31 @@ async def get_chat_history(
 @router.delete("/history/{session_id}")
 async def clear_chat_history(
     session_id: str,
-    current_user: User = Depends(get_current_user)
+    token: dict = Depends(verify_token)
 ):
     """
     Clear chat history for a session
     """
+    if not chat_service.owns_session(session_id, token.get("sub")):
+        raise HTTPException(status_code=404, detail="Chat session not found")
     try:
         await chat_service.clear_chat_history(session_id)
         return {"message": "Chat history cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class AnalysisResponse(BaseModel):
+    response: str
+
 class DocumentAnalysisRequest(BaseModel):
     document_content: str
     question: str
+    bypass_cache: bool = False
 
-@router.post("/analyze", response_model=ChatResponse)
+@router.post("/analyze", response_model=AnalysisResponse)
 async def analyze_document(
     request: DocumentAnalysisRequest,
-    current_user: User = Depends(get_current_user)
+    token: dict = Depends(verify_token)
 ):
     """
     Analyze a document and answer questions about it
@@ -87,27 +138,30 @@ async def analyze_document(
     try:
         response = await gemini_service.analyze_document(
             document_content=request.document_content,
-            question=request.question
+            question=request.question,
+            bypass_cache=request.bypass_cache
         )
-        return ChatResponse(response=response)
+        return AnalysisResponse(response=response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 class SummaryRequest(BaseModel):
     document_content: str
+    bypass_cache: bool = False
 
-@router.post("/summarize", response_model=ChatResponse)
+@router.post("/summarize", response_model=AnalysisResponse)
 async def summarize_document(
     request: SummaryRequest,
-    current_user: User = Depends(get_current_user)
+    token: dict = Depends(verify_token)
 ):
     """
     Generate a summary of the document
     """
     try:
         response = await gemini_service.summarize_document(
-            document_content=request.document_content
+            document_content=request.document_content,
+            bypass_cache=request.bypass_cache
         )
-        return ChatResponse(response=response)
+        return AnalysisResponse(response=response)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,16 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from typing import List, Optional
 from ..core.security import verify_token
-from ..services.document_processor import DocumentProcessor
+from ..services.document_processor import DocumentProcessor, DocumentTooLargeError
 from ..services.embeddings import EmbeddingsService
 from ..services.llm import LLMService
+from ..services.ingestion import IngestionPipeline
+from ..services.job_queue import JobStore, IngestionWorkerPool
+from ..services.chunk_store import ChunkStore
+from ..services.reranker import Reranker, create_scorer
+from ..services.summarizer import HierarchicalSummarizer
+from ..services.summary_store import SummaryStore
+from ..services.tokenizer import Tokenizer
+from ..services.llm_streaming import sse_event, SSE_HEADERS
+from ..core.config import settings
+from pathlib import Path
+from contextlib import aclosing
+from datetime import datetime
+import asyncio
+import json
+import time
 import uuid
-import os
 
 router = APIRouter()
 document_processor = DocumentProcessor()
-embeddings_service = EmbeddingsService()
+chunk_store = ChunkStore(settings.CHUNK_STORE_PATH)
+embeddings_service = EmbeddingsService(chunk_store)
 llm_service = LLMService()
+summary_store = SummaryStore(settings.SUMMARY_STORE_PATH)
+summarizer = HierarchicalSummarizer(
+    llm_service.gateway,
+    chunk_store,
+    summary_store,
+    Tokenizer(settings.CHAT_TOKENIZER),
+    group_tokens=settings.SUMMARY_GROUP_TOKENS,
+    group_chunks=settings.SUMMARY_GROUP_CHUNKS,
+    fan_in=settings.SUMMARY_FAN_IN,
+    max_concurrency=settings.SUMMARY_MAX_CONCURRENCY
+)
+ingestion_pipeline = IngestionPipeline(document_processor, embeddings_service, chunk_store)
+job_store = JobStore(settings.JOB_DB_PATH)
+worker_pool = IngestionWorkerPool(job_store, ingestion_pipeline)
+reranker = Reranker(
+    create_scorer(settings.RERANK_SCORER, settings.RERANK_MODEL),
+    duplicate_threshold=settings.RERANK_DUPLICATE_THRESHOLD,
+    retrieval_weight=settings.RERANK_RETRIEVAL_WEIGHT,
+    k=settings.HYBRID_RRF_K
+) if settings.RERANK_ENABLED else None
 
 @router.post("/upload")
 async def upload_document(
@@ -18,56 +55,133 @@ async def upload_document(
     metadata: Optional[str] = Form(None),
     token: dict = Depends(verify_token)
 ):
-    """Upload and process a legal document."""
+    """Upload a legal document and queue it for background processing."""
     try:
         # Validate file type
         if file.content_type not in ["application/pdf", "application/vnd.openxmlformats-officedocument.wordprocessingml.document"]:
             raise HTTPException(status_code=400, detail="Unsupported file type")
         
-        # Save file temporarily
-        file_path = document_processor.save_uploaded_file(await file.read(), file.filename)
+        max_bytes = settings.MAX_DOCUMENT_SIZE_MB * 1024 * 1024
+        if file.size is not None and file.size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Document exceeds the {settings.MAX_DOCUMENT_SIZE_MB} MB limit")
         
-        # Process document
-        chunks = document_processor.process_document(file_path)
+        # Stream the upload into its own file, kept until a worker has finished ingesting it
+        try:
+            file_path = await asyncio.to_thread(
+                document_processor.save_upload,
+                file.file,
+                Path(file.filename).suffix.lower(),
+                settings.UPLOAD_DIR,
+                max_bytes
+            )
+        except DocumentTooLargeError as e:
+            raise HTTPException(status_code=413, detail=str(e))
         
-        # Generate document ID
-        document_id = str(uuid.uuid4())
+        # Re-uploading a file updates the existing document incrementally
+        user_id = token.get("sub")
+        existing = await asyncio.to_thread(chunk_store.find_document, user_id, file.filename)
+        document_id = existing["document_id"] if existing else str(uuid.uuid4())
+        await asyncio.to_thread(chunk_store.save_document, document_id, user_id, file.filename)
         
-        # Store embeddings
-        vector_ids = await embeddings_service.store_embeddings(
-            document_id=document_id,
-            chunks=chunks,
-            metadata={"filename": file.filename, "metadata": metadata}
+        # Queue parsing, embedding and storage
+        job_id = await asyncio.to_thread(
+            job_store.create_job,
+            document_id,
+            file_path,
+            {"filename": file.filename, "metadata": metadata, "user_id": user_id, "uploaded_at": time.time()}
         )
-        
-        # Clean up temporary file
-        os.remove(file_path)
+        worker_pool.notify()
         
         return {
+            "job_id": job_id,
             "document_id": document_id,
-            "chunks": len(chunks),
-            "vector_ids": vector_ids
+            "status": "queued",
+            "incremental": existing is not None
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/jobs/{job_id}")
+async def get_job_status(
+    job_id: str,
+    token: dict = Depends(verify_token)
+):
+    """Get the status and per-stage progress of an ingestion job."""
+    job = await asyncio.to_thread(job_store.get_job, job_id)
+    # Other users' jobs look the same as missing ones
+    if not job or job["metadata"].get("user_id") != token.get("sub"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    return {
+        "job_id": job["id"],
+        "document_id": job["document_id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"]
+    }
+
 @router.post("/query")
 async def query_documents(
     query: str,
     top_k: int = 5,
+    document_id: Optional[str] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    stream: bool = False,
     token: dict = Depends(verify_token)
 ):
-    """Query documents using semantic search and get AI-generated answers."""
+    """Query documents using semantic search and get AI-generated answers.
+    
+    Only the caller's documents are searched, optionally narrowed to one
+    document and to documents uploaded between `date_from` and `date_to`.
+    With re-ranking enabled, more candidates are retrieved and only the
+    `top_k` best distinct chunks are sent to the LLM.
+    
+    With `stream=true` the response is a Server-Sent Events stream: one
+    `sources` event with the retrieved chunks, `token` events with the answer
+    text as it is generated, then `done` (or `error`).
+    """
     try:
         # Search for relevant chunks
-        results = await embeddings_service.search_similar(query, top_k=top_k)
+        results = await embeddings_service.search_similar(
+            query,
+            top_k=max(top_k, settings.RERANK_CANDIDATES) if reranker else top_k,
+            user_id=token.get("sub"),
+            document_id=document_id,
+            date_from=date_from.timestamp() if date_from else None,
+            date_to=date_to.timestamp() if date_to else None
+        )
         
-        if not results:
+        if not results and not stream:
             return {"answer": "No relevant documents found.", "sources": []}
+        if results and reranker:
+            results = await asyncio.to_thread(reranker.rerank, query, results, top_k)
         
         # Get context from results
         context = [result["text"] for result in results]
         
+        if stream:
+            async def events():
+                yield sse_event("sources", {"sources": context, "metadata": [result["metadata"] for result in results]})
+                if not context:
+                    yield sse_event("token", {"text": "No relevant documents found."})
+                    yield sse_event("done", {})
+                    return
+                try:
+                    async with aclosing(llm_service.stream_answer(query, context)) as answer:
+                        async for text in answer:
+                            yield sse_event("token", {"text": text})
+                    yield sse_event("done", {})
+                except Exception as e:
+                    yield sse_event("error", {"detail": f"Failed to answer question: {str(e)}"})
+            
+            return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+        
         # Generate answer using LLM
         answer = await llm_service.answer_question(query, context)
         
@@ -79,34 +193,90 @@ async def query_documents(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchQueryRequest(BaseModel):
+    queries: List[str]
+    top_k: int = 5
+    document_id: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+@router.post("/query/batch")
+async def query_documents_batch(
+    request: BatchQueryRequest,
+    token: dict = Depends(verify_token)
+):
+    """Run many semantic searches in one request.
+    
+    Returns newline-delimited JSON, one {"index", "query", "results"} line per
+    question, streamed in completion order. Only retrieval is done; no
+    answers are generated.
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if len(request.queries) > settings.QUERY_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.QUERY_BATCH_MAX_QUERIES} queries per batch")
+    
+    async def lines():
+        try:
+            async for position, results in embeddings_service.search_batch(
+                request.queries,
+                top_k=request.top_k,
+                user_id=token.get("sub"),
+                document_id=request.document_id,
+                date_from=request.date_from.timestamp() if request.date_from else None,
+                date_to=request.date_to.timestamp() if request.date_to else None
+            ):
+                yield json.dumps({"index": position, "query": request.queries[position], "results": results}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": str(e)}) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.post("/summary/{document_id}")
 async def summarize_document(
     document_id: str,
+    bypass_cache: bool = False,
     token: dict = Depends(verify_token)
 ):
-    """Generate a summary of a document."""
+    """Generate a summary of a document.
+    
+    Long documents are summarized section by section, and the section
+    summaries merged in a tree. Every node is stored, so after the document
+    is updated only the changed sections and the merges above them are
+    generated again. `bypass_cache` regenerates every node.
+    """
     try:
-        # Get document chunks from vector store
-        results = embeddings_service.index.query(
-            vector=[0] * 1536,  # Dummy vector
-            filter={"document_id": document_id},
-            top_k=100,
-            include_metadata=True
-        )
-        
-        if not results.matches:
-            raise HTTPException(status_code=404, detail="Document not found")
+        await _owned_document(document_id, token)
         
-        # Combine chunks
-        text = "\n\n".join([match.metadata["text"] for match in results.matches])
-        
-        # Generate summary
-        summary = await llm_service.generate_summary(text)
-        
-        return {"summary": summary}
+        return await summarizer.summarize(document_id, refresh=bypass_cache)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{document_id}/export")
+async def export_document(
+    document_id: str,
+    token: dict = Depends(verify_token)
+):
+    """Stream a document's chunks, in order, as newline-delimited JSON."""
+    await _owned_document(document_id, token)
+    
+    def lines():
+        for chunk in chunk_store.iter_chunks(document_id):
+            yield json.dumps(chunk) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def _owned_document(document_id: str, token: dict) -> dict:
+    """Return the caller's document record, or raise 404."""
+    document = await asyncio.to_thread(chunk_store.get_document, document_id)
+    if not document or document["user_id"] != token.get("sub"):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return document
+
 @router.delete("/{document_id}")
 async def delete_document(
     document_id: str,
@@ -114,7 +284,16 @@ async def delete_document(
 ):
     """Delete a document and its embeddings."""
     try:
-        embeddings_service.delete_document(document_id)
+        user_id = token.get("sub")
+        document = await asyncio.to_thread(chunk_store.get_document, document_id)
+        if document and document["user_id"] != user_id:
+            raise HTTPException(status_code=404, detail="Document not found")
+        
+        await embeddings_service.delete_document(document_id, user_id)
+        await asyncio.to_thread(chunk_store.delete_document, document_id)
+        await asyncio.to_thread(summary_store.delete_document, document_id)
         return {"message": "Document deleted successfully"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) 
\ No newline at end of file
@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from ..services.embeddings import EmbeddingsService
 from ..services.gemini_service import GeminiService
+from ..core.metrics import metrics
 
 router = APIRouter()
 embeddings_service = EmbeddingsService()
@@ -10,12 +11,12 @@ gemini_service = GeminiService()
 async def health_check():
     """Check the health of the service and its dependencies."""
     try:
-        # Check Pinecone connection
-        pinecone_status = "healthy"
+        # Check the vector index
+        vector_store_status = "healthy"
         try:
-            embeddings_service.index.describe_index_stats()
+            await embeddings_service.vector_client.describe()
         except Exception as e:
-            pinecone_status = f"unhealthy: {str(e)}"
+            vector_store_status = f"unhealthy: {str(e)}"
         
         # Check Gemini connection
         gemini_status = "healthy"
@@ -27,7 +28,7 @@ async def health_check():
         return {
             "status": "healthy",
             "components": {
-                "pinecone": pinecone_status,
+                "vector_store": vector_store_status,
                 "gemini": gemini_status
             }
         }
@@ -35,4 +36,9 @@ async def health_check():
         return {
             "status": "unhealthy",
             "error": str(e)
-        } 
\ No newline at end of file
+        } 
+
+@router.get("/metrics")
+async def get_metrics():
+    """Counters and timings collected by this server process."""
+    return metrics.snapshot()
\ No newline at end of file
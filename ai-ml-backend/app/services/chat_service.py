@@ -1,20 +1,49 @@
-from typing import List, Dict, Any, Optional
-import google.generativeai as genai
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
+import asyncio
+import uuid
+from contextlib import aclosing
 from ..core.config import settings
-from .document_service import DocumentService
+from ..core.metrics import metrics
+from .chunk_store import ChunkStore
+from .embeddings import EmbeddingsService
+from .llm_gateway import LLMGateway, get_llm_gateway
+from .tokenizer import Tokenizer
 
 class ChatService:
-    def __init__(self):
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.document_service = DocumentService()
+    def __init__(
+        self,
+        chunk_store: Optional[ChunkStore] = None,
+        embeddings_service: Optional[EmbeddingsService] = None,
+        gateway: Optional[LLMGateway] = None,
+        tokenizer: Optional[Tokenizer] = None
+    ):
+        self.gateway = gateway or get_llm_gateway()
+        self.chunk_store = chunk_store or ChunkStore(settings.CHUNK_STORE_PATH)
+        self.embeddings_service = embeddings_service or EmbeddingsService(self.chunk_store)
+        self.tokenizer = tokenizer or Tokenizer(settings.CHAT_TOKENIZER)
         self.chat_sessions: Dict[str, List[Dict]] = {}  # Store chat history
+        # (user_id, document_id) each session belongs to
+        self.session_owners: Dict[str, Tuple[str, str]] = {}
+        # Token count of each document's full text, keyed by (document_id, updated_at)
+        self._document_tokens: Dict[Tuple[str, str], int] = {}
     
-    async def start_chat(self, document_id: str) -> str:
-        """Start a new chat session for a document."""
-        session_id = f"chat_{document_id}"
+    async def start_chat(self, document_id: str, user_id: str) -> str:
+        """Start a new chat session for a user and one of their documents.
+
+        Session IDs are random, so starting a session never touches another
+        one, and a session can only be used by the user who started it.
+        """
+        session_id = f"chat_{uuid.uuid4().hex}"
         self.chat_sessions[session_id] = []
+        self.session_owners[session_id] = (user_id, document_id)
         return session_id
+
+    def owns_session(self, session_id: str, user_id: str, document_id: Optional[str] = None) -> bool:
+        """Whether a session exists, belongs to `user_id` and (if given) is about `document_id`."""
+        owner = self.session_owners.get(session_id)
+        if owner is None or owner[0] != user_id:
+            return False
+        return document_id is None or owner[1] == document_id
     
     async def chat_with_document(
         self,
@@ -24,37 +53,139 @@ class ChatService:
     ) -> Dict[str, Any]:
         """Chat about a specific document."""
         try:
-            # Get document content
-            document = await self.document_service.get_document(document_id)
-            if not document:
-                raise ValueError("Document not found")
-            
-            # Prepare context with document content
-            context = f"""Document: {document['filename']}
-Content:
-{document['content']}
-
-Previous conversation:
-{self._format_chat_history(session_id)}"""
+            prompt, usage = await self._build_prompt(session_id, message, document_id)
             
             # Generate response
-            prompt = f"{context}\n\nUser: {message}"
-            response = self.model.generate_content(prompt)
+            response = await self.gateway.generate(prompt, "chat")
             
             # Store in chat history
-            self.chat_sessions[session_id].extend([
-                {"role": "user", "content": message},
-                {"role": "assistant", "content": response.text}
-            ])
+            self._save_exchange(session_id, message, response)
             
             return {
-                "response": response.text,
+                "response": response,
                 "document_id": document_id,
-                "session_id": session_id
+                "session_id": session_id,
+                "usage": usage
             }
         except Exception as e:
             raise Exception(f"Failed to process chat: {str(e)}")
     
+    async def stream_chat_with_document(
+        self,
+        session_id: str,
+        message: str,
+        document_id: str,
+        usage: Optional[Dict[str, int]] = None
+    ) -> AsyncIterator[str]:
+        """Chat about a specific document, yielding the response text as it is generated.
+        
+        The exchange is added to the chat history only once the whole response
+        has been generated; an abandoned or failed stream leaves no half answer.
+        The prompt's token usage is copied into `usage`, if given, before the
+        first piece of text.
+        """
+        prompt, prompt_usage = await self._build_prompt(session_id, message, document_id)
+        if usage is not None:
+            usage.update(prompt_usage)
+        parts = []
+        async with aclosing(self.gateway.stream(prompt, "chat")) as stream:
+            async for text in stream:
+                parts.append(text)
+                yield text
+        self._save_exchange(session_id, message, "".join(parts))
+    
+    async def _build_prompt(self, session_id: str, message: str, document_id: str) -> Tuple[str, Dict[str, int]]:
+        """Prompt with the document excerpts most relevant to `message` and the recent conversation.
+        
+        The prompt is kept within CHAT_CONTEXT_TOKENS: the question always goes
+        in, then as much recent history as fits in CHAT_HISTORY_TOKENS, newest
+        first, then the best of CHAT_RETRIEVAL_CANDIDATES retrieved chunks for
+        whatever budget is left, shown in document order. Returns the prompt
+        and its token usage, including the tokens the whole-document prompt
+        used before would have taken.
+        """
+        document = await asyncio.to_thread(self.chunk_store.get_document, document_id)
+        if not document:
+            raise ValueError("Document not found")
+        results, document_tokens = await asyncio.gather(
+            self.embeddings_service.search_similar(
+                message,
+                top_k=settings.CHAT_RETRIEVAL_CANDIDATES,
+                user_id=document["user_id"],
+                document_id=document_id
+            ),
+            self._count_document_tokens(document)
+        )
+        
+        count = self.tokenizer.count
+        question = f"User: {message}"
+        header = f"Document: {document['filename']}\nRelevant excerpts:\n"
+        separator = count("\n\n")
+        used = count(header) + separator + count("Previous conversation:\n") + separator + count(question)
+        
+        # Most recent history first, while it fits
+        history = self.chat_sessions.get(session_id, [])
+        history_budget = min(settings.CHAT_HISTORY_TOKENS, settings.CHAT_CONTEXT_TOKENS - used)
+        turns: List[str] = []
+        for msg in reversed(history):
+            turn = f"{msg['role']}: {msg['content']}"
+            tokens = count(turn) + 1
+            if tokens > history_budget:
+                break
+            turns.insert(0, turn)
+            history_budget -= tokens
+            used += tokens
+        
+        # Then the most relevant chunks, skipping any too long for what is left
+        excerpts: List[Dict[str, Any]] = []
+        for result, tokens in zip(results, self.tokenizer.count_many([result["text"] for result in results])):
+            if used + tokens + separator <= settings.CHAT_CONTEXT_TOKENS:
+                excerpts.append(result)
+                used += tokens + separator
+        excerpts.sort(key=lambda result: result["metadata"].get("chunk_index", 0))
+        
+        prompt = (
+            header
+            + "\n\n".join(result["text"] for result in excerpts)
+            + "\n\nPrevious conversation:\n"
+            + "\n".join(turns)
+            + f"\n\n{question}"
+        )
+        prompt_tokens = count(prompt)
+        full_document_tokens = (
+            document_tokens
+            + count(f"Document: {document['filename']}\nContent:\n\n\nPrevious conversation:\n{self._format_chat_history(session_id)}\n\n{question}")
+        )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "full_document_tokens": full_document_tokens,
+            "saved_tokens": max(full_document_tokens - prompt_tokens, 0),
+            "chunks": len(excerpts)
+        }
+        metrics.increment("chat.prompt_tokens", usage["prompt_tokens"])
+        metrics.increment("chat.prompt_tokens_saved", usage["saved_tokens"])
+        return prompt, usage
+    
+    async def _count_document_tokens(self, document: Dict[str, Any]) -> int:
+        """Tokens in a document's full text, counted once per version of the document."""
+        key = (document["document_id"], document["updated_at"])
+        if key not in self._document_tokens:
+            def count() -> int:
+                total = 0
+                separator = self.tokenizer.count("\n\n")
+                for chunk in self.chunk_store.iter_chunks(document["document_id"]):
+                    total += self.tokenizer.count(chunk["text"]) + separator
+                return total
+            self._document_tokens[key] = await asyncio.to_thread(count)
+        return self._document_tokens[key]
+    
+    def _save_exchange(self, session_id: str, message: str, response: str):
+        """Append a user message and the assistant's response to the chat history."""
+        self.chat_sessions.setdefault(session_id, []).extend([
+            {"role": "user", "content": message},
+            {"role": "assistant", "content": response}
+        ])
+    
     def _format_chat_history(self, session_id: str) -> str:
         """Format chat history for context."""
         history = self.chat_sessions.get(session_id, [])
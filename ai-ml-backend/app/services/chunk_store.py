@@ -0,0 +1,304 @@
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+import numpy as np
+from datetime import datetime
+from .embedding_cache import EmbeddingCache
+
+# Preset dictionary for chunk text compression. Chunks are a few hundred words
+# each, too short for zlib to learn much from the chunk itself, so phrases
+# common in contracts are supplied up front (most common last, as zlib prefers)
+TEXT_DICTIONARY = (
+    "notwithstanding anything to the contrary contained herein, without prejudice to "
+    "in accordance with the provisions of this Agreement, subject to the terms and conditions "
+    "the Company, the Tenant, the Landlord, the Licensee, the Licensor, the Contractor, the Supplier "
+    "including but not limited to, reasonable endeavours, reasonable notice in writing "
+    "indemnify and hold harmless against all losses, damages, liabilities, costs and expenses "
+    "confidential information, intellectual property rights, force majeure event "
+    "the Effective Date, the Commencement Date, the Term, termination of this Agreement "
+    "governed by and construed in accordance with the laws of India, arbitration and conciliation "
+    "representations and warranties, breach of any of its obligations under this Agreement "
+    "written notice to the other party, within thirty (30) days of the date of "
+    "the parties hereto, hereinafter referred to as, which expression shall "
+    "unless the context otherwise requires, shall be deemed to, in respect of "
+    "Section Clause Schedule Annexure shall not be, and the, of the, to the, in the, this Agreement, the Parties, shall "
+).encode("utf-8")
+TEXT_FORMAT_ZLIB = b"\x01"
+
+
+def compress_text(text: str) -> bytes:
+    """Compress chunk text for storage."""
+    compressor = zlib.compressobj(9, zdict=TEXT_DICTIONARY)
+    return TEXT_FORMAT_ZLIB + compressor.compress(text.encode("utf-8")) + compressor.flush()
+
+
+def decompress_text(value: Any) -> str:
+    """Inverse of `compress_text`; texts stored before compression was added are plain strings."""
+    if isinstance(value, str):
+        return value
+    if value[:1] != TEXT_FORMAT_ZLIB:
+        raise ValueError(f"Unknown chunk text format: {value[:1]!r}")
+    return zlib.decompressobj(zdict=TEXT_DICTIONARY).decompress(value[1:]).decode("utf-8")
+
+
+def chunk_fingerprint(text: str) -> str:
+    """Hash of a chunk's normalized text, used to detect unchanged chunks."""
+    return hashlib.sha256(EmbeddingCache.normalize(text).encode("utf-8")).hexdigest()
+
+
+class ChunkStore:
+    """SQLite record of ingested documents and the chunks stored for each.
+
+    For every document it keeps the ordered chunk manifest (chunk index, vector
+    ID, fingerprint and chunk metadata) that was last written to the vector
+    index, so a re-ingestion can diff against it. Chunk text is stored once per
+    fingerprint, so whole documents can be read back in order, or in ranges,
+    without querying the vector index. Texts are zlib-compressed with a preset
+    dictionary of contract phrases, and search results fetch them by
+    fingerprint instead of carrying them in vector metadata.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                document_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                filename TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS documents_user_filename ON documents (user_id, filename);
+            CREATE TABLE IF NOT EXISTS chunks (
+                document_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                vector_id TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                PRIMARY KEY (document_id, chunk_index)
+            );
+            CREATE INDEX IF NOT EXISTS chunks_fingerprint ON chunks (fingerprint);
+            CREATE TABLE IF NOT EXISTS chunk_texts (
+                fingerprint TEXT PRIMARY KEY,
+                text BLOB NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS pending_texts (
+                document_id TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                PRIMARY KEY (document_id, fingerprint)
+            );
+            CREATE INDEX IF NOT EXISTS pending_texts_fingerprint ON pending_texts (fingerprint);
+            CREATE TABLE IF NOT EXISTS document_vectors (
+                document_id TEXT PRIMARY KEY,
+                embedding_sum BLOB NOT NULL,
+                chunks INTEGER NOT NULL
+            );
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def save_document(self, document_id: str, user_id: Optional[str], filename: Optional[str]):
+        """Create a document record, or touch an existing one."""
+        now = datetime.utcnow().isoformat()
+        self._conn().execute(
+            "INSERT INTO documents (document_id, user_id, filename, created_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (document_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (document_id, user_id, filename, now, now)
+        )
+
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve a document record by ID."""
+        row = self._conn().execute("SELECT * FROM documents WHERE document_id = ?", (document_id,)).fetchone()
+        return dict(row) if row else None
+
+    def find_document(self, user_id: Optional[str], filename: str) -> Optional[Dict[str, Any]]:
+        """Find the most recent document a user uploaded under `filename`."""
+        row = self._conn().execute(
+            "SELECT * FROM documents WHERE user_id IS ? AND filename = ? ORDER BY updated_at DESC LIMIT 1",
+            (user_id, filename)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def get_manifest(self, document_id: str) -> Dict[str, Dict[str, Any]]:
+        """Return the stored chunks of a document, keyed by vector ID."""
+        rows = self._conn().execute(
+            "SELECT chunk_index, vector_id, fingerprint, metadata FROM chunks WHERE document_id = ?",
+            (document_id,)
+        ).fetchall()
+        return {
+            row["vector_id"]: {
+                "chunk_index": row["chunk_index"],
+                "fingerprint": row["fingerprint"],
+                "metadata": json.loads(row["metadata"])
+            }
+            for row in rows
+        }
+
+    def put_texts(self, texts: Dict[str, str], document_id: Optional[str] = None):
+        """Store chunk texts keyed by fingerprint (texts already stored are kept).
+
+        Texts put for a document are reserved for it until its manifest is
+        replaced (or `release_texts` is called), so they are not dropped as
+        unused in the meantime by changes to other documents that share them.
+        """
+        if not texts:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.executemany(
+                "INSERT OR IGNORE INTO chunk_texts (fingerprint, text) VALUES (?, ?)",
+                [(fingerprint, compress_text(text)) for fingerprint, text in texts.items()]
+            )
+            if document_id is not None:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO pending_texts (document_id, fingerprint) VALUES (?, ?)",
+                    [(document_id, fingerprint) for fingerprint in texts]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def release_texts(self, document_id: str):
+        """Drop a document's text reservations, and the texts only they kept (after an ingestion gave up)."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            self._drop_unused_texts(conn, self._release(conn, document_id))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_texts(self, fingerprints: List[str]) -> Dict[str, str]:
+        """Return the stored texts of `fingerprints`, keyed by fingerprint (unknown ones are left out)."""
+        found = {}
+        unique = list(dict.fromkeys(fingerprints))
+        # Stay under SQLite's limit on bound parameters
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = self._conn().execute(
+                f"SELECT fingerprint, text FROM chunk_texts WHERE fingerprint IN ({','.join('?' * len(batch))})",
+                batch
+            )
+            found.update((row["fingerprint"], decompress_text(row["text"])) for row in rows)
+        return found
+
+    def count_chunks(self, document_id: str) -> int:
+        """Number of chunks stored for a document."""
+        return self._conn().execute("SELECT COUNT(*) FROM chunks WHERE document_id = ?", (document_id,)).fetchone()[0]
+
+    def get_chunks(self, document_id: str, start: int = 0, end: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return chunks [start, end) of a document in order, with their text."""
+        rows = self._conn().execute(
+            "SELECT c.chunk_index, c.vector_id, c.metadata, t.text FROM chunks c "
+            "JOIN chunk_texts t ON t.fingerprint = c.fingerprint "
+            "WHERE c.document_id = ? AND c.chunk_index >= ? AND c.chunk_index < ? ORDER BY c.chunk_index",
+            (document_id, start, end if end is not None else 2 ** 63 - 1)
+        ).fetchall()
+        return [
+            {
+                "chunk_index": row["chunk_index"],
+                "vector_id": row["vector_id"],
+                "text": decompress_text(row["text"]),
+                "metadata": json.loads(row["metadata"])
+            }
+            for row in rows
+        ]
+
+    def iter_chunks(self, document_id: str, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield every chunk of a document in order, reading `batch_size` at a time."""
+        start = 0
+        while True:
+            batch = self.get_chunks(document_id, start, start + batch_size)
+            yield from batch
+            # Chunk indexes are contiguous, so a short batch means the end
+            if len(batch) < batch_size:
+                return
+            start += batch_size
+
+    def get_text(self, document_id: str, separator: str = "\n\n") -> str:
+        """Return a document's chunk texts joined in order."""
+        return separator.join(chunk["text"] for chunk in self.iter_chunks(document_id))
+
+    def get_embedding_sum(self, document_id: str) -> Optional[Tuple[np.ndarray, int]]:
+        """Return the summed normalized embeddings of a document's manifest and its chunk count, if stored."""
+        row = self._conn().execute(
+            "SELECT embedding_sum, chunks FROM document_vectors WHERE document_id = ?", (document_id,)
+        ).fetchone()
+        return (np.frombuffer(row["embedding_sum"], dtype=np.float64), row["chunks"]) if row else None
+
+    def replace_manifest(self, document_id: str, chunks: List[Dict[str, Any]], embedding_sum: Optional[np.ndarray] = None):
+        """Atomically replace a document's chunk manifest, and the embedding sum that goes with it."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            previous = [row[0] for row in conn.execute("SELECT DISTINCT fingerprint FROM chunks WHERE document_id = ?", (document_id,))]
+            previous.extend(self._release(conn, document_id))
+            conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            conn.executemany(
+                "INSERT INTO chunks (document_id, chunk_index, vector_id, fingerprint, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (document_id, chunk["chunk_index"], chunk["vector_id"], chunk["fingerprint"], json.dumps(chunk["metadata"]))
+                    for chunk in chunks
+                ]
+            )
+            if embedding_sum is None:
+                conn.execute("DELETE FROM document_vectors WHERE document_id = ?", (document_id,))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO document_vectors (document_id, embedding_sum, chunks) VALUES (?, ?, ?)",
+                    (document_id, np.asarray(embedding_sum, dtype=np.float64).tobytes(), len(chunks))
+                )
+            self._drop_unused_texts(conn, previous)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete_document(self, document_id: str):
+        """Forget a document and its chunk manifest."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            previous = [row[0] for row in conn.execute("SELECT DISTINCT fingerprint FROM chunks WHERE document_id = ?", (document_id,))]
+            previous.extend(self._release(conn, document_id))
+            conn.execute("DELETE FROM chunks WHERE document_id = ?", (document_id,))
+            conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+            conn.execute("DELETE FROM document_vectors WHERE document_id = ?", (document_id,))
+            self._drop_unused_texts(conn, previous)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _release(conn: sqlite3.Connection, document_id: str) -> List[str]:
+        """Delete a document's text reservations; return their fingerprints."""
+        fingerprints = [row[0] for row in conn.execute("SELECT fingerprint FROM pending_texts WHERE document_id = ?", (document_id,))]
+        conn.execute("DELETE FROM pending_texts WHERE document_id = ?", (document_id,))
+        return fingerprints
+
+    @staticmethod
+    def _drop_unused_texts(conn: sqlite3.Connection, fingerprints: List[str]):
+        """Delete the texts of `fingerprints` no longer referenced by any chunk or reserved by any document."""
+        conn.executemany(
+            "DELETE FROM chunk_texts WHERE fingerprint = ? AND NOT EXISTS (SELECT 1 FROM chunks WHERE fingerprint = ?) "
+            "AND NOT EXISTS (SELECT 1 FROM pending_texts WHERE fingerprint = ?)",
+            [(fingerprint, fingerprint, fingerprint) for fingerprint in set(fingerprints)]
+        )
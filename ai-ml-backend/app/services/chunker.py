@@ -0,0 +1,134 @@
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+import re
+
+TOKEN_PATTERN = re.compile(r"\S+")
+SENTENCE_END = (".", ";", ":", "?", "!")
+
+# Lines that open a new structural unit of a legal document. Headings
+# (articles, sections, schedules, all-caps titles) are strong boundaries;
+# numbered or lettered clauses are weaker ones.
+HEADING_PATTERN = re.compile(
+    r"^(?:(?:ARTICLE|Article|SECTION|Section|CHAPTER|Chapter|PART|Part|SCHEDULE|Schedule|"
+    r"EXHIBIT|Exhibit|ANNEX|Annex|APPENDIX|Appendix)\s+[\dIVXLCivxlcA-Z]+\b|§\s*\d|[A-Z][A-Z0-9 ,&'\-]{3,79}$)"
+)
+CLAUSE_PATTERN = re.compile(r"^(?:\d+(?:\.\d+)*[.)]?\s+\S|\([a-zA-Z0-9]{1,4}\)\s+\S|[a-z]\)\s+\S|[ivx]{1,5}[.)]\s+\S)")
+
+HEADING = 2
+CLAUSE = 1
+
+
+class LegalChunker:
+    """Single-pass, structure-aware chunker sized in tokens.
+
+    Text blocks (pages, paragraphs, ...) are tokenized once on whitespace.
+    Each line is classified as a heading, a clause start or plain text, and
+    tokens are packed greedily into a chunk of at most `chunk_tokens`. When a
+    chunk is full it is cut at the latest heading or clause boundary, else at
+    the latest sentence end, else at the token limit. A cut never lands inside
+    the first half of the chunk, so every chunk makes progress and the
+    `overlap_tokens` carried into the next chunk can't produce tiny or repeated
+    chunks. Headings also close the current chunk early once it is at least
+    half full, so sections tend to start their own chunk. Every token is
+    appended once and carried over at most once, so the whole pass is O(n).
+
+    Chunk metadata records `page_start`/`page_end` (when blocks carry a
+    `page`), the document `part` (when blocks carry one) and the `section`
+    heading the chunk starts under. Blocks flagged `heading` are treated as
+    headings whatever their text looks like.
+    """
+
+    def __init__(self, chunk_tokens: int = 200, overlap_tokens: int = 30):
+        if chunk_tokens < 2:
+            raise ValueError("chunk_tokens must be at least 2")
+        if not 0 <= overlap_tokens < chunk_tokens // 2:
+            raise ValueError("overlap_tokens must be less than half of chunk_tokens")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_fill = chunk_tokens // 2
+
+    def chunk_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Chunk a single string."""
+        return list(self.chunk_blocks([(text, metadata or {})]))
+
+    def chunk_blocks(self, blocks: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """Yield chunks from a stream of (text, metadata) blocks, in order."""
+        # Parallel token buffers: text (with its leading separator) and source block metadata
+        tokens: List[str] = []
+        sources: List[Dict[str, Any]] = []
+        structural_break = 0  # Latest position where a heading/clause starts (0 = none)
+        sentence_break = 0  # Latest position just after a sentence end (0 = none)
+        headings: List[Tuple[int, str]] = []  # Headings starting inside the buffer
+        section: Optional[str] = None  # Heading in effect at the start of the buffer
+        fresh = 0  # Tokens at the start of the buffer already emitted in a previous chunk
+
+        for text, block_metadata in blocks:
+            for line in text.splitlines():
+                line_tokens = TOKEN_PATTERN.findall(line)
+                if not line_tokens:
+                    continue
+                stripped = " ".join(line_tokens)
+                if block_metadata.get("heading") or HEADING_PATTERN.match(stripped):
+                    kind = HEADING
+                else:
+                    kind = CLAUSE if CLAUSE_PATTERN.match(stripped) else 0
+
+                if kind == HEADING and len(tokens) - fresh >= self.min_fill:
+                    chunk, tokens, sources, section, headings = self._cut(tokens, sources, len(tokens), headings, section, overlap=False)
+                    yield chunk
+                    structural_break = sentence_break = 0
+                    fresh = 0
+                if kind and tokens:
+                    structural_break = len(tokens)
+                if kind == HEADING:
+                    headings.append((len(tokens), stripped[:120]))
+
+                for i, token in enumerate(line_tokens):
+                    if len(tokens) >= self.chunk_tokens:
+                        # Cut at the best boundary in the second half of the chunk
+                        if structural_break >= self.min_fill:
+                            cut, overlap = structural_break, False
+                        elif sentence_break >= self.min_fill:
+                            cut, overlap = sentence_break, True
+                        else:
+                            cut, overlap = len(tokens), True
+                        buffered = len(tokens)
+                        chunk, tokens, sources, section, headings = self._cut(tokens, sources, cut, headings, section, overlap)
+                        yield chunk
+                        fresh = min(self.overlap_tokens, cut) if overlap else 0
+                        # Boundaries after the cut (a sentence end past a clause start) stay usable in the remainder
+                        shift = buffered - len(tokens)
+                        structural_break = max(structural_break - shift, 0)
+                        sentence_break = max(sentence_break - shift, 0)
+
+                    tokens.append(("\n" if i == 0 else " ") + token)
+                    sources.append(block_metadata)
+                    if token.endswith(SENTENCE_END):
+                        sentence_break = len(tokens)
+
+        if len(tokens) > fresh:
+            yield self._build(tokens, sources, section, headings)
+
+    def _cut(self, tokens, sources, cut, headings, section, overlap):
+        """Emit tokens[:cut] as a chunk; return it with the state for the next chunk."""
+        chunk = self._build(tokens[:cut], sources[:cut], section, headings)
+        start = max(cut - self.overlap_tokens, 0) if overlap else cut
+        for position, heading in headings:
+            if position <= start:
+                section = heading
+        headings = [(position - start, heading) for position, heading in headings if position > start]
+        return chunk, tokens[start:], sources[start:], section, headings
+
+    @staticmethod
+    def _build(tokens: List[str], sources: List[Dict[str, Any]], section: Optional[str], headings: List[Tuple[int, str]]) -> Dict[str, Any]:
+        text = "".join(tokens).lstrip("\n ")
+        metadata: Dict[str, Any] = {}
+        if "page" in sources[0]:
+            metadata["page_start"] = sources[0]["page"]
+            metadata["page_end"] = sources[-1]["page"]
+        if "part" in sources[0]:
+            metadata["part"] = sources[0]["part"]
+        if headings and headings[0][0] == 0:
+            section = headings[0][1]
+        if section:
+            metadata["section"] = section
+        return {"text": text, "metadata": metadata}
@@ -1,94 +1,173 @@
 import fitz  # PyMuPDF
-import docx
 import pdfplumber
-from typing import List, Tuple
-import re
+from typing import List, Dict, Any, BinaryIO, Iterator, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
 from pathlib import Path
 import tempfile
 import os
+from ..core.config import settings
+from ..core.metrics import metrics
+from .chunker import LegalChunker
+from .docx_extraction import iter_docx_parts
+from .pdf_extraction import PageRouteCache, extract_pdf_pages, file_fingerprint
+
+
+class DocumentTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit."""
+
 
 class DocumentProcessor:
     def __init__(self):
         self.supported_extensions = {'.pdf', '.docx'}
-    
-    def process_document(self, file_path: str) -> List[str]:
+        self._executor = None
+        self.route_cache = PageRouteCache(settings.PDF_ROUTE_CACHE_PATH)
+        self.chunker = LegalChunker(
+            chunk_tokens=settings.CHUNK_SIZE_TOKENS,
+            overlap_tokens=settings.CHUNK_OVERLAP_TOKENS
+        )
+
+    def process_document(self, file_path: str) -> List[Dict[str, Any]]:
         """Process a document and return its text chunks."""
+        return list(self.iter_chunks(file_path))
+
+    def iter_chunks(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Yield text chunks of a document as they are produced."""
         ext = Path(file_path).suffix.lower()
         if ext not in self.supported_extensions:
             raise ValueError(f"Unsupported file type: {ext}")
-        
+
         if ext == '.pdf':
             return self._process_pdf(file_path)
         elif ext == '.docx':
             return self._process_docx(file_path)
-    
-    def _process_pdf(self, file_path: str) -> List[str]:
-        """Process PDF file and return text chunks."""
-        chunks = []
-        
+
+    def _process_pdf(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Process PDF file and yield text chunks tagged with their page range."""
         # Try PyMuPDF first
         try:
-            doc = fitz.open(file_path)
-            text = ""
-            for page in doc:
-                text += page.get_text()
-            chunks = self._chunk_text(text)
+            pages = self.iter_pdf_pages(file_path)
+            first_page = next(pages, None)
         except Exception as e:
             # Fallback to pdfplumber
             try:
-                with pdfplumber.open(file_path) as pdf:
-                    text = ""
-                    for page in pdf.pages:
-                        text += page.extract_text() or ""
-                    chunks = self._chunk_text(text)
+                pages = self._iter_pdfplumber_pages(file_path)
+                first_page = next(pages, None)
             except Exception as e:
                 raise Exception(f"Failed to process PDF: {str(e)}")
-        
-        return chunks
-    
-    def _process_docx(self, file_path: str) -> List[str]:
-        """Process DOCX file and return text chunks."""
+
+        if first_page is None:
+            return iter(())
+        return self.chunker.chunk_blocks(
+            (text, {"page": page_number}) for page_number, text in self._prepend(first_page, pages)
+        )
+
+    def iter_pdf_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) in page order, extracting page batches in parallel.
+
+        At most PDF_EXTRACTION_WINDOW batches are in flight, so memory stays
+        bounded by that window of pages regardless of document length. Each
+        page is routed to an extractor by `classify_page`; the decisions are
+        cached per file fingerprint, and per-extractor page counts and timings
+        are recorded as `pdf_pages.<route>` and `pdf_extract.<route>`.
+        """
+        with fitz.open(file_path) as doc:
+            page_count = doc.page_count
+
+        fingerprint = file_fingerprint(file_path)
+        cached_routes = self.route_cache.get(fingerprint)
+        routes: Dict[int, str] = {}
+
+        batch_size = settings.PDF_PAGE_BATCH_SIZE
+        batches = iter([(start, min(start + batch_size, page_count)) for start in range(0, page_count, batch_size)])
+
+        def submit(executor, start, end):
+            batch_routes = {n: cached_routes[n] for n in range(start + 1, end + 1) if n in cached_routes}
+            return executor.submit(extract_pdf_pages, file_path, start, end, batch_routes)
+
+        def record(results):
+            for page_number, text, route, seconds in results:
+                routes[page_number] = route
+                metrics.increment(f"pdf_pages.{route}")
+                metrics.observe(f"pdf_extract.{route}", seconds)
+                yield page_number, text
+
+        # Small documents are not worth the inter-process round trip
+        if page_count <= batch_size:
+            yield from record(extract_pdf_pages(file_path, 0, page_count, cached_routes))
+        else:
+            executor = self._get_executor()
+            pending = deque()
+            for start, end in batches:
+                pending.append(submit(executor, start, end))
+                if len(pending) >= settings.PDF_EXTRACTION_WINDOW:
+                    break
+
+            while pending:
+                results = pending.popleft().result()
+                next_batch = next(batches, None)
+                if next_batch is not None:
+                    pending.append(submit(executor, *next_batch))
+                yield from record(results)
+
+        if routes != cached_routes:
+            self.route_cache.set(fingerprint, routes)
+
+    def _iter_pdfplumber_pages(self, file_path: str) -> Iterator[Tuple[int, str]]:
+        """Yield (page_number, text) using pdfplumber."""
+        with pdfplumber.open(file_path) as pdf:
+            for page_number, page in enumerate(pdf.pages, start=1):
+                yield page_number, page.extract_text() or ""
+                page.flush_cache()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Lazily create the process pool shared by all PDF extractions."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=settings.PDF_EXTRACTION_WORKERS)
+        return self._executor
+
+    @staticmethod
+    def _prepend(first, rest: Iterator) -> Iterator:
+        yield first
+        yield from rest
+
+    def _process_docx(self, file_path: str) -> Iterator[Dict[str, Any]]:
+        """Process DOCX file and yield text chunks, part by part.
+
+        Body paragraphs and table rows are streamed in document order, then
+        headers, footers, footnotes and endnotes; a chunk never spans parts.
+        """
         try:
-            doc = docx.Document(file_path)
-            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-            return self._chunk_text(text)
+            for part, blocks in iter_docx_parts(file_path):
+                yield from self.chunker.chunk_blocks(blocks)
         except Exception as e:
             raise Exception(f"Failed to process DOCX: {str(e)}")
-    
-    def _chunk_text(self, text: str, chunk_size: int = 1000, overlap: int = 200) -> List[str]:
-        """Split text into overlapping chunks."""
-        # Clean text
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        chunks = []
-        start = 0
-        text_length = len(text)
-        
-        while start < text_length:
-            end = start + chunk_size
-            if end > text_length:
-                end = text_length
-            
-            # Find the last period or newline in the chunk
-            if end < text_length:
-                last_period = text.rfind('.', start, end)
-                last_newline = text.rfind('\n', start, end)
-                end = max(last_period, last_newline) + 1 if max(last_period, last_newline) > start else end
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            start = end - overlap
-        
-        return chunks
-    
-    def save_uploaded_file(self, file_content: bytes, filename: str) -> str:
-        """Save uploaded file to temporary location and return the path."""
-        temp_dir = tempfile.gettempdir()
-        file_path = os.path.join(temp_dir, filename)
-        
-        with open(file_path, 'wb') as f:
-            f.write(file_content)
-        
-        return file_path 
\ No newline at end of file
+
+    def save_upload(self, source: BinaryIO, suffix: str, directory: Optional[str] = None, max_bytes: Optional[int] = None) -> str:
+        """Stream an upload into a new, uniquely named file and return its path.
+
+        The source is copied in UPLOAD_CHUNK_BYTES blocks, so the upload is never
+        held in memory as a whole, and the copy stops as soon as it exceeds
+        `max_bytes`. The saved file is what the extractors open later: PyMuPDF
+        and python-docx read it in place, and PDF page workers share it by path.
+        """
+        temp_dir = directory or tempfile.gettempdir()
+        os.makedirs(temp_dir, exist_ok=True)
+        fd, file_path = tempfile.mkstemp(suffix=suffix, dir=temp_dir)
+
+        written = 0
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                while True:
+                    block = source.read(settings.UPLOAD_CHUNK_BYTES)
+                    if not block:
+                        break
+                    written += len(block)
+                    if max_bytes is not None and written > max_bytes:
+                        raise DocumentTooLargeError(f"Document exceeds the {max_bytes // (1024 * 1024)} MB limit")
+                    f.write(block)
+        except BaseException:
+            os.remove(file_path)
+            raise
+
+        return file_path
\ No newline at end of file
@@ -0,0 +1,137 @@
+from typing import Any, Dict, Iterator, List, Tuple
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+W_P = f"{W}p"
+W_T = f"{W}t"
+W_TAB = f"{W}tab"
+W_BR = f"{W}br"
+W_CR = f"{W}cr"
+W_TBL = f"{W}tbl"
+W_TR = f"{W}tr"
+W_TC = f"{W}tc"
+W_PSTYLE = f"{W}pStyle"
+W_VAL = f"{W}val"
+W_ID = f"{W}id"
+W_FOOTNOTE = f"{W}footnote"
+W_ENDNOTE = f"{W}endnote"
+
+HEADING_STYLE = re.compile(r"^(?:heading\s*\d*|title|subtitle)$", re.IGNORECASE)
+
+# Parts other than the body, in the order they are emitted
+HEADER_PART = re.compile(r"^word/header\d*\.xml$")
+FOOTER_PART = re.compile(r"^word/footer\d*\.xml$")
+NOTE_PARTS = (("footnote", "word/footnotes.xml"), ("endnote", "word/endnotes.xml"))
+
+Block = Tuple[str, Dict[str, Any]]
+
+
+def _paragraph_text(paragraph: ET.Element) -> str:
+    parts = []
+    for node in paragraph.iter():
+        if node.tag == W_T:
+            parts.append(node.text or "")
+        elif node.tag == W_TAB:
+            parts.append("\t")
+        elif node.tag in (W_BR, W_CR):
+            parts.append("\n")
+    return "".join(parts)
+
+
+def _paragraph_style(paragraph: ET.Element) -> str:
+    style = paragraph.find(f"{W}pPr/{W_PSTYLE}")
+    return style.get(W_VAL, "") if style is not None else ""
+
+
+def iter_part_blocks(source, part: str) -> Iterator[Block]:
+    """Stream the paragraphs and table rows of one WordprocessingML part, in order.
+
+    The XML is parsed incrementally and every element is discarded once it
+    has been turned into a block, so memory stays flat however long the part
+    is. Paragraphs become one block each (flagged `heading` when they use a
+    heading style); tables become one block per row, with cells separated by
+    " | " so a row of a rent schedule stays on one line.
+    """
+    table_depth = 0
+    table_index = -1
+    row_index = 0
+    note_id = None
+    container = None  # Element whose finished children can be dropped
+    for event, element in ET.iterparse(source, events=("start", "end")):
+        tag = element.tag
+        if event == "start":
+            if tag == W_TBL:
+                table_depth += 1
+                if table_depth == 1:
+                    table_index += 1
+                    row_index = 0
+            elif tag in (W_FOOTNOTE, W_ENDNOTE):
+                note_id = element.get(W_ID)
+            elif container is None and tag in (f"{W}body", f"{W}hdr", f"{W}ftr", f"{W}footnotes", f"{W}endnotes"):
+                container = element
+            continue
+
+        if tag == W_P and table_depth == 0:
+            text = _paragraph_text(element)
+            if text.strip():
+                metadata: Dict[str, Any] = {"part": part, "block": "paragraph"}
+                if HEADING_STYLE.match(_paragraph_style(element)):
+                    metadata["heading"] = True
+                if note_id is not None:
+                    metadata[part] = note_id
+                yield text, metadata
+            element.clear()
+        elif tag == W_TR and table_depth == 1:
+            cells = [
+                " ".join(text for text in (_paragraph_text(p).strip() for p in cell.iter(W_P)) if text)
+                for cell in element.findall(W_TC)
+            ]
+            if any(cells):
+                metadata = {"part": part, "block": "table", "table": table_index, "row": row_index}
+                if note_id is not None:
+                    metadata[part] = note_id
+                yield " | ".join(cells), metadata
+            row_index += 1
+            element.clear()
+        elif tag == W_TBL:
+            table_depth -= 1
+            if table_depth == 0:
+                element.clear()
+        elif tag in (W_FOOTNOTE, W_ENDNOTE):
+            note_id = None
+
+        # Finished top-level elements are no longer needed
+        if container is not None and table_depth == 0 and tag in (W_P, W_TBL, W_FOOTNOTE, W_ENDNOTE):
+            container.clear()
+
+
+def iter_docx_parts(file_path: str) -> Iterator[Tuple[str, Iterator[Block]]]:
+    """Yield (part, blocks) for the body, headers, footers, footnotes and endnotes of a DOCX.
+
+    Each part's blocks are produced lazily from the open archive, so they must
+    be consumed before advancing to the next part. Header and footer
+    paragraphs that repeat across sections are only emitted once.
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        names = archive.namelist()
+        with archive.open("word/document.xml") as source:
+            yield "body", iter_part_blocks(source, "body")
+
+        seen = set()
+        for part, pattern in (("header", HEADER_PART), ("footer", FOOTER_PART)):
+            for name in sorted(n for n in names if pattern.match(n)):
+                with archive.open(name) as source:
+                    blocks: List[Block] = []
+                    for text, metadata in iter_part_blocks(source, part):
+                        if text not in seen:
+                            seen.add(text)
+                            blocks.append((text, metadata))
+                if blocks:
+                    yield part, iter(blocks)
+
+        for part, name in NOTE_PARTS:
+            if name in names:
+                with archive.open(name) as source:
+                    yield part, iter_part_blocks(source, part)
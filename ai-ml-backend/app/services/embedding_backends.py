@@ -0,0 +1,88 @@
+from typing import List
+import asyncio
+import hashlib
+import math
+import random
+import time
+from collections import deque
+
+
+class RateLimitError(Exception):
+    """The embedding provider rejected a request because of rate or quota limits."""
+
+
+class GeminiEmbeddingBackend:
+    """Embeds batches of texts with the Gemini batch embedding API."""
+
+    max_batch_size = 100  # batchEmbedContents limit
+
+    def __init__(self, api_key: str, model: str):
+        # Imported here so the fake backend works without the Gemini SDK installed
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._rate_limit_errors = (google_exceptions.ResourceExhausted, google_exceptions.TooManyRequests)
+        self.model = model
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed up to `max_batch_size` texts in one request."""
+        try:
+            result = await asyncio.to_thread(self._genai.embed_content, model=self.model, content=texts)
+        except self._rate_limit_errors as e:
+            raise RateLimitError(str(e)) from e
+        return result["embedding"]
+
+
+class FakeEmbeddingBackend:
+    """Deterministic local embeddings with simulated latency and rate limits.
+
+    Vectors are derived from a hash of the text, so the same text always gets
+    the same unit vector. Used for offline benchmarks and local development.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        model: str = "fake-embedding",
+        max_batch_size: int = 100,
+        request_latency: float = 0.05,
+        per_text_latency: float = 0.0005,
+        max_requests_per_second: float = 0
+    ):
+        self.dimension = dimension
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.request_latency = request_latency
+        self.per_text_latency = per_text_latency
+        self.max_requests_per_second = max_requests_per_second
+        self.requests = 0
+        self.rate_limited = 0
+        self._recent = deque()
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) > self.max_batch_size:
+            raise ValueError(f"Batch of {len(texts)} exceeds max batch size {self.max_batch_size}")
+        self._check_rate_limit()
+        self.requests += 1
+        await asyncio.sleep(self.request_latency + self.per_text_latency * len(texts))
+        return [self.embed_text(text) for text in texts]
+
+    def embed_text(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimension)]
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        return [value / norm for value in vector]
+
+    def _check_rate_limit(self):
+        if not self.max_requests_per_second:
+            return
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.max_requests_per_second:
+            self.rate_limited += 1
+            raise RateLimitError("Fake rate limit exceeded")
+        self._recent.append(now)
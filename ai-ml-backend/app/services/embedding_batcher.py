@@ -0,0 +1,84 @@
+from typing import List, Optional
+import asyncio
+import random
+from .embedding_backends import RateLimitError
+
+
+class EmbeddingBatcher:
+    """Groups texts into provider batch requests and keeps several in flight.
+
+    Concurrency adapts to the provider: every rate-limit error halves the
+    number of batches allowed in flight and pauses all new requests for an
+    exponentially growing, jittered backoff; every successful batch lets one
+    more batch through again, up to `max_concurrency`. Results are always
+    returned in input order.
+    """
+
+    def __init__(
+        self,
+        backend,
+        batch_size: int = 100,
+        max_concurrency: int = 4,
+        max_retries: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0
+    ):
+        self.backend = backend
+        self.batch_size = min(batch_size, backend.max_batch_size)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._limit = max_concurrency
+        self._in_flight = 0
+        self._resume_at = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    async def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts, returning one vector per text in the same order."""
+        if not texts:
+            return []
+        batches = [texts[i:i + self.batch_size] for i in range(0, len(texts), self.batch_size)]
+        results = await asyncio.gather(*(self._embed_batch(batch) for batch in batches))
+        return [embedding for batch in results for embedding in batch]
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            await self._acquire()
+            try:
+                embeddings = await self.backend.embed_batch(texts)
+            except RateLimitError:
+                self._limit = max(1, self._limit // 2)
+                if attempt >= self.max_retries:
+                    raise
+                delay = min(self.max_backoff, self.base_backoff * (2 ** attempt)) * random.uniform(0.5, 1.0)
+                loop = asyncio.get_running_loop()
+                self._resume_at = max(self._resume_at, loop.time() + delay)
+                attempt += 1
+            else:
+                self._limit = min(self.max_concurrency, self._limit + 1)
+                return embeddings
+            finally:
+                await self._release()
+
+    async def _acquire(self):
+        loop = asyncio.get_running_loop()
+        while loop.time() < self._resume_at:
+            await asyncio.sleep(self._resume_at - loop.time())
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+
+    async def _release(self):
+        condition = self._get_condition()
+        async with condition:
+            self._in_flight -= 1
+            condition.notify_all()
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Created lazily so the batcher can be built outside a running loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
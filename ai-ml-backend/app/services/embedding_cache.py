@@ -0,0 +1,42 @@
+from typing import List, Optional
+from array import array
+import hashlib
+import unicodedata
+from ..core.disk_cache import DiskCache
+
+
+class EmbeddingCache:
+    """Content-addressed embedding cache.
+
+    Keys are a hash of (model name, normalized chunk text), so re-uploading a
+    document, or a new version of it, only sends chunks never seen before to
+    the embedding API. Vectors are stored as packed float32.
+    """
+
+    def __init__(self, path: str, model: str, max_bytes: int):
+        self.model = model
+        self.store = DiskCache(path, name="embedding_cache", max_bytes=max_bytes)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize text so formatting-only differences share a cache entry."""
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Return the cached embedding for each text, or None where missing."""
+        keys = [self.key(text) for text in texts]
+        found = self.store.get_many(keys)
+        return [self._decode(found[key]) if key in found else None for key in keys]
+
+    def set_many(self, texts: List[str], embeddings: List[List[float]]):
+        """Cache embeddings for the given texts."""
+        self.store.set_many({self.key(text): array("f", embedding).tobytes() for text, embedding in zip(texts, embeddings)})
+
+    @staticmethod
+    def _decode(value: bytes) -> List[float]:
+        vector = array("f")
+        vector.frombytes(value)
+        return vector.tolist()
@@ -1,100 +1,440 @@
-from typing import List, Dict, Any
-import pinecone
-import google.generativeai as genai
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
+import asyncio
+import numpy as np
 from ..core.config import settings
-import uuid
+from .embedding_backends import GeminiEmbeddingBackend, FakeEmbeddingBackend
+from .embedding_batcher import EmbeddingBatcher
+from .embedding_cache import EmbeddingCache
+from .vector_stores import VectorStore, PineconeVectorStore, LocalVectorStore, FakeVectorStore
+from .vector_client import AsyncVectorClient
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
+from .query_cache import QueryCache
+from .chunk_store import ChunkStore, chunk_fingerprint
 
 class EmbeddingsService:
-    def __init__(self):
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel('embedding-001')
-        self._init_pinecone()
-    
-    def _init_pinecone(self):
-        """Initialize Pinecone client."""
-        pinecone.init(
-            api_key=settings.PINECONE_API_KEY,
-            environment=settings.PINECONE_ENVIRONMENT
+    def __init__(self, chunk_store: Optional[ChunkStore] = None):
+        # Chunk text lives in the chunk store; vectors reference it by fingerprint
+        self.chunk_store = chunk_store or ChunkStore(settings.CHUNK_STORE_PATH)
+        self.backend = self._create_backend()
+        self.batcher = EmbeddingBatcher(
+            self.backend,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_concurrency=settings.EMBEDDING_MAX_CONCURRENCY,
+            max_retries=settings.EMBEDDING_MAX_RETRIES
         )
-        
-        # Create index if it doesn't exist
-        if settings.PINECONE_INDEX_NAME not in pinecone.list_indexes():
-            pinecone.create_index(
-                name=settings.PINECONE_INDEX_NAME,
-                dimension=768,  # Gemini embedding dimension
-                metric="cosine"
+        self.cache = EmbeddingCache(
+            settings.EMBEDDING_CACHE_PATH,
+            model=self.backend.model,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_MB * 1024 * 1024
+        ) if settings.EMBEDDING_CACHE_ENABLED else None
+        self.vector_store = self._create_vector_store()
+        self.vector_client = AsyncVectorClient(
+            self.vector_store,
+            pool_size=settings.VECTOR_STORE_POOL_SIZE,
+            batch_size=settings.VECTOR_STORE_BATCH_SIZE,
+            max_retries=settings.VECTOR_STORE_MAX_RETRIES
+        )
+        self.lexical_index = LexicalIndex(settings.LEXICAL_INDEX_PATH) if settings.HYBRID_SEARCH else None
+        self.query_cache = QueryCache(
+            settings.QUERY_CACHE_PATH,
+            model=self.backend.model,
+            max_bytes=settings.QUERY_CACHE_MAX_MB * 1024 * 1024,
+            embedding_ttl_seconds=settings.QUERY_CACHE_EMBEDDING_TTL_SECONDS,
+            result_ttl_seconds=settings.QUERY_CACHE_RESULT_TTL_SECONDS
+        ) if settings.QUERY_CACHE_ENABLED else None
+    
+    def _create_backend(self):
+        """Create the embedding backend selected by EMBEDDING_BACKEND."""
+        if settings.EMBEDDING_BACKEND == "fake":
+            return FakeEmbeddingBackend(dimension=settings.EMBEDDING_DIMENSION, request_latency=0, per_text_latency=0)
+        return GeminiEmbeddingBackend(api_key=settings.GOOGLE_API_KEY, model=settings.EMBEDDING_MODEL)
+    
+    def _create_vector_store(self) -> VectorStore:
+        """Create the vector index selected by VECTOR_STORE."""
+        if settings.VECTOR_STORE == "local":
+            return LocalVectorStore(
+                settings.VECTOR_STORE_PATH,
+                dimension=settings.EMBEDDING_DIMENSION,
+                dtype=settings.VECTOR_STORE_DTYPE,
+                index_type=settings.VECTOR_STORE_INDEX,
+                nlist=settings.VECTOR_STORE_IVF_LISTS,
+                nprobe=settings.VECTOR_STORE_IVF_PROBES,
+                ivf_min_vectors=settings.VECTOR_STORE_IVF_MIN_VECTORS,
+                quantization=settings.VECTOR_STORE_QUANTIZATION,
+                pq_subvectors=settings.VECTOR_STORE_PQ_SUBVECTORS,
+                rescore=settings.VECTOR_STORE_RESCORE
             )
-        
-        self.index = pinecone.Index(settings.PINECONE_INDEX_NAME)
+        if settings.VECTOR_STORE == "fake":
+            return FakeVectorStore(dimension=settings.EMBEDDING_DIMENSION, request_latency=0, per_vector_latency=0)
+        return PineconeVectorStore(
+            api_key=settings.PINECONE_API_KEY,
+            environment=settings.PINECONE_ENVIRONMENT,
+            index_name=settings.PINECONE_INDEX_NAME,
+            dimension=settings.EMBEDDING_DIMENSION,
+            pool_threads=settings.VECTOR_STORE_POOL_SIZE
+        )
     
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for a list of texts using Gemini API."""
+    async def generate_embeddings(self, texts: List[str], stats: Optional[Dict[str, int]] = None) -> List[List[float]]:
+        """Generate embeddings for a list of texts, batched and in input order.
+        
+        Texts already in the embedding cache are not sent to the API; the
+        number reused is added to `stats["embeddings_reused"]` when given.
+        """
         try:
-            embeddings = []
-            for text in texts:
-                result = self.model.embed_content(text)
-                embeddings.append(result.embedding)
+            embeddings = await asyncio.to_thread(self.cache.get_many, texts) if self.cache else [None] * len(texts)
+            
+            # Embed each distinct missing text once
+            missing: Dict[str, List[int]] = {}
+            for i, (text, embedding) in enumerate(zip(texts, embeddings)):
+                if embedding is None:
+                    missing.setdefault(text, []).append(i)
+            
+            if missing:
+                new_embeddings = await self.batcher.embed(list(missing))
+                for positions, embedding in zip(missing.values(), new_embeddings):
+                    for i in positions:
+                        embeddings[i] = embedding
+                if self.cache:
+                    await asyncio.to_thread(self.cache.set_many, list(missing), new_embeddings)
+            
+            if stats is not None:
+                stats["embeddings_reused"] = stats.get("embeddings_reused", 0) + len(texts) - sum(len(positions) for positions in missing.values())
             return embeddings
         except Exception as e:
             raise Exception(f"Failed to generate embeddings: {str(e)}")
     
-    async def store_embeddings(self, document_id: str, chunks: List[str], metadata: Dict[str, Any] = None) -> List[str]:
-        """Store document chunks and their embeddings in Pinecone."""
+    async def store_embeddings(self, document_id: str, chunks: List[Dict[str, Any]], metadata: Dict[str, Any] = None) -> List[str]:
+        """Store document chunks and their embeddings in the vector index."""
         try:
             # Generate embeddings for chunks
-            embeddings = await self.generate_embeddings(chunks)
+            embeddings = await self.generate_embeddings([chunk["text"] for chunk in chunks])
             
             # Prepare vectors for upsert
-            vectors = []
-            for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
-                vector_id = f"{document_id}_{i}"
-                vector_metadata = {
-                    "document_id": document_id,
-                    "chunk_index": i,
-                    "text": chunk,
-                    **(metadata or {})
-                }
-                vectors.append((vector_id, embedding, vector_metadata))
+            chunks = [
+                {**chunk, "chunk_index": i, "vector_id": f"{document_id}_{i}", "fingerprint": chunk_fingerprint(chunk["text"])}
+                for i, chunk in enumerate(chunks)
+            ]
+            await asyncio.to_thread(self.chunk_store.put_texts, {chunk["fingerprint"]: chunk["text"] for chunk in chunks}, document_id)
+            vectors = self.build_vectors(document_id, chunks, embeddings, metadata=metadata)
             
-            # Upsert vectors in batches
-            batch_size = 100
-            for i in range(0, len(vectors), batch_size):
-                batch = vectors[i:i + batch_size]
-                self.index.upsert(vectors=batch)
+            # Upsert into the owner's namespace; the client splits the vectors into parallel batches
+            await self.upsert_vectors(vectors, namespace=(metadata or {}).get("user_id"))
             
             return [vector[0] for vector in vectors]
         except Exception as e:
             raise Exception(f"Failed to store embeddings: {str(e)}")
     
-    async def search_similar(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search for similar documents using semantic search."""
+    def build_vectors(
+        self,
+        document_id: str,
+        chunks: List[Dict[str, Any]],
+        embeddings: List[List[float]],
+        metadata: Dict[str, Any] = None
+    ) -> List[Tuple[str, List[float], Dict[str, Any]]]:
+        """Pair chunks (with `vector_id`, `chunk_index` and `fingerprint` set) with their embeddings.
+        
+        The text itself is not part of the vector metadata; it must already be
+        in the chunk store under the chunk's fingerprint.
+        """
+        vectors = []
+        for chunk, embedding in zip(chunks, embeddings):
+            vector_metadata = {
+                "document_id": document_id,
+                "chunk_index": chunk["chunk_index"],
+                "fingerprint": chunk["fingerprint"],
+                **chunk["metadata"],
+                **(metadata or {})
+            }
+            # Pinecone rejects null metadata values
+            vector_metadata = {key: value for key, value in vector_metadata.items() if value is not None}
+            vectors.append((chunk["vector_id"], embedding, vector_metadata))
+        return vectors
+    
+    async def upsert_vectors(self, vectors: List[Tuple[str, List[float], Dict[str, Any]]], namespace: Optional[str] = None):
+        """Upsert vectors, and index their text, without blocking the event loop."""
+        if self.lexical_index:
+            await asyncio.gather(self.vector_client.upsert(vectors, namespace), self._index_text(vectors, namespace))
+        else:
+            await self.vector_client.upsert(vectors, namespace)
+        await self._invalidate(namespace)
+    
+    async def _index_text(self, vectors: List[Tuple[str, List[float], Dict[str, Any]]], namespace: Optional[str]):
+        """Add vectors' chunk text to the BM25 index."""
+        texts = await asyncio.to_thread(
+            self.chunk_store.get_texts,
+            [metadata["fingerprint"] for _, _, metadata in vectors if "fingerprint" in metadata]
+        )
+        await asyncio.to_thread(
+            self.lexical_index.upsert,
+            [
+                (vector_id, {**metadata, "text": metadata.get("text") or texts.get(metadata.get("fingerprint"), "")})
+                for vector_id, _, metadata in vectors
+            ],
+            namespace
+        )
+    
+    async def update_vector_metadata(self, vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None):
+        """Overwrite selected metadata fields of a stored vector."""
+        await self.vector_client.update_metadata(vector_id, metadata, namespace)
+        if self.lexical_index:
+            await asyncio.to_thread(self.lexical_index.update_metadata, vector_id, metadata, namespace)
+        await self._invalidate(namespace)
+    
+    async def delete_vectors(self, vector_ids: List[str], namespace: Optional[str] = None):
+        """Delete vectors by ID."""
+        await self.vector_client.delete(vector_ids, namespace)
+        if self.lexical_index:
+            await asyncio.to_thread(self.lexical_index.delete, vector_ids, namespace)
+        await self._invalidate(namespace)
+    
+    async def fetch_vectors(self, vector_ids: List[str], namespace: Optional[str] = None) -> Dict[str, List[float]]:
+        """Stored embeddings of vectors by ID (vectors not in the index are left out)."""
+        return await self.vector_client.fetch(vector_ids, namespace)
+    
+    @staticmethod
+    def document_namespace(namespace: Optional[str]) -> str:
+        """Namespace holding one centroid vector per document of `namespace`'s owner."""
+        return f"{namespace or ''}#documents"
+    
+    async def upsert_document_vector(
+        self,
+        document_id: str,
+        embedding_sum: Optional[np.ndarray],
+        chunks: int,
+        metadata: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ):
+        """Store a document's centroid (its summed chunk embeddings, normalized) for two-stage search.
+        
+        A document left without chunks has its centroid deleted instead.
+        """
+        document_namespace = self.document_namespace(namespace)
+        if embedding_sum is None or not np.any(embedding_sum):
+            await self.vector_client.delete([document_id], document_namespace)
+        else:
+            vector_metadata = {"document_id": document_id, "chunks": chunks, **(metadata or {})}
+            vector_metadata = {key: value for key, value in vector_metadata.items() if value is not None}
+            centroid = (embedding_sum / np.linalg.norm(embedding_sum)).tolist()
+            await self.vector_client.upsert([(document_id, centroid, vector_metadata)], document_namespace)
+        await self._invalidate(namespace)
+    
+    async def _invalidate(self, namespace: Optional[str]):
+        """Drop cached search results for a namespace after its vectors change."""
+        if self.query_cache:
+            await asyncio.to_thread(self.query_cache.invalidate, namespace)
+    
+    @staticmethod
+    def build_filter(
+        document_id: Optional[str] = None,
+        date_from: Optional[float] = None,
+        date_to: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Build an index-level metadata filter (dates are upload Unix timestamps)."""
+        filter: Dict[str, Any] = {}
+        if document_id is not None:
+            filter["document_id"] = {"$eq": document_id}
+        uploaded_at = {}
+        if date_from is not None:
+            uploaded_at["$gte"] = date_from
+        if date_to is not None:
+            uploaded_at["$lte"] = date_to
+        if uploaded_at:
+            filter["uploaded_at"] = uploaded_at
+        return filter
+    
+    async def search_similar(
+        self,
+        query: str,
+        top_k: int = 5,
+        user_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+        date_from: Optional[float] = None,
+        date_to: Optional[float] = None
+    ) -> List[Dict[str, Any]]:
+        """Search for similar documents using semantic and keyword search.
+        
+        The search is confined to `user_id`'s namespace and, optionally, to one
+        document and an upload date range; the indexes apply these before
+        ranking, so results never include other users' chunks. With
+        HYBRID_SEARCH, the best vector and BM25 matches are merged by
+        reciprocal rank fusion, so exact terms such as section numbers and
+        defined terms are found even when their embeddings are not close.
+        """
         try:
-            # Generate embedding for query
-            query_embedding = await self.generate_embeddings([query])
+            results = [
+                result
+                async for _, result in self.search_batch(
+                    [query], top_k, user_id=user_id, document_id=document_id, date_from=date_from, date_to=date_to
+                )
+            ]
+            return results[0]
+        except Exception as e:
+            raise Exception(f"Failed to perform semantic search: {str(e)}")
+    
+    async def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 5,
+        user_id: Optional[str] = None,
+        document_id: Optional[str] = None,
+        date_from: Optional[float] = None,
+        date_to: Optional[float] = None
+    ) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+        """Run `search_similar` for many queries, yielding (position, results) as they complete.
+        
+        Queries are processed in groups of one embedding batch: each group
+        costs one batch embedding request (for queries not in the query cache)
+        and one vectorized index query, and groups run concurrently.
+        """
+        filter = self.build_filter(document_id, date_from, date_to) or None
+        # Read before searching, so results cached here are never newer than their key
+        generation = await asyncio.to_thread(self.query_cache.generation, user_id) if self.query_cache else 0
+        
+        async def run_group(start: int) -> Tuple[int, List[List[Dict[str, Any]]]]:
+            group = queries[start:start + self.batcher.batch_size]
+            embeddings = await self.embed_queries(group)
+            results: List[Optional[List[Dict[str, Any]]]] = [None] * len(group)
+            keys = []
+            if self.query_cache:
+                keys = [
+                    self.query_cache.results_key(embedding, query if self.lexical_index else None, filter, top_k, user_id, generation)
+                    for query, embedding in zip(group, embeddings)
+                ]
+                results = await asyncio.to_thread(self.query_cache.get_results, keys)
             
-            # Search in Pinecone
-            results = self.index.query(
-                vector=query_embedding[0],
-                top_k=top_k,
-                include_metadata=True
+            pending = [i for i, result in enumerate(results) if result is None]
+            if pending:
+                searched = await self._search(
+                    [group[i] for i in pending], [embeddings[i] for i in pending], top_k, filter, user_id
+                )
+                for i, result in zip(pending, searched):
+                    results[i] = result
+                if self.query_cache:
+                    await asyncio.to_thread(self.query_cache.set_results, {keys[i]: results[i] for i in pending})
+            return start, results
+        
+        tasks = [asyncio.create_task(run_group(start)) for start in range(0, len(queries), self.batcher.batch_size)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                start, results = await task
+                for offset, result in enumerate(results):
+                    yield start + offset, result
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    async def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embed search queries, reusing embeddings from the query cache."""
+        if not self.query_cache:
+            return await self.generate_embeddings(queries)
+        embeddings = await asyncio.to_thread(self.query_cache.get_embeddings, queries)
+        missing = list(dict.fromkeys(query for query, embedding in zip(queries, embeddings) if embedding is None))
+        if missing:
+            new_embeddings = dict(zip(missing, await self.batcher.embed(missing)))
+            await asyncio.to_thread(self.query_cache.set_embeddings, missing, list(new_embeddings.values()))
+            embeddings = [new_embeddings[query] if embedding is None else embedding for query, embedding in zip(queries, embeddings)]
+        return embeddings
+    
+    async def _search(
+        self,
+        queries: List[str],
+        query_embeddings: List[List[float]],
+        top_k: int,
+        filter: Optional[Dict[str, Any]],
+        namespace: Optional[str]
+    ) -> List[List[Dict[str, Any]]]:
+        """Rank chunks for embedded queries, fusing in BM25 matches when enabled."""
+        if self.lexical_index:
+            candidates = max(top_k, settings.HYBRID_CANDIDATES)
+            # BM25 always searches every document, so exact-token matches survive a wrong coarse stage
+            vector_rankings, lexical_rankings = await asyncio.gather(
+                self._vector_search(query_embeddings, candidates, filter, namespace),
+                asyncio.to_thread(lambda: [self.lexical_index.query(query, candidates, filter, namespace) for query in queries])
             )
-            
-            return [
+            rankings = [
+                reciprocal_rank_fusion([vector_matches, lexical_matches], k=settings.HYBRID_RRF_K)[:top_k]
+                for vector_matches, lexical_matches in zip(vector_rankings, lexical_rankings)
+            ]
+        else:
+            rankings = await self._vector_search(query_embeddings, top_k, filter, namespace)
+        
+        # Vectors written before text moved to the chunk store still carry it in their metadata
+        texts = await asyncio.to_thread(
+            self.chunk_store.get_texts,
+            [match["metadata"]["fingerprint"] for matches in rankings for match in matches if "fingerprint" in match["metadata"]]
+        )
+        return [
+            [
                 {
-                    "id": match.id,
-                    "score": match.score,
-                    "text": match.metadata["text"],
-                    "document_id": match.metadata["document_id"],
-                    "metadata": {k: v for k, v in match.metadata.items() if k not in ["text", "document_id"]}
+                    "id": match["id"],
+                    "score": match["score"],
+                    "text": match["metadata"].get("text") or texts.get(match["metadata"].get("fingerprint"), ""),
+                    "document_id": match["metadata"]["document_id"],
+                    "metadata": {k: v for k, v in match["metadata"].items() if k not in ["text", "document_id", "fingerprint"]}
                 }
-                for match in results.matches
+                for match in matches
             ]
-        except Exception as e:
-            raise Exception(f"Failed to perform semantic search: {str(e)}")
+            for matches in rankings
+        ]
     
-    def delete_document(self, document_id: str):
-        """Delete all vectors associated with a document."""
+    async def _vector_search(
+        self,
+        query_embeddings: List[List[float]],
+        top_k: int,
+        filter: Optional[Dict[str, Any]],
+        namespace: Optional[str]
+    ) -> List[List[Dict[str, Any]]]:
+        """Query the vector index, coarse-to-fine when TWO_STAGE_SEARCH is on.
+        
+        In two-stage mode, each query first ranks the owner's document
+        centroids and then searches chunks only within its best
+        TWO_STAGE_DOCUMENTS documents. Queries that picked the same documents
+        share one index query. A search already confined to a document goes
+        straight to the chunks.
+        """
+        if not settings.TWO_STAGE_SEARCH or (filter or {}).get("document_id") is not None:
+            return await self.vector_client.query_batch(query_embeddings, top_k, filter, namespace)
+        
+        documents = await self.vector_client.query_batch(
+            query_embeddings, settings.TWO_STAGE_DOCUMENTS, filter, self.document_namespace(namespace)
+        )
+        groups: Dict[Tuple[str, ...], List[int]] = {}
+        for i, matches in enumerate(documents):
+            groups.setdefault(tuple(sorted(match["id"] for match in matches)), []).append(i)
+        
+        async def search_group(document_ids: Tuple[str, ...], positions: List[int]) -> List[List[Dict[str, Any]]]:
+            if not document_ids:
+                return [[] for _ in positions]
+            return await self.vector_client.query_batch(
+                [query_embeddings[i] for i in positions],
+                top_k,
+                {**(filter or {}), "document_id": {"$in": list(document_ids)}},
+                namespace
+            )
+        
+        rankings: List[List[Dict[str, Any]]] = [[] for _ in query_embeddings]
+        results = await asyncio.gather(*(search_group(document_ids, positions) for document_ids, positions in groups.items()))
+        for positions, group_rankings in zip(groups.values(), results):
+            for i, matches in zip(positions, group_rankings):
+                rankings[i] = matches
+        return rankings
+    
+    async def delete_document(self, document_id: str, user_id: Optional[str] = None):
+        """Delete all vectors associated with a document.
+        
+        Vectors are deleted by the IDs in the document's chunk manifest, which
+        every backend supports. Documents indexed without a manifest fall back
+        to the backend's delete-by-filter.
+        """
         try:
-            self.index.delete(filter={"document_id": document_id})
+            manifest = await asyncio.to_thread(self.chunk_store.get_manifest, document_id)
+            if manifest:
+                await self.vector_client.delete(list(manifest), user_id)
+            else:
+                await self.vector_client.delete_document(document_id, user_id)
+            await self.vector_client.delete([document_id], self.document_namespace(user_id))
+            if self.lexical_index:
+                await asyncio.to_thread(self.lexical_index.delete_document, document_id, user_id)
+            await self._invalidate(user_id)
         except Exception as e:
             raise Exception(f"Failed to delete document: {str(e)}") 
\ No newline at end of file
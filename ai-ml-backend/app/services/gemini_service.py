@@ -1,37 +1,40 @@
-import os
-from typing import List, Optional
-import google.generativeai as genai
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain.schema import HumanMessage, SystemMessage
+from typing import AsyncIterator, List, Optional
+from .llm_gateway import LLMGateway, get_llm_gateway
 
-# Configure the Gemini API
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+# Sampling temperature for chat_with_history
+CHAT_TEMPERATURE = 0.7
+
+# Cached prompt template versions, bumped whenever a template's wording changes
+ANALYSIS_PROMPT_VERSION = 1
+SUMMARY_PROMPT_VERSION = 1
 
 class GeminiService:
-    def __init__(self):
-        self.model = genai.GenerativeModel('gemini-pro')
-        self.chat_model = ChatGoogleGenerativeAI(
-            model="gemini-pro",
-            temperature=0.7,
-            convert_system_message_to_human=True
-        )
+    def __init__(self, gateway: Optional[LLMGateway] = None):
+        self.gateway = gateway or get_llm_gateway()
+
+    @staticmethod
+    def _full_prompt(prompt: str, context: Optional[str] = None) -> str:
+        if context:
+            return f"Context: {context}\n\nUser: {prompt}"
+        return prompt
 
     async def generate_response(self, prompt: str, context: Optional[str] = None) -> str:
         """
         Generate a response using Gemini API
         """
         try:
-            if context:
-                full_prompt = f"Context: {context}\n\nUser: {prompt}"
-            else:
-                full_prompt = prompt
-
-            response = self.model.generate_content(full_prompt)
-            return response.text
+            full_prompt = self._full_prompt(prompt, context)
+            return await self.gateway.generate(full_prompt, "gemini.response")
         except Exception as e:
             print(f"Error generating response: {str(e)}")
             return "I apologize, but I encountered an error while processing your request."
 
+    def stream_response(self, prompt: str, context: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Generate a response using Gemini API, yielding the text as it is generated
+        """
+        return self.gateway.stream(self._full_prompt(prompt, context), "gemini.response")
+
     async def chat_with_history(
         self,
         messages: List[dict],
@@ -41,28 +44,21 @@ class GeminiService:
         Chat with history using Gemini API
         """
         try:
-            # Convert messages to LangChain format
-            langchain_messages = []
-            for msg in messages:
-                if msg["role"] == "system":
-                    langchain_messages.append(SystemMessage(content=msg["content"]))
-                else:
-                    langchain_messages.append(HumanMessage(content=msg["content"]))
-
-            # Add context if provided
+            # System messages and the context lead the prompt, then the conversation turns
+            system = [msg["content"] for msg in messages if msg["role"] == "system"]
             if context:
-                langchain_messages.insert(0, SystemMessage(content=f"Context: {context}"))
+                system.insert(0, f"Context: {context}")
+            turns = [f"{msg['role']}: {msg['content']}" for msg in messages if msg["role"] != "system"]
+            prompt = "\n\n".join(system + turns)
 
-            # Generate response
-            response = await self.chat_model.agenerate([langchain_messages])
-            return response.generations[0][0].text
+            return await self.gateway.generate(prompt, "gemini.chat", temperature=CHAT_TEMPERATURE)
         except Exception as e:
             print(f"Error in chat with history: {str(e)}")
             return "I apologize, but I encountered an error while processing your request."
 
-    async def analyze_document(self, document_content: str, question: str) -> str:
+    async def analyze_document(self, document_content: str, question: str, bypass_cache: bool = False) -> str:
         """
-        Analyze a document and answer questions about it
+        Analyze a document and answer questions about it (cached unless bypass_cache)
         """
         try:
             prompt = f"""Document Content:
@@ -73,15 +69,20 @@ Question: {question}
 Please analyze the document and answer the question based on its content. 
 If the answer cannot be found in the document, please state that clearly."""
 
-            response = self.model.generate_content(prompt)
-            return response.text
+            return await self.gateway.generate(
+                prompt,
+                "gemini.analysis",
+                cache_version=ANALYSIS_PROMPT_VERSION,
+                cache_inputs={"document": document_content, "question": question},
+                bypass_cache=bypass_cache
+            )
         except Exception as e:
             print(f"Error analyzing document: {str(e)}")
             return "I apologize, but I encountered an error while analyzing the document."
 
-    async def summarize_document(self, document_content: str) -> str:
+    async def summarize_document(self, document_content: str, bypass_cache: bool = False) -> str:
         """
-        Generate a summary of the document
+        Generate a summary of the document (cached unless bypass_cache)
         """
         try:
             prompt = f"""Please provide a concise summary of the following document:
@@ -90,8 +91,13 @@ If the answer cannot be found in the document, please state that clearly."""
 
 Focus on the key points and main arguments."""
 
-            response = self.model.generate_content(prompt)
-            return response.text
+            return await self.gateway.generate(
+                prompt,
+                "gemini.summary",
+                cache_version=SUMMARY_PROMPT_VERSION,
+                cache_inputs={"document": document_content},
+                bypass_cache=bypass_cache
+            )
         except Exception as e:
             print(f"Error summarizing document: {str(e)}")
             return "I apologize, but I encountered an error while summarizing the document." 
\ No newline at end of file
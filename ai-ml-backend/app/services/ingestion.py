@@ -0,0 +1,325 @@
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Iterable, Deque, Tuple
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import numpy as np
+from ..core.config import settings
+from .document_processor import DocumentProcessor
+from .embeddings import EmbeddingsService
+from .chunk_store import ChunkStore, chunk_fingerprint
+
+_DONE = object()
+
+
+class _PipelineAborted(Exception):
+    """Raised inside the parse thread when a downstream stage has failed."""
+
+
+def _add_normalized(total: Optional[np.ndarray], embeddings: List[List[float]]) -> Optional[np.ndarray]:
+    """Add the L2-normalized `embeddings` to a running sum."""
+    if not embeddings:
+        return total
+    matrix = np.asarray(embeddings, dtype=np.float64)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    return matrix.sum(axis=0) if total is None else total + matrix.sum(axis=0)
+
+
+class IngestionPipeline:
+    """Staged, incremental document ingestion: parse -> embed -> upsert.
+
+    Parsing runs in a worker thread (PDF pages are further fanned out to the
+    processor's process pool). Embedding and upsert run as concurrent tasks on
+    the event loop. The stages are joined by bounded queues, so a slow stage
+    applies backpressure upstream instead of buffering the whole document.
+
+    Vector IDs are derived from chunk content, and every run is diffed against
+    the chunk manifest stored for the document: unchanged chunks are skipped,
+    chunks that are not new get a metadata update (document-level fields such
+    as the upload time change with every run), new chunks are embedded and
+    upserted, and vectors of chunks that disappeared are deleted. Finally the
+    document's centroid (the normalized mean of its chunk embeddings) is
+    stored for two-stage search; the sum behind it is kept with the manifest,
+    so the next run only adjusts it by the chunks that changed.
+    """
+
+    def __init__(self, document_processor: DocumentProcessor, embeddings_service: EmbeddingsService, chunk_store: ChunkStore):
+        self.document_processor = document_processor
+        self.embeddings_service = embeddings_service
+        self.chunk_store = chunk_store
+        self.batch_size = settings.INGEST_BATCH_SIZE
+        self.queue_size = settings.INGEST_QUEUE_SIZE
+        self.upsert_concurrency = settings.VECTOR_STORE_POOL_SIZE
+
+    async def ingest(
+        self,
+        document_id: str,
+        file_path: Optional[str] = None,
+        chunks: Optional[Iterable[Dict[str, Any]]] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        resume_from: int = 0,
+        progress: Optional[Dict[str, int]] = None,
+        on_checkpoint: Optional[Callable[[int], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """Run a document (a file, or already chunked text) through the pipeline.
+
+        Chunking is deterministic, so `resume_from` skips the chunks before that
+        position (handled by an earlier attempt) without looking at them again.
+        `progress` is updated in place with per-stage counters (plus how many
+        embeddings were reused from the embedding cache), and `on_checkpoint`
+        is awaited with the position up to which all chunks are stored after
+        every batch. A batch's counters are only added once its checkpoint is
+        reached, so at each checkpoint `progress` covers exactly the chunks
+        before it, and a run resumed from there does not count any twice.
+        """
+        if chunks is None:
+            chunks = self.document_processor.iter_chunks(file_path)
+        # Each user's vectors live in their own namespace of the index
+        namespace = (metadata or {}).get("user_id")
+
+        loop = asyncio.get_running_loop()
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        vector_queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        manifest = await asyncio.to_thread(self.chunk_store.get_manifest, document_id)
+        new_manifest: List[Dict[str, Any]] = []
+        if progress is None:
+            progress = {}
+        progress.update(pages_parsed=0, chunks_parsed=0)
+        for counter in ("chunks_embedded", "embeddings_reused", "vectors_upserted", "chunks_unchanged", "vectors_deleted"):
+            progress.setdefault(counter, 0)
+        # Vector IDs embedded by this run and the sum of their normalized embeddings
+        embedded: Dict[str, Any] = {"vector_ids": set(), "sum": None}
+
+        tasks = [
+            asyncio.ensure_future(asyncio.to_thread(
+                self._parse, chunks, document_id, manifest, new_manifest, resume_from, progress, chunk_queue, loop, stop
+            )),
+            asyncio.ensure_future(self._embed(document_id, metadata, embedded, chunk_queue, vector_queue)),
+            asyncio.ensure_future(self._upsert(namespace, progress, on_checkpoint, vector_queue)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            stop.set()
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+        # Only drop old vectors once every new one is in place
+        kept = {chunk["vector_id"] for chunk in new_manifest}
+        removed = [vector_id for vector_id in manifest if vector_id not in kept]
+        embedding_sum = None
+        if settings.DOCUMENT_VECTORS and new_manifest:
+            embedding_sum = await self._embedding_sum(document_id, manifest, new_manifest, removed, embedded, resume_from, namespace)
+        if removed:
+            await self.embeddings_service.delete_vectors(removed, namespace=namespace)
+            progress["vectors_deleted"] += len(removed)
+        await asyncio.to_thread(self.chunk_store.replace_manifest, document_id, new_manifest, embedding_sum)
+        if settings.DOCUMENT_VECTORS:
+            await self.embeddings_service.upsert_document_vector(document_id, embedding_sum, len(new_manifest), metadata, namespace)
+
+        return {
+            "chunks": len(new_manifest),
+            "vector_ids": [chunk["vector_id"] for chunk in new_manifest],
+            "embeddings_reused": progress["embeddings_reused"],
+            "chunks_unchanged": progress["chunks_unchanged"],
+            "vectors_deleted": len(removed)
+        }
+
+    def _parse(
+        self,
+        chunks: Iterable[Dict[str, Any]],
+        document_id: str,
+        manifest: Dict[str, Dict[str, Any]],
+        new_manifest: List[Dict[str, Any]],
+        resume_from: int,
+        progress: Dict[str, int],
+        chunk_queue: asyncio.Queue,
+        loop: asyncio.AbstractEventLoop,
+        stop: threading.Event
+    ):
+        """Parse stage. Runs in a worker thread, diffs chunks and feeds batches to the loop."""
+        occurrences: Dict[str, int] = {}
+        batch = []
+        for position, chunk in enumerate(chunks):
+            fingerprint = chunk_fingerprint(chunk["text"])
+            occurrence = occurrences.get(fingerprint, 0)
+            occurrences[fingerprint] = occurrence + 1
+            chunk = {
+                **chunk,
+                "chunk_index": position,
+                "vector_id": f"{document_id}_{fingerprint[:16]}_{occurrence}",
+                "fingerprint": fingerprint
+            }
+            new_manifest.append({key: chunk[key] for key in ("chunk_index", "vector_id", "fingerprint", "metadata")})
+            progress["chunks_parsed"] += 1
+            progress["pages_parsed"] = max(progress["pages_parsed"], chunk["metadata"].get("page_end", 0))
+            if position < resume_from:
+                continue
+
+            stored = manifest.get(chunk["vector_id"])
+            if stored is None:
+                chunk["action"] = "add"
+            elif stored["chunk_index"] != position or stored["metadata"] != chunk["metadata"]:
+                chunk["action"] = "move"
+            else:
+                chunk["action"] = "keep"
+            batch.append(chunk)
+            if len(batch) >= self.batch_size:
+                self._put_batch(document_id, batch, chunk_queue, loop, stop)
+                batch = []
+        if batch:
+            self._put_batch(document_id, batch, chunk_queue, loop, stop)
+        self._put_from_thread(chunk_queue, _DONE, loop, stop)
+
+    def _put_batch(self, document_id: str, batch: List[Dict[str, Any]], chunk_queue: asyncio.Queue, loop: asyncio.AbstractEventLoop, stop: threading.Event):
+        """Store a batch's chunk texts, then hand the batch to the embedding stage."""
+        # Texts go in before the manifest that references them is replaced, reserved until it is
+        self.chunk_store.put_texts({chunk["fingerprint"]: chunk["text"] for chunk in batch}, document_id)
+        self._put_from_thread(chunk_queue, batch, loop, stop)
+
+    @staticmethod
+    def _put_from_thread(queue: asyncio.Queue, item: Any, loop: asyncio.AbstractEventLoop, stop: threading.Event):
+        """Block the calling thread until the loop accepts the item, or the pipeline stops."""
+        future = asyncio.run_coroutine_threadsafe(queue.put(item), loop)
+        while True:
+            try:
+                return future.result(timeout=0.5)
+            except FutureTimeoutError:
+                if stop.is_set():
+                    future.cancel()
+                    raise _PipelineAborted()
+
+    async def _embed(
+        self,
+        document_id: str,
+        metadata: Optional[Dict[str, Any]],
+        embedded: Dict[str, Any],
+        chunk_queue: asyncio.Queue,
+        vector_queue: asyncio.Queue
+    ):
+        """Embedding stage. Only added chunks are embedded.
+
+        The other chunks already have vectors; moved ones, and with document
+        metadata every one of them, are passed on for a metadata refresh. Each
+        batch goes on with its own counters, added to the progress when the
+        batch is checkpointed.
+        """
+        while True:
+            batch = await chunk_queue.get()
+            if batch is _DONE:
+                await vector_queue.put(_DONE)
+                return
+            added = [chunk for chunk in batch if chunk["action"] == "add"]
+            # Kept chunks still carry the previous run's filename, metadata and upload time
+            refreshed = [
+                (chunk["vector_id"], self._vector_metadata(chunk, metadata))
+                for chunk in batch
+                if chunk["action"] == "move" or (chunk["action"] == "keep" and metadata)
+            ]
+            counts = {"chunks_unchanged": len(batch) - len(added), "chunks_embedded": 0, "embeddings_reused": 0, "vectors_upserted": 0}
+
+            vectors = []
+            if added:
+                embeddings = await self.embeddings_service.generate_embeddings([chunk["text"] for chunk in added], stats=counts)
+                vectors = self.embeddings_service.build_vectors(document_id, added, embeddings, metadata=metadata)
+                counts["chunks_embedded"] = len(added)
+                embedded["vector_ids"].update(chunk["vector_id"] for chunk in added)
+                embedded["sum"] = _add_normalized(embedded["sum"], embeddings)
+            await vector_queue.put((vectors, refreshed, batch[-1]["chunk_index"] + 1, counts))
+
+    @staticmethod
+    def _vector_metadata(chunk: Dict[str, Any], metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Metadata fields of an existing chunk's vector that can change between runs."""
+        fields = {"chunk_index": chunk["chunk_index"], **chunk["metadata"], **(metadata or {})}
+        # Pinecone rejects null metadata values
+        return {key: value for key, value in fields.items() if value is not None}
+
+    async def _embedding_sum(
+        self,
+        document_id: str,
+        manifest: Dict[str, Dict[str, Any]],
+        new_manifest: List[Dict[str, Any]],
+        removed: List[str],
+        embedded: Dict[str, Any],
+        resume_from: int,
+        namespace: Optional[str]
+    ) -> Optional[np.ndarray]:
+        """Sum of the normalized embeddings of every chunk in the new manifest, for the document's centroid.
+
+        Nothing is re-embedded. The sum stored with the previous manifest is
+        adjusted by the vectors this run added and removed (the removed ones
+        are fetched from the index before they are deleted). Without a stored
+        sum to start from (a resumed run, or a document ingested before sums
+        were kept), the vectors this run did not embed are fetched instead.
+        """
+        stored = await asyncio.to_thread(self.chunk_store.get_embedding_sum, document_id)
+        if resume_from == 0 and (not manifest or (stored is not None and stored[1] == len(manifest))):
+            found = await self.embeddings_service.fetch_vectors(removed, namespace=namespace)
+            if len(found) == len(removed):
+                total = stored[0] if manifest else None
+                if embedded["sum"] is not None:
+                    total = embedded["sum"] if total is None else total + embedded["sum"]
+                gone = _add_normalized(None, list(found.values()))
+                return total if gone is None else total - gone
+        missing = [chunk["vector_id"] for chunk in new_manifest if chunk["vector_id"] not in embedded["vector_ids"]]
+        found = await self.embeddings_service.fetch_vectors(missing, namespace=namespace)
+        return _add_normalized(embedded["sum"], list(found.values()))
+
+    async def _upsert(
+        self,
+        namespace: Optional[str],
+        progress: Dict[str, int],
+        on_checkpoint: Optional[Callable[[int], Awaitable[None]]],
+        vector_queue: asyncio.Queue
+    ):
+        """Upsert stage. Also refreshes the metadata of chunks that were not re-embedded.
+
+        Up to `upsert_concurrency` batches are written at once. Checkpoints are
+        still reported in order, each once every batch before it is stored.
+        """
+        in_flight: Deque[Tuple[asyncio.Future, int, Dict[str, int]]] = deque()
+
+        async def settle_oldest():
+            task, position, counts = in_flight.popleft()
+            await task
+            for counter, count in counts.items():
+                progress[counter] += count
+            if on_checkpoint is not None:
+                await on_checkpoint(position)
+
+        try:
+            while True:
+                item = await vector_queue.get()
+                if item is _DONE:
+                    break
+                vectors, refreshed, position, counts = item
+                in_flight.append((asyncio.ensure_future(self._store_batch(vectors, refreshed, namespace, counts)), position, counts))
+                if len(in_flight) >= self.upsert_concurrency:
+                    await settle_oldest()
+            while in_flight:
+                await settle_oldest()
+        except BaseException:
+            for task, _, _ in in_flight:
+                task.cancel()
+            await asyncio.gather(*(task for task, _, _ in in_flight), return_exceptions=True)
+            raise
+
+    async def _store_batch(
+        self,
+        vectors: List[Any],
+        refreshed: List[Tuple[str, Dict[str, Any]]],
+        namespace: Optional[str],
+        counts: Dict[str, int]
+    ):
+        """Upsert one batch's new vectors and update the metadata of its other chunks."""
+        if vectors:
+            await self.embeddings_service.upsert_vectors(vectors, namespace=namespace)
+            counts["vectors_upserted"] += len(vectors)
+        if refreshed:
+            await asyncio.gather(*(
+                self.embeddings_service.update_vector_metadata(vector_id, vector_metadata, namespace=namespace)
+                for vector_id, vector_metadata in refreshed
+            ))
@@ -0,0 +1,261 @@
+from typing import List, Dict, Any, Optional
+import asyncio
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+import uuid
+from contextlib import closing
+from datetime import datetime
+from ..core.config import settings
+from .ingestion import IngestionPipeline
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FIELDS = (
+    "pages_parsed", "chunks_parsed", "chunks_embedded", "embeddings_reused",
+    "chunks_unchanged", "vectors_upserted", "vectors_deleted"
+)
+
+
+class JobStore:
+    """SQLite-backed queue of ingestion jobs.
+
+    Jobs are claimed under a lease that the owning worker keeps renewing. A job
+    whose lease expires (its worker crashed or was killed) becomes claimable
+    again and resumes from its last checkpoint. This also makes the queue safe
+    to share between several uvicorn worker processes. Only one job per
+    document runs at a time, since each one diffs against the last. A failed
+    job that is re-queued waits until its `not_before` time, so a document
+    that keeps failing does not use up its attempts back to back.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    document_id TEXT NOT NULL,
+                    file_path TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    checkpoint INTEGER NOT NULL DEFAULT 0,
+                    progress TEXT NOT NULL,
+                    error TEXT,
+                    lease_expires_at REAL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "not_before" not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN not_before REAL")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def create_job(self, document_id: str, file_path: str, metadata: Dict[str, Any]) -> str:
+        """Queue a new ingestion job and return its ID."""
+        job_id = str(uuid.uuid4())
+        now = datetime.utcnow().isoformat()
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, document_id, file_path, metadata, status, progress, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, document_id, file_path, json.dumps(metadata), json.dumps({field: 0 for field in PROGRESS_FIELDS}), now, now)
+            )
+        return job_id
+
+    def claim_next(self, lease_seconds: float) -> Optional[Dict[str, Any]]:
+        """Atomically claim the oldest runnable job, or return None."""
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Jobs for the same document run one at a time, in upload order
+            now = time.time()
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE ((status = 'queued' AND (not_before IS NULL OR not_before <= ?)) "
+                "OR (status = 'running' AND lease_expires_at < ?)) "
+                "AND document_id NOT IN (SELECT document_id FROM jobs WHERE status = 'running' AND lease_expires_at >= ?) "
+                "ORDER BY created_at LIMIT 1",
+                (now, now, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (time.time() + lease_seconds, datetime.utcnow().isoformat(), row["id"])
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        job = self._to_dict(row)
+        job["attempts"] += 1
+        return job
+
+    def heartbeat(self, job_id: str, lease_seconds: float):
+        """Extend the job's lease.
+
+        Progress is only saved with checkpoints: a resumed job counts again
+        from its checkpoint, so counters saved ahead of it would count twice.
+        """
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET lease_expires_at = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+                (time.time() + lease_seconds, datetime.utcnow().isoformat(), job_id)
+            )
+
+    def checkpoint(self, job_id: str, position: int, progress: Dict[str, int], lease_seconds: float):
+        """Durably record that every chunk before `position` is stored."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET checkpoint = ?, progress = ?, lease_expires_at = ?, updated_at = ? WHERE id = ? AND status = 'running'",
+                (position, json.dumps(progress), time.time() + lease_seconds, datetime.utcnow().isoformat(), job_id)
+            )
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        progress: Dict[str, int],
+        error: Optional[str] = None,
+        not_before: Optional[float] = None
+    ):
+        """Move a job to a final (or re-queued) status; a re-queued job is not claimed before `not_before`."""
+        with closing(self._connect()) as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, error = ?, not_before = ?, lease_expires_at = NULL, updated_at = ? WHERE id = ?",
+                (status, json.dumps(progress), error, not_before, datetime.utcnow().isoformat(), job_id)
+            )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Retrieve a job by ID."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["metadata"] = json.loads(job["metadata"])
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+
+class IngestionWorkerPool:
+    """Pool of asyncio workers draining the job store through the ingestion pipeline."""
+
+    def __init__(self, store: JobStore, pipeline: IngestionPipeline):
+        self.store = store
+        self.pipeline = pipeline
+        self.workers = settings.JOB_WORKERS
+        self.lease_seconds = settings.JOB_LEASE_SECONDS
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Start the worker tasks on the running event loop."""
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._run_worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the worker tasks. Interrupted jobs resume once their lease expires."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers after a job has been queued."""
+        self._wakeup.set()
+
+    async def _run_worker(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim_next, self.lease_seconds)
+            except Exception:
+                logger.exception("Failed to claim ingestion job")
+                job = None
+
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._process(job)
+
+    async def _process(self, job: Dict[str, Any]):
+        """Run one job, checkpointing after every upserted batch."""
+        progress = job["progress"]
+        # Progress as of the last checkpoint, which is what a retry resumes from;
+        # the pipeline only adds a batch's counters when its checkpoint is reached
+        checkpointed = dict(progress)
+
+        async def on_checkpoint(position: int):
+            checkpointed.clear()
+            checkpointed.update(progress)
+            await asyncio.to_thread(self.store.checkpoint, job["id"], position, dict(checkpointed), self.lease_seconds)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job["id"]))
+        try:
+            await self.pipeline.ingest(
+                document_id=job["document_id"],
+                file_path=job["file_path"],
+                metadata=job["metadata"],
+                resume_from=job["checkpoint"],
+                progress=progress,
+                on_checkpoint=on_checkpoint
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception("Ingestion job %s failed", job["id"])
+            if job["attempts"] < settings.JOB_MAX_ATTEMPTS:
+                # Retried from the checkpoint, after a backoff
+                await asyncio.to_thread(
+                    self.store.finish, job["id"], "queued", dict(checkpointed), str(e), time.time() + self._retry_delay(job["attempts"])
+                )
+            else:
+                await asyncio.to_thread(self.store.finish, job["id"], "failed", dict(progress), str(e))
+                await asyncio.to_thread(self._remove_file, job["file_path"])
+                # Texts this job stored for a manifest it never wrote would otherwise be kept forever
+                await asyncio.to_thread(self.pipeline.chunk_store.release_texts, job["document_id"])
+            return
+        finally:
+            heartbeat.cancel()
+
+        await asyncio.to_thread(self.store.finish, job["id"], "completed", dict(progress))
+        await asyncio.to_thread(self._remove_file, job["file_path"])
+
+    async def _heartbeat(self, job_id: str):
+        """Periodically renew the lease while a job runs."""
+        while True:
+            await asyncio.sleep(settings.JOB_PROGRESS_INTERVAL)
+            await asyncio.to_thread(self.store.heartbeat, job_id, self.lease_seconds)
+
+    @staticmethod
+    def _retry_delay(attempts: int) -> float:
+        """Seconds a job waits after its `attempts`-th failure: exponential, jittered and capped."""
+        delay = min(settings.JOB_RETRY_MAX_BACKOFF_SECONDS, settings.JOB_RETRY_BACKOFF_SECONDS * (2 ** (attempts - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    @staticmethod
+    def _remove_file(file_path: str):
+        if os.path.exists(file_path):
+            os.remove(file_path)
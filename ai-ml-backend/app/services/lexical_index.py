@@ -0,0 +1,519 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from collections import Counter
+import heapq
+import json
+import math
+import os
+import re
+import sqlite3
+import struct
+import threading
+import numpy as np
+from .vector_stores import LocalVectorStore
+
+# Section numbers such as "14.2(b)" stay one token; words keep inner apostrophes and hyphens
+TOKEN = re.compile(r"§|\d+(?:\.\d+)*(?:\([a-z0-9]{1,4}\))*|[a-z]+(?:['’-][a-z]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased index terms of `text`; exact tokens are kept, nothing is stemmed."""
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _width(value: int) -> int:
+    for width in (1, 2, 4):
+        if value < 1 << (8 * width):
+            return width
+    return 8
+
+
+def encode_postings(docs: np.ndarray, freqs: np.ndarray) -> bytes:
+    """Pack a sorted postings list as the first doc ID plus doc ID gaps and term frequencies.
+
+    Gaps and frequencies are each stored at the narrowest byte width that
+    fits their largest value, which for most terms is one byte per entry.
+    """
+    gaps = np.diff(docs)
+    gap_width = _width(int(gaps.max())) if gaps.size else 1
+    freq_width = _width(int(freqs.max()))
+    return (
+        struct.pack("<IQBB", len(docs), int(docs[0]), gap_width, freq_width)
+        + gaps.astype(f"<u{gap_width}").tobytes()
+        + freqs.astype(f"<u{freq_width}").tobytes()
+    )
+
+
+def decode_postings(data: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """Inverse of encode_postings: (doc IDs, term frequencies)."""
+    count, first, gap_width, freq_width = struct.unpack_from("<IQBB", data)
+    offset = struct.calcsize("<IQBB")
+    gaps = np.frombuffer(data, dtype=f"<u{gap_width}", count=count - 1, offset=offset)
+    freqs = np.frombuffer(data, dtype=f"<u{freq_width}", count=count, offset=offset + (count - 1) * gap_width)
+    docs = np.empty(count, dtype=np.int64)
+    docs[0] = first
+    np.cumsum(gaps, dtype=np.int64, out=docs[1:])
+    docs[1:] += first
+    return docs, freqs.astype(np.float32)
+
+
+def reciprocal_rank_fusion(rankings: List[List[Dict[str, Any]]], k: int = 60) -> List[Dict[str, Any]]:
+    """Merge ranked match lists by reciprocal rank fusion: score = sum of 1 / (k + rank).
+
+    Matches are identified by "id"; the first list a match appears in
+    supplies its metadata.
+    """
+    fused: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, match in enumerate(ranking, start=1):
+            entry = fused.setdefault(match["id"], {**match, "score": 0.0})
+            entry["score"] += 1.0 / (k + rank)
+    return sorted(fused.values(), key=lambda match: match["score"], reverse=True)
+
+
+class LexicalIndex:
+    """Embedded BM25 index over chunk text, kept next to the vector index.
+
+    Chunks get increasing integer doc IDs. Each upsert batch is written as a
+    small segment of per-term postings lists (compressed with
+    encode_postings) in SQLite, and segments are merged in tiers of
+    MERGE_FACTOR, dropping deleted chunks, so a term has at most a few
+    postings lists to read however many batches were indexed. Deletes and
+    overwrites only mark the old doc ID dead.
+
+    Like LocalVectorStore, every write bumps a version, and each process keeps
+    in-memory arrays (liveness, length, namespace, document, upload time) per
+    doc ID, refreshed from the rows changed since its last sync. Those arrays
+    supply the BM25 collection statistics and apply the namespace and
+    metadata filter to a query's postings before scoring.
+    """
+
+    MERGE_FACTOR = 8
+
+    def __init__(self, path: str, k1: float = 1.2, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._lock = threading.RLock()
+
+        # In-memory view of the docs table
+        self._version = 0
+        self._alive = np.zeros(0, dtype=bool)
+        self._lengths = np.zeros(0, dtype=np.float32)
+        self._namespaces = np.zeros(0, dtype=np.int32)
+        self._documents = np.zeros(0, dtype=np.int32)
+        self._uploaded = np.zeros(0, dtype=np.float64)
+        self._codes: Dict[str, Dict[str, int]] = {"document_id": {}, "namespace": {}}
+        self._live_docs = 0
+        self._total_length = 0.0
+
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS docs (
+                doc INTEGER PRIMARY KEY,
+                vector_id TEXT NOT NULL,
+                namespace TEXT,
+                document_id TEXT,
+                uploaded_at REAL,
+                length INTEGER NOT NULL,
+                metadata TEXT,
+                alive INTEGER NOT NULL,
+                version INTEGER NOT NULL
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS docs_live ON docs (vector_id) WHERE alive = 1;
+            CREATE INDEX IF NOT EXISTS docs_version ON docs (version);
+            CREATE INDEX IF NOT EXISTS docs_document ON docs (document_id) WHERE alive = 1;
+            CREATE TABLE IF NOT EXISTS segments (
+                segment INTEGER PRIMARY KEY AUTOINCREMENT,
+                level INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                segment INTEGER NOT NULL,
+                term TEXT NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (segment, term)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS postings_term ON postings (term);
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self._sync()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _state(conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _set_state(conn: sqlite3.Connection, key: str, value: int):
+        conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    # In-memory view
+
+    def _sync(self):
+        """Apply docs changed by any process since the last sync."""
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            try:
+                self._sync_in(conn)
+            finally:
+                conn.execute("COMMIT")
+
+    def _sync_in(self, conn: sqlite3.Connection):
+        """Apply changed docs as seen by the transaction open on `conn`.
+
+        Callers that go on to read postings in the same transaction get an
+        in-memory view that matches exactly the postings they read.
+        """
+        version = self._state(conn, "version")
+        if version == self._version:
+            return
+        changed = conn.execute(
+            "SELECT doc, alive, length, namespace, document_id, uploaded_at FROM docs WHERE version > ?",
+            (self._version,)
+        ).fetchall()
+
+        if changed:
+            self._grow(max(row[0] for row in changed) + 1)
+        for doc, alive, length, namespace, document_id, uploaded_at in changed:
+            if self._alive[doc]:
+                self._live_docs -= 1
+                self._total_length -= float(self._lengths[doc])
+            self._alive[doc] = bool(alive)
+            self._lengths[doc] = length
+            self._namespaces[doc] = self._code("namespace", namespace)
+            self._documents[doc] = self._code("document_id", document_id)
+            self._uploaded[doc] = np.nan if uploaded_at is None else uploaded_at
+            if alive:
+                self._live_docs += 1
+                self._total_length += length
+        self._version = version
+
+    def _grow(self, docs: int):
+        if docs > len(self._alive):
+            extra = max(docs, 2 * len(self._alive), 1024) - len(self._alive)
+            self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+            self._lengths = np.concatenate([self._lengths, np.zeros(extra, dtype=np.float32)])
+            self._namespaces = np.concatenate([self._namespaces, np.full(extra, -1, dtype=np.int32)])
+            self._documents = np.concatenate([self._documents, np.full(extra, -1, dtype=np.int32)])
+            self._uploaded = np.concatenate([self._uploaded, np.full(extra, np.nan)])
+
+    def _code(self, field: str, value: Optional[str]) -> int:
+        if value is None:
+            return -1
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    # Writes
+
+    def upsert(self, chunks: List[Tuple[str, Dict[str, Any]]], namespace: Optional[str] = None):
+        """Index (vector_id, metadata) chunks, replacing earlier versions.
+
+        The text to index is metadata["text"]; it is not kept in the stored metadata.
+        """
+        latest = dict(chunks)
+        if not latest:
+            return
+        term_counts = [Counter(tokenize(metadata.get("text", ""))) for metadata in latest.values()]
+
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._state(conn, "version") + 1
+                first_doc = self._state(conn, "next_doc")
+                self._mark_dead(conn, "vector_id IN ({})", list(latest), version)
+                conn.executemany(
+                    "INSERT INTO docs (doc, vector_id, namespace, document_id, uploaded_at, length, metadata, alive, version) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)",
+                    [
+                        (
+                            first_doc + i,
+                            vector_id,
+                            namespace,
+                            metadata.get("document_id"),
+                            metadata.get("uploaded_at"),
+                            sum(counts.values()),
+                            json.dumps({key: value for key, value in metadata.items() if key != "text"}),
+                            version
+                        )
+                        for i, ((vector_id, metadata), counts) in enumerate(zip(latest.items(), term_counts))
+                    ]
+                )
+
+                postings: Dict[str, Tuple[List[int], List[int]]] = {}
+                for i, counts in enumerate(term_counts):
+                    for term, freq in counts.items():
+                        docs, freqs = postings.setdefault(term, ([], []))
+                        docs.append(first_doc + i)
+                        freqs.append(freq)
+                segment = conn.execute("INSERT INTO segments (level) VALUES (0)").lastrowid
+                conn.executemany(
+                    "INSERT INTO postings (segment, term, data) VALUES (?, ?, ?)",
+                    [
+                        (segment, term, encode_postings(np.asarray(docs, dtype=np.int64), np.asarray(freqs)))
+                        for term, (docs, freqs) in postings.items()
+                    ]
+                )
+                self._set_state(conn, "next_doc", first_doc + len(latest))
+                self._set_state(conn, "version", version)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._sync()
+            self._merge_segments()
+
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None):
+        """Overwrite selected metadata fields of an indexed chunk; its terms are unchanged."""
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT doc, metadata FROM docs WHERE vector_id = ? AND namespace IS ? AND alive = 1", (vector_id, namespace)
+                ).fetchone()
+                if row is not None:
+                    version = self._state(conn, "version") + 1
+                    merged = {**json.loads(row[1]), **metadata}
+                    conn.execute(
+                        "UPDATE docs SET metadata = ?, uploaded_at = ?, version = ? WHERE doc = ?",
+                        (json.dumps(merged), merged.get("uploaded_at"), version, row[0])
+                    )
+                    self._set_state(conn, "version", version)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._sync()
+
+    def delete(self, vector_ids: List[str], namespace: Optional[str] = None):
+        """Remove chunks by vector ID."""
+        self._delete("vector_id IN ({}) AND namespace IS ?", vector_ids, namespace)
+
+    def delete_document(self, document_id: str, namespace: Optional[str] = None):
+        """Remove every chunk of a document."""
+        self._delete("document_id IN ({}) AND namespace IS ?", [document_id], namespace)
+
+    def _delete(self, where: str, values: List[str], namespace: Optional[str]):
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._state(conn, "version") + 1
+                self._mark_dead(conn, where, values, version, [namespace])
+                self._set_state(conn, "version", version)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._sync()
+
+    @staticmethod
+    def _mark_dead(conn: sqlite3.Connection, where: str, values: List[str], version: int, params: List[Any] = ()):
+        """Mark live docs matching `where` (its "{}" filled with placeholders for `values`) dead."""
+        for i in range(0, len(values), 500):
+            batch = values[i:i + 500]
+            conn.execute(
+                f"UPDATE docs SET alive = 0, metadata = NULL, version = ? WHERE alive = 1 AND {where.format(','.join('?' * len(batch)))}",
+                (version, *batch, *params)
+            )
+
+    def _merge_segments(self):
+        """Merge every full tier of segments into one segment of the next tier."""
+        while True:
+            conn = self._conn()
+            full = conn.execute(
+                "SELECT level FROM segments GROUP BY level HAVING COUNT(*) >= ? ORDER BY level LIMIT 1",
+                (self.MERGE_FACTOR,)
+            ).fetchone()
+            if full is None:
+                return
+            self._merge(full[0])
+
+    def _merge(self, level: int):
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Synced under the write lock, so no segment can be committed with docs this view lacks
+                self._sync_in(conn)
+                sources = [row[0] for row in conn.execute(
+                    "SELECT segment FROM segments WHERE level = ? ORDER BY segment LIMIT ?", (level, self.MERGE_FACTOR)
+                )]
+                target = conn.execute("INSERT INTO segments (level) VALUES (?)", (level + 1,)).lastrowid
+                merged = []
+                for term, parts in self._merged_terms(conn, sources):
+                    docs = np.concatenate([docs for docs, _ in parts])
+                    freqs = np.concatenate([freqs for _, freqs in parts])
+                    # Drop deleted docs; doc IDs only ever grow, so no re-sort is needed
+                    live = self._alive[docs]
+                    if live.any():
+                        merged.append((target, term, encode_postings(docs[live], freqs[live])))
+                    if len(merged) >= 5000:
+                        conn.executemany("INSERT INTO postings (segment, term, data) VALUES (?, ?, ?)", merged)
+                        merged = []
+                conn.executemany("INSERT INTO postings (segment, term, data) VALUES (?, ?, ?)", merged)
+                placeholders = ",".join("?" * len(sources))
+                conn.execute(f"DELETE FROM postings WHERE segment IN ({placeholders})", sources)
+                conn.execute(f"DELETE FROM segments WHERE segment IN ({placeholders})", sources)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    @staticmethod
+    def _merged_terms(conn: sqlite3.Connection, segments: List[int]) -> Iterator[Tuple[str, List[Tuple[np.ndarray, np.ndarray]]]]:
+        """Yield (term, decoded postings of each segment, oldest first), in term order, streaming every segment."""
+        def rows(position: int, segment: int):
+            for term, data in conn.execute("SELECT term, data FROM postings WHERE segment = ? ORDER BY term", (segment,)):
+                yield term, position, data
+
+        current, parts = None, []
+        for term, _, data in heapq.merge(*(rows(position, segment) for position, segment in enumerate(segments))):
+            if term != current:
+                if parts:
+                    yield current, parts
+                current, parts = term, []
+            parts.append(decode_postings(data))
+        if parts:
+            yield current, parts
+
+    # Search
+
+    def query(
+        self,
+        text: str,
+        top_k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return the `top_k` chunks in `namespace` matching `filter` with the highest BM25 score for `text`.
+
+        Takes the same filter as VectorStore.query and returns matches in the
+        same {"id", "score", "metadata"} form.
+        """
+        terms = sorted(set(tokenize(text)))
+        filter = dict(filter or {})
+        unsupported = set(filter) - {"document_id", "uploaded_at"}
+        if unsupported:
+            raise ValueError(f"Unsupported filter fields: {sorted(unsupported)}")
+        if not terms or top_k <= 0:
+            return []
+
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            try:
+                # Synced in the read transaction, so every doc in the postings read below is in the view
+                self._sync_in(conn)
+                stored: Dict[str, List[bytes]] = {}
+                for term in terms:
+                    stored[term] = [row[0] for row in conn.execute("SELECT data FROM postings WHERE term = ?", (term,))]
+            finally:
+                conn.execute("COMMIT")
+            alive, lengths = self._alive, self._lengths
+            allowed = self._allowed(namespace, filter)
+            live_docs = self._live_docs
+            average_length = self._total_length / live_docs if live_docs else 0.0
+
+        if not live_docs:
+            return []
+        hits, contributions = [], []
+        for term in terms:
+            if not stored[term]:
+                continue
+            parts = [decode_postings(data) for data in stored[term]]
+            docs = np.concatenate([docs for docs, _ in parts])
+            freqs = np.concatenate([freqs for _, freqs in parts])
+            in_view = docs < len(alive)
+            docs, freqs = docs[in_view], freqs[in_view]
+            live = alive[docs]
+            docs, freqs = docs[live], freqs[live]
+            if not docs.size:
+                continue
+            idf = math.log(1 + (live_docs - docs.size + 0.5) / (docs.size + 0.5))
+            keep = allowed(docs)
+            docs, freqs = docs[keep], freqs[keep]
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / average_length)
+            hits.append(docs)
+            contributions.append(idf * freqs * (self.k1 + 1) / (freqs + norm))
+        if not hits:
+            return []
+
+        docs, positions = np.unique(np.concatenate(hits), return_inverse=True)
+        scores = np.bincount(positions, weights=np.concatenate(contributions))
+        k = min(top_k, docs.size)
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return self._matches([(int(docs[i]), float(scores[i])) for i in best])
+
+    def _allowed(self, namespace: Optional[str], filter: Dict[str, Any]):
+        """Build a doc ID mask function for the namespace and metadata filter."""
+        # None is the default namespace (code -1), not every namespace
+        code = -1 if namespace is None else self._codes["namespace"].get(namespace, -2)
+        namespaces = self._namespaces
+        conditions = [lambda docs: namespaces[docs] == code]
+        document_filter = filter.get("document_id")
+        if document_filter is not None:
+            if isinstance(document_filter, dict):
+                unsupported = set(document_filter) - {"$eq", "$in"}
+                if unsupported:
+                    raise ValueError(f"Unsupported document_id operators: {sorted(unsupported)}")
+                values = list(document_filter.get("$in", []))
+                if "$eq" in document_filter:
+                    values.append(document_filter["$eq"])
+            else:
+                values = [document_filter]
+            codes = np.array([self._codes["document_id"].get(value, -2) for value in values], dtype=np.int32)
+            documents = self._documents
+            conditions.append(lambda docs: np.isin(documents[docs], codes))
+        if "uploaded_at" in filter:
+            condition = filter["uploaded_at"]
+            uploaded = self._uploaded
+            conditions.append(lambda docs: LocalVectorStore._range_mask(uploaded[docs], condition))
+
+        def allowed(docs: np.ndarray) -> np.ndarray:
+            mask = np.ones(docs.size, dtype=bool)
+            for condition in conditions:
+                mask &= condition(docs)
+            return mask
+        return allowed
+
+    def _matches(self, hits: List[Tuple[int, float]]) -> List[Dict[str, Any]]:
+        """Attach stored vector IDs and metadata to (doc, score) hits, skipping docs deleted since."""
+        found = {
+            doc: (vector_id, metadata)
+            for doc, vector_id, metadata in self._conn().execute(
+                f"SELECT doc, vector_id, metadata FROM docs WHERE alive = 1 AND doc IN ({','.join('?' * len(hits))})",
+                [doc for doc, _ in hits]
+            )
+        }
+        return [
+            {"id": found[doc][0], "score": score, "metadata": json.loads(found[doc][1])}
+            for doc, score in hits
+            if doc in found
+        ]
+
+    def describe(self) -> Dict[str, Any]:
+        """Return basic statistics."""
+        with self._lock:
+            self._sync()
+            conn = self._conn()
+            segments = conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+            postings_bytes = conn.execute("SELECT COALESCE(SUM(LENGTH(data)), 0) FROM postings").fetchone()[0]
+            return {"chunks": self._live_docs, "segments": segments, "postings_bytes": postings_bytes}
@@ -1,14 +1,16 @@
-from typing import List, Dict, Any
-import google.generativeai as genai
-from ..core.config import settings
+from typing import AsyncIterator, List, Dict, Any, Optional
+from .llm_gateway import LLMGateway, get_llm_gateway
+
+# Versions of the cached prompt templates: bump one when its wording changes, so responses to the old wording are not reused
+SUMMARY_PROMPT_VERSION = 1
+CLAUSES_PROMPT_VERSION = 1
 
 class LLMService:
-    def __init__(self):
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
+    def __init__(self, gateway: Optional[LLMGateway] = None):
+        self.gateway = gateway or get_llm_gateway()
     
-    async def generate_summary(self, text: str) -> str:
-        """Generate a summary of the provided text."""
+    async def generate_summary(self, text: str, bypass_cache: bool = False) -> str:
+        """Generate a summary of the provided text (cached per text unless `bypass_cache`)."""
         try:
             prompt = f"""You are a legal document summarizer. Please provide a concise summary of the key points in the following document:
 
@@ -16,40 +18,54 @@ class LLMService:
 
 Focus on the main arguments, important details, and any legal implications."""
 
-            response = self.model.generate_content(prompt)
-            return response.text
+            return await self.gateway.generate(
+                prompt, "llm.summary", cache_version=SUMMARY_PROMPT_VERSION, cache_inputs={"text": text}, bypass_cache=bypass_cache
+            )
         except Exception as e:
             raise Exception(f"Failed to generate summary: {str(e)}")
     
-    async def answer_question(self, question: str, context: List[str]) -> Dict[str, Any]:
-        """Answer a question based on the provided context."""
-        try:
-            context_text = "\n\n".join(context)
-            prompt = f"""Context:
+    @staticmethod
+    def _answer_prompt(question: str, context: List[str]) -> str:
+        context_text = "\n\n".join(context)
+        return f"""Context:
 {context_text}
 
 Question: {question}
 
 Please answer the question based on the provided context. If the answer cannot be found in the context, please state that clearly."""
-
-            response = self.model.generate_content(prompt)
+    
+    async def answer_question(self, question: str, context: List[str]) -> Dict[str, Any]:
+        """Answer a question based on the provided context."""
+        try:
+            prompt = self._answer_prompt(question, context)
+            answer = await self.gateway.generate(prompt, "llm.answer")
             return {
-                "answer": response.text,
+                "answer": answer,
                 "sources": context
             }
         except Exception as e:
             raise Exception(f"Failed to answer question: {str(e)}")
     
-    async def extract_clauses(self, text: str) -> List[Dict[str, str]]:
-        """Extract and classify legal clauses from the text."""
+    def stream_answer(self, question: str, context: List[str]) -> AsyncIterator[str]:
+        """Answer a question based on the provided context, yielding the text as it is generated."""
+        return self.gateway.stream(self._answer_prompt(question, context), "llm.answer")
+    
+    async def extract_clauses(self, text: str, bypass_cache: bool = False) -> List[Dict[str, str]]:
+        """Extract and classify legal clauses from the text (cached per text unless `bypass_cache`)."""
         try:
-            response = await self.model.generate_content(f"You are a legal document analyzer. Extract and classify legal clauses from the provided text. For each clause, identify its type and content.\n\n{text}")
+            response = await self.gateway.generate(
+                f"You are a legal document analyzer. Extract and classify legal clauses from the provided text. For each clause, identify its type and content.\n\n{text}",
+                "llm.clauses",
+                cache_version=CLAUSES_PROMPT_VERSION,
+                cache_inputs={"text": text},
+                bypass_cache=bypass_cache
+            )
             
             # Parse the response into structured format
             clauses = []
             current_clause = {}
             
-            for line in response.text.split('\n'):
+            for line in response.split('\n'):
                 line = line.strip()
                 if line.startswith('Type:'):
                     if current_clause:
@@ -77,8 +93,6 @@ Please answer the question based on the provided context. If the answer cannot b
                 context_text = "\n\n".join(context)
                 system_message["content"] += f"\n\nContext:\n{context_text}"
             
-            response = await self.model.generate_content(f"{system_message['content']}\n\n" + "\n\n".join([f"{message['role']}: {message['content']}" for message in messages]))
-            
-            return response.text
+            return await self.gateway.generate(f"{system_message['content']}\n\n" + "\n\n".join([f"{message['role']}: {message['content']}" for message in messages]), "llm.chat")
         except Exception as e:
             raise Exception(f"Failed to process chat: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,105 @@
+from typing import AsyncIterator, Optional
+import asyncio
+import hashlib
+import random
+
+
+class TransientLLMError(Exception):
+    """The model provider failed in a way that is worth retrying (rate limit, overload, server error)."""
+
+
+class GeminiLLMBackend:
+    """Text generation with a Gemini model, through the SDK's native async calls."""
+
+    def __init__(self, api_key: str, model: str):
+        # Imported here so the fake backend works without the Gemini SDK installed
+        import google.generativeai as genai
+        from google.api_core import exceptions as google_exceptions
+
+        genai.configure(api_key=api_key)
+        self.model = model
+        self._model = genai.GenerativeModel(model)
+        self._transient_errors = (
+            google_exceptions.ResourceExhausted,
+            google_exceptions.TooManyRequests,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.InternalServerError,
+            google_exceptions.DeadlineExceeded,
+        )
+
+    async def generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+        """Return the full response text for `prompt`."""
+        try:
+            response = await self._model.generate_content_async(prompt, generation_config=self._config(temperature))
+            return response.text
+        except self._transient_errors as e:
+            raise TransientLLMError(str(e)) from e
+
+    async def stream(self, prompt: str, temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield the response text for `prompt` piece by piece, as it is generated."""
+        try:
+            response = await self._model.generate_content_async(prompt, generation_config=self._config(temperature), stream=True)
+            async for chunk in response:
+                yield chunk.text
+        except self._transient_errors as e:
+            raise TransientLLMError(str(e)) from e
+
+    @staticmethod
+    def _config(temperature: Optional[float]):
+        return {"temperature": temperature} if temperature is not None else None
+
+
+class FakeLLMBackend:
+    """Deterministic local model with simulated latency and failures.
+
+    The response is a pseudo-random run of words seeded by a hash of the
+    prompt, so the same prompt always gets the same answer. It takes
+    `first_token_latency` to start and `per_token_latency` for each word, and
+    fails with TransientLLMError at `failure_rate`. Used for offline load
+    tests and local development.
+    """
+
+    WORDS = (
+        "the agreement party shall notice clause termination payment within days liability "
+        "confidential information governing law court breach obligation rent landlord tenant"
+    ).split()
+
+    def __init__(
+        self,
+        model: str = "fake-llm",
+        response_tokens: int = 80,
+        first_token_latency: float = 0.3,
+        per_token_latency: float = 0.01,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.model = model
+        self.response_tokens = response_tokens
+        self.first_token_latency = first_token_latency
+        self.per_token_latency = per_token_latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+
+    async def generate(self, prompt: str, temperature: Optional[float] = None) -> str:
+        self._start()
+        await asyncio.sleep(self.first_token_latency + self.per_token_latency * self.response_tokens)
+        return "".join(self._tokens(prompt))
+
+    async def stream(self, prompt: str, temperature: Optional[float] = None) -> AsyncIterator[str]:
+        self._start()
+        await asyncio.sleep(self.first_token_latency)
+        for token in self._tokens(prompt):
+            yield token
+            await asyncio.sleep(self.per_token_latency)
+
+    def _start(self):
+        self.requests += 1
+        if self._random.random() < self.failure_rate:
+            self.failures += 1
+            raise TransientLLMError("Fake model overloaded")
+
+    def _tokens(self, prompt: str):
+        rng = random.Random(int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big"))
+        return [("" if i == 0 else " ") + rng.choice(self.WORDS) for i in range(self.response_tokens)]
@@ -0,0 +1,45 @@
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+from ..core.disk_cache import DiskCache
+
+
+class LLMResponseCache:
+    """Persistent cache of model responses for deterministic prompts.
+
+    Keys are a hash of (model, prompt template name and version, temperature,
+    hash of each template input). Bumping a template's version when its
+    wording changes retires every response generated from the old wording.
+    Entries carry a TTL and are evicted least recently used once the store
+    outgrows its size budget; like the other disk caches, the SQLite file is
+    shared by every worker on the host.
+
+    Each entry also records how long the model took to produce it, so a hit
+    can report the latency it saved.
+    """
+
+    def __init__(self, path: str, max_bytes: int, ttl_seconds: Optional[float] = None):
+        self.store = DiskCache(path, name="llm_cache", max_bytes=max_bytes, ttl_seconds=ttl_seconds)
+
+    @staticmethod
+    def key(model: str, template: str, version: int, inputs: Dict[str, Any], temperature: Optional[float] = None) -> str:
+        """Cache key of a response to template `template` (at `version`) filled with `inputs`."""
+        hashed = {
+            name: hashlib.sha256(json.dumps(value, sort_keys=True).encode("utf-8")).hexdigest()
+            for name, value in inputs.items()
+        }
+        return hashlib.sha256(
+            json.dumps([model, template, version, temperature, hashed], sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        """Return the cached (response, seconds it took to generate), or None."""
+        value = self.store.get(key)
+        if value is None:
+            return None
+        entry = json.loads(value)
+        return entry["text"], entry["seconds"]
+
+    def set(self, key: str, text: str, seconds: float):
+        """Cache a response and the time it took to generate."""
+        self.store.set(key, json.dumps({"text": text, "seconds": seconds}).encode("utf-8"))
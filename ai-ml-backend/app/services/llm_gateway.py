@@ -0,0 +1,189 @@
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+import asyncio
+import random
+import time
+from ..core.config import settings
+from ..core.metrics import metrics
+from .llm_backends import GeminiLLMBackend, FakeLLMBackend, TransientLLMError
+from .llm_cache import LLMResponseCache
+
+
+class LLMGateway:
+    """The one path from the services to the language model.
+
+    Every call is async end to end. At most `max_concurrency` requests are
+    in flight; further callers wait their turn instead of piling onto the
+    provider. Each attempt is bounded by `timeout` seconds. Transient failures
+    and timeouts are retried with exponential, jittered backoff.
+
+    Identical prompts that are generated at the same time share one request:
+    a second caller waits on the first one's result instead of sending its
+    own. Streams are not shared, and are only retried if they fail before
+    their first token.
+
+    With a response cache, calls that name their prompt template version
+    are answered from it when possible; `llm_cache.saved_latency` records the
+    model time each hit saved.
+    """
+
+    def __init__(
+        self,
+        backend,
+        max_concurrency: int = 8,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        base_backoff: float = 0.5,
+        max_backoff: float = 20.0,
+        cache: Optional[LLMResponseCache] = None
+    ):
+        self.backend = backend
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight: Dict[Tuple[str, Optional[float]], asyncio.Future] = {}
+
+    async def generate(
+        self,
+        prompt: str,
+        name: str = "llm",
+        temperature: Optional[float] = None,
+        cache_version: Optional[int] = None,
+        cache_inputs: Optional[Dict[str, Any]] = None,
+        bypass_cache: bool = False
+    ) -> str:
+        """Return the model's response to `prompt`; `name` prefixes this call's metrics.
+
+        Responses are cached only when `cache_version` is given: `name` and
+        `cache_version` identify the prompt template and `cache_inputs` the
+        values it was filled with (the prompt itself by default). With
+        `bypass_cache` the model is always asked, and its fresh response
+        replaces the cached one.
+        """
+        cache_key = None
+        if self.cache is not None and cache_version is not None:
+            cache_key = self.cache.key(self.backend.model, name, cache_version, cache_inputs or {"prompt": prompt}, temperature)
+            if not bypass_cache:
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    text, seconds = cached
+                    metrics.observe("llm_cache.saved_latency", seconds)
+                    return text
+
+        key = (prompt, temperature)
+        future = self._in_flight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._generate(prompt, name, temperature, cache_key))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            metrics.increment(f"{name}.coalesced")
+        # Shielded, so a caller that gives up does not cancel the request for the others
+        return await asyncio.shield(future)
+
+    async def stream(self, prompt: str, name: str = "llm", temperature: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield the model's response to `prompt` as it is generated.
+
+        Records `<name>.time_to_first_token` and `<name>.stream_duration`; a
+        stream the caller abandons counts under `<name>.streams_abandoned`.
+        The timeout applies to the first token and then to each gap between
+        pieces, not to the whole stream.
+        """
+        started = time.perf_counter()
+        first = True
+        completed = False
+        try:
+            async with self._slot():
+                attempt = 0
+                while True:
+                    stream = self.backend.stream(prompt, temperature)
+                    try:
+                        text = await self._next(stream)
+                        break
+                    except (TransientLLMError, asyncio.TimeoutError) as e:
+                        await stream.aclose()
+                        await self._backoff(name, attempt, e)
+                        attempt += 1
+                try:
+                    while text is not None:
+                        if text:
+                            if first:
+                                metrics.observe(f"{name}.time_to_first_token", time.perf_counter() - started)
+                                first = False
+                            yield text
+                        text = await self._next(stream)
+                finally:
+                    await stream.aclose()
+            completed = True
+        finally:
+            if completed:
+                metrics.observe(f"{name}.stream_duration", time.perf_counter() - started)
+            else:
+                metrics.increment(f"{name}.streams_abandoned")
+
+    async def _generate(self, prompt: str, name: str, temperature: Optional[float], cache_key: Optional[str]) -> str:
+        attempt = 0
+        async with self._slot():
+            # Timed from the slot, so queueing behind other calls does not count as model time
+            started = time.perf_counter()
+            while True:
+                try:
+                    text = await asyncio.wait_for(self.backend.generate(prompt, temperature), self.timeout)
+                    break
+                except (TransientLLMError, asyncio.TimeoutError) as e:
+                    await self._backoff(name, attempt, e)
+                    attempt += 1
+        seconds = time.perf_counter() - started
+        metrics.observe(f"{name}.generate", seconds)
+        if cache_key is not None:
+            await asyncio.to_thread(self.cache.set, cache_key, text, seconds)
+        return text
+
+    async def _next(self, stream: AsyncIterator[str]) -> Optional[str]:
+        """Next piece of a stream within the timeout, or None at its end."""
+        try:
+            return await asyncio.wait_for(stream.__anext__(), self.timeout)
+        except StopAsyncIteration:
+            return None
+
+    async def _backoff(self, name: str, attempt: int, error: Exception):
+        """Wait before retry number `attempt + 1`, or re-raise `error` once retries are used up."""
+        metrics.increment(f"{name}.timeouts" if isinstance(error, asyncio.TimeoutError) else f"{name}.errors")
+        if attempt >= self.max_retries:
+            raise error
+        metrics.increment(f"{name}.retries")
+        await asyncio.sleep(min(self.max_backoff, self.base_backoff * (2 ** attempt)) * random.uniform(0.5, 1.0))
+
+    def _slot(self) -> asyncio.Semaphore:
+        # Created lazily so the gateway can be built outside a running loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+
+_gateway: Optional[LLMGateway] = None
+
+
+def get_llm_gateway() -> LLMGateway:
+    """The process-wide gateway, for the backend selected by LLM_BACKEND."""
+    global _gateway
+    if _gateway is None:
+        if settings.LLM_BACKEND == "fake":
+            backend = FakeLLMBackend(model=settings.LLM_MODEL)
+        else:
+            backend = GeminiLLMBackend(api_key=settings.GOOGLE_API_KEY, model=settings.LLM_MODEL)
+        _gateway = LLMGateway(
+            backend,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            max_retries=settings.LLM_MAX_RETRIES,
+            cache=LLMResponseCache(
+                settings.LLM_CACHE_PATH,
+                max_bytes=settings.LLM_CACHE_MAX_MB * 1024 * 1024,
+                ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+            ) if settings.LLM_CACHE_ENABLED else None
+        )
+    return _gateway
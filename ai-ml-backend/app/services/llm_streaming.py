@@ -0,0 +1,11 @@
+from typing import Any
+import json
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Headers for text/event-stream responses: no caching, and no proxy buffering that would hold tokens back
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
@@ -0,0 +1,121 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from collections import Counter
+import hashlib
+import json
+import time
+import fitz  # PyMuPDF
+import pdfplumber
+from ..core.config import settings
+from ..core.disk_cache import DiskCache
+
+# Extractor routes a page can take
+PYMUPDF = "pymupdf"  # Fast text-layer extraction
+PDFPLUMBER = "pdfplumber"  # Slower, but keeps table rows and columns aligned
+SCANNED = "scanned"  # Image-only page with no text layer; nothing to extract without OCR
+
+ROUTES = (PYMUPDF, PDFPLUMBER, SCANNED)
+
+
+def classify_page(blocks: Sequence[tuple], page_area: float) -> str:
+    """Pick an extractor for a page from its PyMuPDF text/image blocks.
+
+    A page with (almost) no text that is mostly covered by images is a scan.
+    A page made of many short text blocks whose left edges line up in several
+    columns is a table. Everything else takes the fast path.
+    """
+    text_blocks = [block for block in blocks if block[6] == 0 and block[4].strip()]
+    chars = sum(len(block[4].strip()) for block in text_blocks)
+    if chars < settings.PDF_MIN_TEXT_CHARS:
+        image_area = sum((block[2] - block[0]) * (block[3] - block[1]) for block in blocks if block[6] == 1)
+        return SCANNED if page_area and image_area >= 0.3 * page_area else PYMUPDF
+
+    if len(text_blocks) >= settings.PDF_TABLE_MIN_BLOCKS:
+        short = [block for block in text_blocks if len(block[4].strip()) < 40]
+        if len(short) >= 0.6 * len(text_blocks):
+            columns = Counter(round(block[0] / 10) for block in short)
+            if sum(1 for count in columns.values() if count >= 3) >= 3:
+                return PDFPLUMBER
+    return PYMUPDF
+
+
+def extract_pdf_pages(
+    file_path: str,
+    start: int,
+    end: int,
+    routes: Optional[Dict[int, str]] = None
+) -> List[Tuple[int, str, str, float]]:
+    """Extract pages [start, end) of a PDF. Runs inside a worker process.
+
+    Pages with a known route (from an earlier run over the same file) go
+    straight to that extractor; others are classified first. Returns
+    (page_number, text, route, seconds) per page, page numbers 1-based.
+    """
+    routes = routes or {}
+    results = []
+    plumber = None
+    try:
+        with fitz.open(file_path) as doc:
+            for page_index in range(start, end):
+                started = time.perf_counter()
+                page_number = page_index + 1
+                route = routes.get(page_number)
+                text = None
+                if route is None:
+                    # The blocks used for classification double as the fast-path text
+                    page = doc[page_index]
+                    blocks = page.get_text("blocks")
+                    route = classify_page(blocks, page.rect.width * page.rect.height)
+                    if route == PYMUPDF:
+                        text = "".join(block[4] for block in blocks if block[6] == 0)
+                elif route == PYMUPDF:
+                    text = doc[page_index].get_text()
+
+                if route == PDFPLUMBER:
+                    try:
+                        if plumber is None:
+                            plumber = pdfplumber.open(file_path)
+                        plumber_page = plumber.pages[page_index]
+                        text = plumber_page.extract_text(layout=True) or ""
+                        plumber_page.flush_cache()
+                    except Exception:
+                        route, text = PYMUPDF, doc[page_index].get_text()
+                elif route == SCANNED:
+                    text = ""
+
+                results.append((page_number, text, route, time.perf_counter() - started))
+    finally:
+        if plumber is not None:
+            plumber.close()
+    return results
+
+
+def file_fingerprint(file_path: str) -> str:
+    """Hash of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class PageRouteCache:
+    """Per-document cache of extractor decisions, keyed by file fingerprint.
+
+    The key also covers the routing thresholds, so retuning them invalidates
+    earlier decisions.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024):
+        self.store = DiskCache(path, name="pdf_route_cache", max_bytes=max_bytes)
+
+    @staticmethod
+    def key(fingerprint: str) -> str:
+        return f"{fingerprint}:{settings.PDF_MIN_TEXT_CHARS}:{settings.PDF_TABLE_MIN_BLOCKS}"
+
+    def get(self, fingerprint: str) -> Dict[int, str]:
+        """Return the cached {page_number: route} for a document, or {}."""
+        value = self.store.get(self.key(fingerprint))
+        return {int(page): route for page, route in json.loads(value).items()} if value else {}
+
+    def set(self, fingerprint: str, routes: Dict[int, str]):
+        self.store.set(self.key(fingerprint), json.dumps(routes).encode("utf-8"))
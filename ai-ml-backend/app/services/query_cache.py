@@ -0,0 +1,111 @@
+from typing import Any, Dict, List, Optional
+from array import array
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from ..core.disk_cache import DiskCache
+from .embedding_cache import EmbeddingCache
+
+
+class QueryCache:
+    """Two-level cache for semantic search, shared by every worker through SQLite files.
+
+    Level one maps a query string to its embedding, so repeated questions
+    skip the embedding API. Level two maps a search (query embedding, query
+    text when keyword search also runs, filter, top_k and namespace) to its
+    ranked matches, so they skip the index as well. Both levels have a TTL and
+    LRU eviction.
+
+    Each namespace has a generation number that is bumped whenever vectors
+    in it are written or deleted. It is part of every level-two key, so an
+    upload or delete makes the namespace's cached results unreachable at once;
+    they then age out of the LRU.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        model: str,
+        max_bytes: int,
+        embedding_ttl_seconds: Optional[float] = None,
+        result_ttl_seconds: Optional[float] = None
+    ):
+        os.makedirs(path, exist_ok=True)
+        self.model = model
+        self.embeddings = DiskCache(
+            os.path.join(path, "embeddings.sqlite3"),
+            name="query_embedding_cache",
+            max_bytes=max_bytes // 4,
+            ttl_seconds=embedding_ttl_seconds
+        )
+        self.results = DiskCache(
+            os.path.join(path, "results.sqlite3"),
+            name="query_result_cache",
+            max_bytes=max_bytes - max_bytes // 4,
+            ttl_seconds=result_ttl_seconds
+        )
+        self._generations_path = os.path.join(path, "generations.sqlite3")
+        self._local = threading.local()
+        self._conn().execute("CREATE TABLE IF NOT EXISTS generations (namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._generations_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _embedding_key(self, query: str) -> str:
+        return hashlib.sha256(f"{self.model}\0{EmbeddingCache.normalize(query)}".encode("utf-8")).hexdigest()
+
+    def get_embeddings(self, queries: List[str]) -> List[Optional[List[float]]]:
+        """Return the cached embedding of each query, or None where missing."""
+        keys = [self._embedding_key(query) for query in queries]
+        found = self.embeddings.get_many(keys)
+        return [EmbeddingCache._decode(found[key]) if key in found else None for key in keys]
+
+    def set_embeddings(self, queries: List[str], embeddings: List[List[float]]):
+        """Cache query embeddings."""
+        self.embeddings.set_many({
+            self._embedding_key(query): array("f", embedding).tobytes()
+            for query, embedding in zip(queries, embeddings)
+        })
+
+    def generation(self, namespace: Optional[str]) -> int:
+        """Current generation of a namespace's search results."""
+        row = self._conn().execute("SELECT generation FROM generations WHERE namespace = ?", (namespace or "",)).fetchone()
+        return row[0] if row else 0
+
+    def invalidate(self, namespace: Optional[str]):
+        """Make every cached result for `namespace` stale."""
+        self._conn().execute(
+            "INSERT INTO generations (namespace, generation) VALUES (?, 1) "
+            "ON CONFLICT (namespace) DO UPDATE SET generation = generation + 1",
+            (namespace or "",)
+        )
+
+    def results_key(
+        self,
+        embedding: List[float],
+        query: Optional[str],
+        filter: Optional[Dict[str, Any]],
+        top_k: int,
+        namespace: Optional[str],
+        generation: int
+    ) -> str:
+        """Level-two key; `query` is only given when the ranking depends on the text itself."""
+        digest = hashlib.sha256(array("f", embedding).tobytes())
+        digest.update(json.dumps([query, filter, top_k, namespace, generation], sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_results(self, keys: List[str]) -> List[Optional[List[Dict[str, Any]]]]:
+        """Return the cached matches for each level-two key, or None where missing."""
+        found = self.results.get_many(keys)
+        return [json.loads(found[key]) if key in found else None for key in keys]
+
+    def set_results(self, items: Dict[str, List[Dict[str, Any]]]):
+        """Cache matches under their level-two keys."""
+        self.results.set_many({key: json.dumps(results).encode("utf-8") for key, results in items.items()})
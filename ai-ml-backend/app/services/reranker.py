@@ -0,0 +1,154 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+from collections import Counter
+import math
+from .lexical_index import tokenize
+
+# Keywords that identify the common clause types, in a query or in a chunk's heading and text
+CLAUSE_TYPES = {
+    "termination": {"terminate", "terminated", "termination", "expiry", "expire", "cancel", "cancellation"},
+    "payment": {"payment", "pay", "fee", "fees", "rent", "price", "invoice", "interest", "deposit"},
+    "confidentiality": {"confidential", "confidentiality", "disclose", "disclosure", "secret"},
+    "indemnity": {"indemnify", "indemnity", "indemnification", "indemnified", "hold", "harmless"},
+    "liability": {"liability", "liable", "damages", "limitation", "consequential"},
+    "governing_law": {"governing", "law", "jurisdiction", "courts"},
+    "dispute_resolution": {"dispute", "disputes", "arbitration", "arbitrator", "mediation"},
+    "force_majeure": {"force", "majeure", "act", "god"},
+    "assignment": {"assign", "assignment", "transfer", "subcontract"},
+    "warranty": {"warrant", "warranty", "warranties", "represent", "representation", "representations"},
+    "intellectual_property": {"intellectual", "property", "copyright", "patent", "trademark", "licence", "license"},
+    "notice": {"notice", "notices", "notify", "notification"},
+}
+
+
+def clause_types(terms: Set[str]) -> Set[str]:
+    """Clause types whose keywords appear in `terms` (two keywords needed for multi-word types)."""
+    found = set()
+    for clause_type, keywords in CLAUSE_TYPES.items():
+        hits = len(terms & keywords)
+        if hits >= 2 or (hits == 1 and clause_type not in ("governing_law", "force_majeure", "intellectual_property")):
+            found.add(clause_type)
+    return found
+
+
+class Scorer:
+    """Interface of the relevance scorers used by Reranker: higher is more relevant."""
+
+    def score(self, query: str, candidates: List[Dict[str, Any]]) -> List[float]:
+        """Score search results ({"text", "metadata", ...}) against `query`."""
+        raise NotImplementedError
+
+
+class TermOverlapScorer(Scorer):
+    """Cheap local scorer: IDF-weighted query term coverage plus clause-type agreement.
+
+    IDF is taken over the candidate set itself, so terms shared by every
+    candidate count for little and distinguishing ones (section numbers,
+    party names, defined terms) for a lot. Terms found in the chunk's section
+    heading count extra, and a chunk whose clause type matches the query's
+    gets a fixed bonus.
+    """
+
+    def __init__(self, heading_weight: float = 0.5, clause_type_bonus: float = 0.3):
+        self.heading_weight = heading_weight
+        self.clause_type_bonus = clause_type_bonus
+
+    def score(self, query: str, candidates: List[Dict[str, Any]]) -> List[float]:
+        query_terms = set(tokenize(query))
+        if not query_terms or not candidates:
+            return [0.0] * len(candidates)
+        query_types = clause_types(query_terms)
+        documents = [
+            (Counter(tokenize(candidate["text"])), set(tokenize(str(candidate.get("metadata", {}).get("section", "")))))
+            for candidate in candidates
+        ]
+        frequency = Counter(term for counts, _ in documents for term in query_terms & counts.keys())
+        idf = {term: math.log(1 + len(candidates) / (1 + frequency[term])) for term in query_terms}
+        total = sum(idf.values()) or 1.0
+
+        scores = []
+        for counts, heading in documents:
+            coverage = sum(idf[term] * (1 + math.log(counts[term])) for term in query_terms if term in counts) / total
+            coverage += self.heading_weight * sum(idf[term] for term in query_terms & heading) / total
+            if query_types and query_types & clause_types(set(counts) | heading):
+                coverage += self.clause_type_bonus
+            scores.append(coverage)
+        return scores
+
+
+class CrossEncoderScorer(Scorer):
+    """Scores (query, chunk) pairs with a small cross-encoder model on CPU."""
+
+    def __init__(self, model: str):
+        # Imported here so the default scorer works without sentence-transformers installed
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model, device="cpu")
+
+    def score(self, query: str, candidates: List[Dict[str, Any]]) -> List[float]:
+        if not candidates:
+            return []
+        return [float(score) for score in self.model.predict([(query, candidate["text"]) for candidate in candidates])]
+
+
+def create_scorer(name: str, model: Optional[str] = None) -> Scorer:
+    """Create the scorer selected by RERANK_SCORER."""
+    if name == "overlap":
+        return TermOverlapScorer()
+    if name == "cross-encoder":
+        return CrossEncoderScorer(model)
+    raise ValueError(f"Unknown rerank scorer: {name}")
+
+
+class Reranker:
+    """Retrieval stage between search and the LLM: re-rank over-fetched matches and drop redundant ones.
+
+    The scorer's ranking is fused with the retrieval ranking (the order the
+    candidates arrive in) by reciprocal rank fusion, the retrieval rank
+    weighted by `retrieval_weight`, so a cheap scorer refines the search
+    results instead of overriding them; with a weight of 0 the scorer alone
+    decides.
+
+    Chunks overlap their neighbours, and the same passage can be uploaded in
+    several documents, so after re-ranking a candidate is skipped when at
+    least `duplicate_threshold` of its word shingles already appear in a
+    better-ranked chunk. Only the best `top_n` distinct chunks are kept.
+    """
+
+    SHINGLE = 4  # Words per shingle
+
+    def __init__(self, scorer: Scorer, duplicate_threshold: float = 0.5, retrieval_weight: float = 1.0, k: int = 60):
+        self.scorer = scorer
+        self.duplicate_threshold = duplicate_threshold
+        self.retrieval_weight = retrieval_weight
+        self.k = k
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_n: int) -> List[Dict[str, Any]]:
+        """Return up to `top_n` distinct candidates, best first, each with its fused `rerank_score`.
+
+        `candidates` must be in retrieval order, best first.
+        """
+        scores = self.scorer.score(query, candidates)
+        # Stable sort, so equal scores keep the retrieval order
+        by_score = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        fused = [self.retrieval_weight / (self.k + i + 1) for i in range(len(candidates))]
+        for rank, i in enumerate(by_score, start=1):
+            fused[i] += 1.0 / (self.k + rank)
+        ranked = sorted(zip(candidates, fused), key=lambda pair: -pair[1])
+
+        selected: List[Dict[str, Any]] = []
+        seen: Set[Tuple[str, ...]] = set()
+        for candidate, score in ranked:
+            if len(selected) >= top_n:
+                break
+            shingles = self._shingles(candidate["text"])
+            if shingles and len(shingles & seen) >= self.duplicate_threshold * len(shingles):
+                continue
+            seen |= shingles
+            selected.append({**candidate, "rerank_score": score})
+        return selected
+
+    def _shingles(self, text: str) -> Set[Tuple[str, ...]]:
+        words = text.lower().split()
+        if len(words) < self.SHINGLE:
+            return {tuple(words)} if words else set()
+        return {tuple(words[i:i + self.SHINGLE]) for i in range(len(words) - self.SHINGLE + 1)}
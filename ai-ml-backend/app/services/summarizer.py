@@ -0,0 +1,162 @@
+from typing import Any, Dict, List, Tuple
+import asyncio
+import hashlib
+from ..core.metrics import metrics
+from .chunk_store import ChunkStore, chunk_fingerprint
+from .llm_gateway import LLMGateway
+from .summary_store import SummaryStore
+from .tokenizer import Tokenizer
+
+# Part of every node key: bump it when a prompt below changes, so stored summaries are regenerated
+SUMMARY_PROMPT_VERSION = 1
+
+MAP_PROMPT = """You are a legal document summarizer. Summarize the following section of a longer legal document:
+
+{text}
+
+Keep every party, obligation, date, amount, condition and defined term it contains; leave out boilerplate."""
+
+REDUCE_PROMPT = """You are a legal document summarizer. The following are summaries of consecutive sections of a longer legal document, in order:
+
+{text}
+
+Merge them into one summary of these sections. Keep every party, obligation, date, amount, condition and defined term; drop repetition."""
+
+ROOT_PROMPT = """You are a legal document summarizer. Please provide a concise summary of the key points in the following document:
+
+{text}
+
+Focus on the main arguments, important details, and any legal implications."""
+
+
+class HierarchicalSummarizer:
+    """Map-reduce summaries of long documents, as a tree of persisted nodes.
+
+    A document's chunks are split into groups of at most `group_tokens`; each
+    group is summarized (map), then consecutive summaries are merged up to
+    `fan_in` at a time (reduce), level by level, until one summary is left.
+    A document that fits in one group is summarized in a single call. At most
+    `max_concurrency` summaries of a document are generated at once.
+
+    Every node is stored in the SummaryStore under a hash of the model, the
+    prompt version and its inputs (chunk fingerprints for map nodes, child
+    keys above). Group boundaries are content-defined: a group ends after an
+    item whose hash hits 1 in `group_chunks` (1 in `fan_in` when reducing), so
+    editing part of a document only regroups its neighbourhood. Summarizing
+    the new version then regenerates just the nodes on the changed branches
+    and reuses every other stored node.
+    """
+
+    def __init__(
+        self,
+        gateway: LLMGateway,
+        chunk_store: ChunkStore,
+        store: SummaryStore,
+        tokenizer: Tokenizer,
+        group_tokens: int = 4000,
+        group_chunks: int = 8,
+        fan_in: int = 8,
+        max_concurrency: int = 4
+    ):
+        if group_chunks < 2 or fan_in < 2:
+            raise ValueError("group_chunks and fan_in must be at least 2")
+        self.gateway = gateway
+        self.chunk_store = chunk_store
+        self.store = store
+        self.tokenizer = tokenizer
+        self.group_tokens = group_tokens
+        self.group_chunks = group_chunks
+        self.fan_in = fan_in
+        self.max_concurrency = max_concurrency
+
+    async def summarize(self, document_id: str, refresh: bool = False) -> Dict[str, Any]:
+        """Summarize a document, reusing the stored nodes its current text still has.
+
+        With `refresh`, every node is generated again. Returns the summary, the
+        tree's depth and node count, and how many nodes were generated and
+        reused.
+        """
+        chunks = await asyncio.to_thread(self.chunk_store.get_chunks, document_id)
+        if not chunks:
+            raise ValueError("Document not found")
+        texts = [chunk["text"] for chunk in chunks]
+        level = [(chunk_fingerprint(text), text) for text in texts]
+        tokens = await asyncio.to_thread(self.tokenizer.count_many, texts)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        stats = {"generated": 0, "reused": 0}
+        keys: List[str] = []
+        depth = 0
+        kind = "map"
+        while depth == 0 or len(level) > 1:
+            groups = self._group([key for key, _ in level], tokens, self.group_chunks if kind == "map" else self.fan_in)
+            if len(groups) == 1:
+                kind = "root"
+            level = await self._summarize_level(
+                document_id, kind, [[level[i] for i in group] for group in groups], refresh, semaphore, stats
+            )
+            keys.extend(key for key, _ in level)
+            tokens = await asyncio.to_thread(self.tokenizer.count_many, [summary for _, summary in level])
+            depth += 1
+            kind = "reduce"
+
+        await asyncio.to_thread(self.store.replace_document, document_id, keys)
+        metrics.increment("summary.nodes_generated", stats["generated"])
+        metrics.increment("summary.nodes_reused", stats["reused"])
+        return {"summary": level[0][1], "depth": depth, "nodes": len(keys), **stats}
+
+    def _group(self, keys: List[str], tokens: List[int], expected: int) -> List[List[int]]:
+        """Split items into consecutive groups of their indexes.
+
+        A group closes after an item whose key hashes to 0 modulo `expected`,
+        once it holds at least half that many items, and before an item
+        that would take it past `group_tokens`. Every group but the last has
+        at least two items, so each reduce level is smaller than the one below.
+        """
+        groups: List[List[int]] = []
+        current: List[int] = []
+        used = 0
+        for i, (key, count) in enumerate(zip(keys, tokens)):
+            if len(current) >= 2 and used + count > self.group_tokens:
+                groups.append(current)
+                current, used = [], 0
+            current.append(i)
+            used += count
+            if len(current) >= max(2, expected // 2) and int(key[:8], 16) % expected == 0:
+                groups.append(current)
+                current, used = [], 0
+        if current:
+            groups.append(current)
+        return groups
+
+    async def _summarize_level(
+        self,
+        document_id: str,
+        kind: str,
+        groups: List[List[Tuple[str, str]]],
+        refresh: bool,
+        semaphore: asyncio.Semaphore,
+        stats: Dict[str, int]
+    ) -> List[Tuple[str, str]]:
+        """Summarize each group of (key, text) items into one node; return the nodes as (key, summary)."""
+        prompt = {"map": MAP_PROMPT, "reduce": REDUCE_PROMPT, "root": ROOT_PROMPT}[kind]
+        node_keys = [self._key(kind, [key for key, _ in group]) for group in groups]
+        stored = {} if refresh else await asyncio.to_thread(self.store.get_many, node_keys, document_id)
+
+        async def summarize_group(key: str, group: List[Tuple[str, str]]) -> str:
+            if key in stored:
+                stats["reused"] += 1
+                return stored[key]
+            async with semaphore:
+                summary = await self.gateway.generate(prompt.format(text="\n\n".join(text for _, text in group)), f"summary.{kind}")
+            # Stored at once, so a failed run keeps the nodes it finished
+            await asyncio.to_thread(self.store.put, key, summary, document_id)
+            stats["generated"] += 1
+            return summary
+
+        summaries = await asyncio.gather(*(summarize_group(key, group) for key, group in zip(node_keys, groups)))
+        return list(zip(node_keys, summaries))
+
+    def _key(self, kind: str, inputs: List[str]) -> str:
+        return hashlib.sha256(
+            "\0".join([str(SUMMARY_PROMPT_VERSION), self.gateway.backend.model, kind, *inputs]).encode("utf-8")
+        ).hexdigest()
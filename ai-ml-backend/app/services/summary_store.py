@@ -0,0 +1,123 @@
+from typing import Dict, List, Optional
+from datetime import datetime
+import os
+import sqlite3
+import threading
+from .chunk_store import compress_text, decompress_text
+
+
+class SummaryStore:
+    """Persisted nodes of hierarchical document summaries, in a SQLite file.
+
+    A node is addressed by a hash of everything its summary was generated
+    from (see HierarchicalSummarizer), so identical sections share a node and
+    a node never goes stale: changed inputs give a new key. Each document
+    records the nodes of its latest summary tree; nodes no document records
+    any more are dropped when a tree is replaced.
+
+    Nodes a summary run stores or reuses are recorded for its document at
+    once, not only when the finished tree replaces the old one, so replacing
+    or deleting another document that shares them cannot drop them mid-run.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS summary_nodes (
+                key TEXT PRIMARY KEY,
+                summary BLOB NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS document_summaries (
+                document_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (document_id, key)
+            );
+            CREATE INDEX IF NOT EXISTS document_summaries_key ON document_summaries (key);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys: List[str], document_id: Optional[str] = None) -> Dict[str, str]:
+        """Return the stored summaries of `keys`, keyed by node key (unknown ones are left out).
+
+        With `document_id`, the nodes found are recorded as that document's in
+        the same transaction, so they are kept until its tree is replaced.
+        """
+        found = {}
+        unique = list(dict.fromkeys(keys))
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            # Stay under SQLite's limit on bound parameters
+            for start in range(0, len(unique), 500):
+                batch = unique[start:start + 500]
+                rows = conn.execute(
+                    f"SELECT key, summary FROM summary_nodes WHERE key IN ({','.join('?' * len(batch))})",
+                    batch
+                )
+                found.update((row["key"], decompress_text(row["summary"])) for row in rows)
+            if document_id is not None:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO document_summaries (document_id, key) VALUES (?, ?)",
+                    [(document_id, key) for key in found]
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return found
+
+    def put(self, key: str, summary: str, document_id: Optional[str] = None):
+        """Store one node's summary, replacing any previous one, and record it as `document_id`'s."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO summary_nodes (key, summary, created_at) VALUES (?, ?, ?)",
+                (key, compress_text(summary), datetime.utcnow().isoformat())
+            )
+            if document_id is not None:
+                conn.execute("INSERT OR IGNORE INTO document_summaries (document_id, key) VALUES (?, ?)", (document_id, key))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def replace_document(self, document_id: str, keys: List[str]):
+        """Atomically record `keys` as the nodes of a document's summary tree."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            previous = [row[0] for row in conn.execute("SELECT key FROM document_summaries WHERE document_id = ?", (document_id,))]
+            conn.execute("DELETE FROM document_summaries WHERE document_id = ?", (document_id,))
+            conn.executemany(
+                "INSERT OR IGNORE INTO document_summaries (document_id, key) VALUES (?, ?)",
+                [(document_id, key) for key in keys]
+            )
+            self._drop_unused_nodes(conn, previous)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete_document(self, document_id: str):
+        """Forget a document's summary tree."""
+        self.replace_document(document_id, [])
+
+    @staticmethod
+    def _drop_unused_nodes(conn: sqlite3.Connection, keys: List[str]):
+        """Delete the nodes among `keys` that no document's tree uses any more."""
+        conn.executemany(
+            "DELETE FROM summary_nodes WHERE key = ? AND NOT EXISTS (SELECT 1 FROM document_summaries WHERE key = ?)",
+            [(key, key) for key in keys]
+        )
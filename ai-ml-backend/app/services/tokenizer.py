@@ -0,0 +1,76 @@
+from typing import List
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+# Words, numbers and single punctuation marks; the fallback counts a long word as one token per 4 characters
+APPROXIMATE_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+_NOT_LOADED = object()
+
+
+class Tokenizer:
+    """Counts and trims text in model tokens, for fitting prompts into a token budget.
+
+    Uses the tiktoken BPE encoding `encoding`. Gemini's own tokenizer is only
+    reachable through an API call, which is too slow to run on every chunk;
+    a BPE vocabulary of similar size counts closely enough for budgeting. If
+    tiktoken is not installed, or its encoding file cannot be loaded (it is
+    downloaded on first use), tokens are approximated from words and
+    punctuation. The encoding is loaded on first use rather than on
+    construction, so creating a tokenizer never touches the network.
+    """
+
+    def __init__(self, encoding: str = "cl100k_base"):
+        self._encoding_name = encoding
+        self._bpe = _NOT_LOADED
+
+    @property
+    def _encoding(self):
+        """The tiktoken encoding, or None when counting approximately."""
+        if self._bpe is _NOT_LOADED:
+            try:
+                # Optional: only needed for exact BPE counts
+                import tiktoken
+                self._bpe = tiktoken.get_encoding(self._encoding_name)
+            except ImportError:
+                self._bpe = None
+            except Exception as e:
+                logger.warning(f"Could not load tiktoken encoding {self._encoding_name}, approximating token counts: {str(e)}")
+                self._bpe = None
+        return self._bpe
+
+    @property
+    def name(self) -> str:
+        """The encoding counts are made with."""
+        return self._encoding_name if self._encoding is not None else "approximate"
+
+    def count(self, text: str) -> int:
+        """Number of tokens in `text`."""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return sum(math.ceil(len(piece) / 4) for piece in APPROXIMATE_TOKEN_PATTERN.findall(text))
+
+    def count_many(self, texts: List[str]) -> List[int]:
+        """Token counts of several texts, batched when tiktoken is available."""
+        if self._encoding is not None:
+            return [len(tokens) for tokens in self._encoding.encode_batch(texts, disallowed_special=())]
+        return [self.count(text) for text in texts]
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """The longest prefix of `text` that fits in `max_tokens`."""
+        if max_tokens <= 0:
+            return ""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            return text if len(tokens) <= max_tokens else self._encoding.decode(tokens[:max_tokens])
+        used = 0
+        for match in APPROXIMATE_TOKEN_PATTERN.finditer(text):
+            used += math.ceil(len(match.group()) / 4)
+            if used > max_tokens:
+                return text[:match.start()].rstrip()
+        return text
@@ -0,0 +1,109 @@
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+import random
+from ..core.metrics import metrics
+from .vector_stores import VectorStore, Vector, TransientVectorStoreError
+
+T = TypeVar("T")
+
+# HTTP statuses of hosted index errors that are worth retrying
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed vector index request should be retried."""
+    if isinstance(error, (TransientVectorStoreError, ConnectionError, TimeoutError)):
+        return True
+    return getattr(error, "status", None) in RETRY_STATUSES
+
+
+class AsyncVectorClient:
+    """Async front end to a blocking VectorStore, with a pool of worker threads.
+
+    Calls run on a dedicated pool of `pool_size` threads rather than the
+    event loop's default executor, so index traffic neither starves nor is
+    starved by other blocking work, and at most `pool_size` requests (one
+    per pooled connection) are in flight at once. Large upserts and deletes
+    are split into `batch_size` requests that are sent in parallel through
+    the pool. Transient failures are retried with exponential, jittered
+    backoff, each request on its own, so one failed batch does not resend
+    the others.
+    """
+
+    def __init__(
+        self,
+        store: VectorStore,
+        pool_size: int = 8,
+        batch_size: int = 100,
+        max_retries: int = 5,
+        base_backoff: float = 0.2,
+        max_backoff: float = 10.0
+    ):
+        self.store = store
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="vector-store")
+
+    async def upsert(self, vectors: List[Vector], namespace: Optional[str] = None):
+        """Insert or overwrite vectors, `batch_size` per request, requests in parallel."""
+        await asyncio.gather(*(
+            self._call(self.store.upsert, vectors[i:i + self.batch_size], namespace)
+            for i in range(0, len(vectors), self.batch_size)
+        ))
+
+    async def update_metadata(self, vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None):
+        """Overwrite selected metadata fields of a stored vector."""
+        await self._call(self.store.update_metadata, vector_id, metadata, namespace)
+
+    async def delete(self, vector_ids: List[str], namespace: Optional[str] = None):
+        """Delete vectors by ID, in parallel requests of up to 1000 IDs."""
+        await asyncio.gather(*(
+            self._call(self.store.delete, vector_ids[i:i + 1000], namespace)
+            for i in range(0, len(vector_ids), 1000)
+        ))
+
+    async def delete_document(self, document_id: str, namespace: Optional[str] = None):
+        """Delete a document's vectors by metadata filter; prefer `delete` with known IDs."""
+        await self._call(self.store.delete_document, document_id, namespace)
+
+    async def fetch(self, vector_ids: List[str], namespace: Optional[str] = None) -> Dict[str, List[float]]:
+        """Stored values of vectors by ID, in parallel requests of up to 1000 IDs."""
+        found: Dict[str, List[float]] = {}
+        for batch in await asyncio.gather(*(
+            self._call(self.store.fetch, vector_ids[i:i + 1000], namespace)
+            for i in range(0, len(vector_ids), 1000)
+        )):
+            found.update(batch)
+        return found
+
+    async def query_batch(
+        self,
+        vectors: List[List[float]],
+        top_k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Run one query per vector with the same filter."""
+        return await self._call(self.store.query_batch, vectors, top_k, filter, namespace)
+
+    async def describe(self) -> Dict[str, Any]:
+        """Index statistics; also serves as a health check."""
+        return await self._call(self.store.describe)
+
+    async def _call(self, method: Callable[..., T], *args) -> T:
+        loop = asyncio.get_running_loop()
+        attempt = 0
+        while True:
+            try:
+                return await loop.run_in_executor(self._executor, functools.partial(method, *args))
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient(e):
+                    raise
+                metrics.increment("vector_store.retries")
+                await asyncio.sleep(min(self.max_backoff, self.base_backoff * (2 ** attempt)) * random.uniform(0.5, 1.0))
+                attempt += 1
@@ -0,0 +1,1024 @@
+from typing import Any, Dict, List, Optional, Set, Tuple
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import numpy as np
+
+Vector = Tuple[str, List[float], Dict[str, Any]]
+
+
+class TransientVectorStoreError(Exception):
+    """A vector index request failed in a way that is worth retrying (overload, timeout, dropped connection)."""
+
+
+class VectorStore:
+    """Interface of the vector index backends used by EmbeddingsService.
+
+    Methods block; EmbeddingsService calls them through asyncio.to_thread.
+    Query matches are {"id", "score", "metadata"} dicts, best first.
+
+    Vectors live in a namespace (one per user), and every operation is scoped
+    to one; None is the default namespace (Pinecone's ""), never all of them. Queries also take a Pinecone-style metadata filter on
+    `document_id` ($eq/$in) and `uploaded_at` ($gt/$gte/$lt/$lte). Both are
+    applied inside the index, before ranking, not to the results.
+    """
+
+    def upsert(self, vectors: List[Vector], namespace: Optional[str] = None):
+        """Insert or overwrite (id, values, metadata) vectors."""
+        raise NotImplementedError
+
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None):
+        """Overwrite selected metadata fields of a stored vector."""
+        raise NotImplementedError
+
+    def delete(self, vector_ids: List[str], namespace: Optional[str] = None):
+        """Delete vectors by ID."""
+        raise NotImplementedError
+
+    def delete_document(self, document_id: str, namespace: Optional[str] = None):
+        """Delete every vector of a document by metadata filter (not every backend supports this)."""
+        raise NotImplementedError
+
+    def fetch(self, vector_ids: List[str], namespace: Optional[str] = None) -> Dict[str, List[float]]:
+        """Return the stored values of `vector_ids`, keyed by ID (unknown ones are left out)."""
+        raise NotImplementedError
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Return the `top_k` vectors in `namespace` matching `filter` most similar (cosine) to `vector`."""
+        raise NotImplementedError
+
+    def query_batch(
+        self,
+        vectors: List[List[float]],
+        top_k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Run `query` for several vectors with the same filter; one result list per vector."""
+        return [self.query(vector, top_k, filter, namespace) for vector in vectors]
+
+    def describe(self) -> Dict[str, Any]:
+        """Return basic statistics; also serves as a health check."""
+        raise NotImplementedError
+
+
+class PineconeVectorStore(VectorStore):
+    """Hosted Pinecone index."""
+
+    def __init__(self, api_key: str, environment: str, index_name: str, dimension: int, pool_threads: int = 8):
+        # Imported here so the local backend works without the Pinecone client installed
+        import pinecone
+
+        pinecone.init(api_key=api_key, environment=environment)
+
+        # Create index if it doesn't exist
+        if index_name not in pinecone.list_indexes():
+            pinecone.create_index(name=index_name, dimension=dimension, metric="cosine")
+
+        # Sized to the number of requests AsyncVectorClient keeps in flight, so each gets a pooled connection
+        self.index = pinecone.Index(index_name, pool_threads=pool_threads)
+
+    def upsert(self, vectors: List[Vector], namespace: Optional[str] = None):
+        self.index.upsert(vectors=vectors, namespace=namespace or "")
+
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None):
+        self.index.update(id=vector_id, set_metadata=metadata, namespace=namespace or "")
+
+    def delete(self, vector_ids: List[str], namespace: Optional[str] = None):
+        batch_size = 1000
+        for i in range(0, len(vector_ids), batch_size):
+            self.index.delete(ids=vector_ids[i:i + batch_size], namespace=namespace or "")
+
+    def delete_document(self, document_id: str, namespace: Optional[str] = None):
+        self.index.delete(filter={"document_id": document_id}, namespace=namespace or "")
+
+    def fetch(self, vector_ids: List[str], namespace: Optional[str] = None) -> Dict[str, List[float]]:
+        found = {}
+        for i in range(0, len(vector_ids), 1000):
+            response = self.index.fetch(ids=vector_ids[i:i + 1000], namespace=namespace or "")
+            found.update((vector_id, list(vector.values)) for vector_id, vector in response.vectors.items())
+        return found
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        results = self.index.query(
+            vector=vector,
+            top_k=top_k,
+            filter=filter,
+            namespace=namespace or "",
+            include_metadata=True
+        )
+        return [{"id": match.id, "score": match.score, "metadata": match.metadata} for match in results.matches]
+
+    def describe(self) -> Dict[str, Any]:
+        stats = self.index.describe_index_stats()
+        return {"backend": "pinecone", "vectors": stats.total_vector_count}
+
+
+class LocalVectorStore(VectorStore):
+    """Embedded vector index: a memory-mapped matrix plus a SQLite metadata sidecar.
+
+    Vectors are L2-normalized on write, so cosine similarity is a dot product,
+    and stored as rows of `vectors.bin` (float32 or float16). `rows.sqlite3`
+    maps each row to its vector ID, document and metadata; deleted rows are
+    reused. Every write bumps a version number, and each process keeps an
+    in-memory view of the row table that it brings up to date by reading only
+    the rows changed since the version it last saw, so all uvicorn workers
+    share one index.
+
+    Namespaces and documents have in-memory posting sets, so a filtered query
+    only scores the rows it can return, and a small user's query stays cheap
+    however large the shared index is; `uploaded_at` is kept as a column for
+    range filters.
+
+    Exact search scans the matrix in blocks. With index_type="ivf" the vectors
+    are also clustered (spherical k-means) into inverted lists once the index
+    holds `ivf_min_vectors`, and retrained whenever it has grown fourfold; a
+    query then only scores the `nprobe` lists whose centroids are nearest
+    (filtered queries matching fewer than `ivf_min_vectors` rows stay exact).
+
+    With quantization="int8" (one byte per dimension plus a per-vector scale)
+    or "pq" (product quantization: one byte per group of dimensions, trained
+    once PQ_TRAIN_MIN vectors are stored), searches scan the compact codes in
+    `codes_int8.bin` or `codes_pq.bin` instead of the matrix, keep `rescore`
+    times as many candidates as asked for, and rescore those exactly from
+    `vectors.bin`, which is then only read a few rows at a time.
+    """
+
+    SCAN_BLOCK = 65536  # Rows scored per matrix product
+    PQ_CENTROIDS = 256  # Centroids per PQ subspace, so a code is one byte
+    PQ_TRAIN_MIN = 10000  # Vectors needed before the PQ codebook is trained
+
+    def __init__(
+        self,
+        path: str,
+        dimension: int,
+        dtype: str = "float32",
+        index_type: str = "flat",
+        nlist: int = 0,
+        nprobe: int = 8,
+        ivf_min_vectors: int = 50000,
+        quantization: str = "none",
+        pq_subvectors: int = 0,
+        rescore: int = 0
+    ):
+        if index_type not in ("flat", "ivf"):
+            raise ValueError(f"Unsupported index type: {index_type}")
+        if quantization not in ("none", "int8", "pq"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        pq_subvectors = pq_subvectors or max(m for m in range(1, dimension // 4 + 1) if dimension % m == 0)
+        if quantization == "pq" and dimension % pq_subvectors:
+            raise ValueError(f"{pq_subvectors} PQ subvectors do not divide dimension {dimension}")
+        self.path = path
+        self.dimension = dimension
+        self.dtype = np.dtype(dtype)
+        self.index_type = index_type
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.ivf_min_vectors = ivf_min_vectors
+        self.quantization = quantization
+        self.pq_subvectors = pq_subvectors
+        # PQ codes are coarser than int8 ones, so more candidates are rescored by default
+        self.rescore = rescore or (16 if quantization == "pq" else 4)
+        if quantization == "int8":
+            self._code_dtype = np.dtype([("scale", "<f4"), ("code", "i1", (dimension,))])
+        elif quantization == "pq":
+            self._code_dtype = np.dtype([("code", "u1", (pq_subvectors,))])
+        else:
+            self._code_dtype = None
+        os.makedirs(path, exist_ok=True)
+        self._vectors_path = os.path.join(path, "vectors.bin")
+        self._centroids_path = os.path.join(path, "ivf_centroids.npy")
+        self._codes_path = os.path.join(path, f"codes_{quantization}.bin")
+        self._codebook_path = os.path.join(path, "pq_codebook.npy")
+        self._db_path = os.path.join(path, "rows.sqlite3")
+        self._local = threading.local()
+        self._lock = threading.RLock()
+
+        # In-memory view of the row table
+        self._version = 0
+        self._rows = 0
+        self._ids: List[Optional[str]] = []
+        self._row_of: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._documents = np.zeros(0, dtype=np.int32)
+        self._namespaces = np.zeros(0, dtype=np.int32)
+        self._uploaded = np.zeros(0, dtype=np.float64)
+        self._codes: Dict[str, Dict[str, int]] = {"document_id": {}, "namespace": {}}
+        self._postings: Dict[Tuple[str, int], Set[int]] = {}
+        self._posting_arrays: Dict[Tuple[str, int], np.ndarray] = {}
+        self._lists = np.zeros(0, dtype=np.int32)
+        self._matrix: Optional[np.memmap] = None
+        self._code_matrix: Optional[np.memmap] = None
+        self._codebook: Optional[np.ndarray] = None
+        self._pq_version = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._ivf_version = 0
+        self._inverted: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                vector_id TEXT UNIQUE,
+                document_id TEXT,
+                list_id INTEGER NOT NULL DEFAULT -1,
+                metadata TEXT,
+                version INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS rows_version ON rows (version);
+            CREATE INDEX IF NOT EXISTS rows_document ON rows (document_id);
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(rows)")}
+        if "namespace" not in columns:
+            conn.execute("ALTER TABLE rows ADD COLUMN namespace TEXT")
+            conn.execute("ALTER TABLE rows ADD COLUMN uploaded_at REAL")
+        stored_dimension = self._state(conn, "dimension")
+        if stored_dimension and stored_dimension != dimension:
+            raise ValueError(f"Index at {path} has dimension {stored_dimension}, not {dimension}")
+        conn.execute("INSERT OR IGNORE INTO state (key, value) VALUES ('dimension', ?)", (dimension,))
+        for file_path in (self._vectors_path, self._codes_path):
+            if not os.path.exists(file_path):
+                open(file_path, "ab").close()
+        self._sync()
+        # Vectors written while the index was opened without this quantization have no codes yet
+        if self._code_dtype is not None and self._state(conn, f"{quantization}_codes_written") != self._state(conn, "vectors_written"):
+            if quantization == "int8" or self._codebook is not None:
+                self._encode_all()
+            self._set_state(conn, f"{quantization}_codes_written", self._state(conn, "vectors_written"))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _state(conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    @staticmethod
+    def _set_state(conn: sqlite3.Connection, key: str, value: int):
+        conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, value))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    # In-memory view
+
+    def _sync(self):
+        """Apply rows changed by any process since the last sync."""
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            try:
+                version = self._state(conn, "version")
+                if version == self._version:
+                    return
+                changed = conn.execute(
+                    "SELECT row, vector_id, document_id, namespace, uploaded_at, list_id FROM rows WHERE version > ?",
+                    (self._version,)
+                ).fetchall()
+                ivf_version = self._state(conn, "ivf_version")
+                pq_version = self._state(conn, "pq_version")
+            finally:
+                conn.execute("COMMIT")
+
+            if changed:
+                self._grow(max(row[0] for row in changed) + 1)
+            for row, vector_id, document_id, namespace, uploaded_at, list_id in changed:
+                previous = self._ids[row]
+                if previous is not None:
+                    if self._row_of.get(previous) == row:
+                        del self._row_of[previous]
+                    self._unpost("document_id", self._documents[row], row)
+                    self._unpost("namespace", self._namespaces[row], row)
+                self._ids[row] = vector_id
+                self._alive[row] = vector_id is not None
+                self._documents[row] = self._code("document_id", document_id)
+                self._namespaces[row] = self._code("namespace", namespace)
+                self._uploaded[row] = np.nan if uploaded_at is None else uploaded_at
+                self._lists[row] = list_id
+                if vector_id is not None:
+                    self._row_of[vector_id] = row
+                    self._post("document_id", self._documents[row], row)
+                    self._post("namespace", self._namespaces[row], row)
+            if changed:
+                self._inverted = None
+            if ivf_version != self._ivf_version:
+                self._inverted = None
+                self._centroids = np.load(self._centroids_path) if ivf_version else None
+                self._ivf_version = ivf_version
+            if self.quantization == "pq" and pq_version != self._pq_version:
+                self._codebook = np.load(self._codebook_path) if pq_version else None
+                self._pq_version = pq_version
+            self._map_matrix()
+            self._version = version
+
+    def _grow(self, rows: int):
+        """Make room for `rows` rows in the in-memory arrays."""
+        if rows > len(self._alive):
+            capacity = max(rows, 2 * len(self._alive), 1024)
+            extra = capacity - len(self._alive)
+            self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+            self._documents = np.concatenate([self._documents, np.full(extra, -1, dtype=np.int32)])
+            self._namespaces = np.concatenate([self._namespaces, np.full(extra, -1, dtype=np.int32)])
+            self._uploaded = np.concatenate([self._uploaded, np.full(extra, np.nan)])
+            self._lists = np.concatenate([self._lists, np.full(extra, -1, dtype=np.int32)])
+            self._ids.extend([None] * extra)
+        self._rows = max(self._rows, rows)
+
+    def _code(self, field: str, value: Optional[str]) -> int:
+        """Small integer standing for a document ID or namespace (-1 for None)."""
+        if value is None:
+            return -1
+        codes = self._codes[field]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(codes)
+        return code
+
+    def _post(self, field: str, code: int, row: int):
+        if code >= 0:
+            self._postings.setdefault((field, int(code)), set()).add(row)
+            self._posting_arrays.pop((field, int(code)), None)
+
+    def _unpost(self, field: str, code: int, row: int):
+        if code >= 0:
+            self._postings.get((field, int(code)), set()).discard(row)
+            self._posting_arrays.pop((field, int(code)), None)
+
+    def _posting(self, field: str, value: str) -> np.ndarray:
+        """Sorted rows whose `field` equals `value`."""
+        code = self._codes[field].get(value)
+        if code is None:
+            return np.zeros(0, dtype=np.int64)
+        rows = self._posting_arrays.get((field, code))
+        if rows is None:
+            rows = self._posting_arrays[(field, code)] = np.array(sorted(self._postings.get((field, code), ())), dtype=np.int64)
+        return rows
+
+    def _map_matrix(self, min_rows: int = 0):
+        """(Re)map vectors.bin, first extending it to hold `min_rows` rows if needed."""
+        row_bytes = self.dimension * self.dtype.itemsize
+        size = os.path.getsize(self._vectors_path)
+        if size < min_rows * row_bytes:
+            size = max(min_rows, 2 * (size // row_bytes), 1024) * row_bytes
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(size)
+        rows = size // row_bytes
+        if rows and (self._matrix is None or self._matrix.shape[0] != rows):
+            self._matrix = np.memmap(self._vectors_path, dtype=self.dtype, mode="r+", shape=(rows, self.dimension))
+        if self._code_dtype is not None and rows:
+            # codes.bin is kept the same number of rows as vectors.bin
+            if os.path.getsize(self._codes_path) < rows * self._code_dtype.itemsize:
+                with open(self._codes_path, "r+b") as f:
+                    f.truncate(rows * self._code_dtype.itemsize)
+            if self._code_matrix is None or self._code_matrix.shape[0] != rows:
+                self._code_matrix = np.memmap(self._codes_path, dtype=self._code_dtype, mode="r+", shape=(rows,))
+
+    def _codes_view(self) -> Optional[np.memmap]:
+        """The codes to scan, or None while searches must use the full vectors (no quantization, or PQ untrained)."""
+        if self.quantization == "int8" or (self.quantization == "pq" and self._codebook is not None):
+            return self._code_matrix
+        return None
+
+    # Quantization
+
+    def _encode(self, vectors: np.ndarray, codebook: Optional[np.ndarray] = None) -> np.ndarray:
+        """Quantize normalized vectors into code records."""
+        codes = np.zeros(len(vectors), dtype=self._code_dtype)
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            codes["scale"] = scales
+            codes["code"] = np.rint(vectors / scales[:, None])
+            return codes
+        codebook = self._codebook if codebook is None else codebook
+        subvectors = vectors.reshape(len(vectors), self.pq_subvectors, -1)
+        for j in range(self.pq_subvectors):
+            centroids = codebook[j]
+            # Nearest centroid by L2 distance: argmax of 2 x.c - |c|^2
+            codes["code"][:, j] = np.argmax(2 * subvectors[:, j] @ centroids.T - (centroids ** 2).sum(axis=1), axis=1)
+        return codes
+
+    @staticmethod
+    def _pq_tables(codebook: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """Per query, the dot product of each query subvector with each centroid of its subspace."""
+        subvectors = queries.reshape(len(queries), codebook.shape[0], -1)
+        return np.einsum("qjd,jkd->qjk", subvectors, codebook)
+
+    def _encode_all(self, codebook: Optional[np.ndarray] = None):
+        """(Re)write the codes of every stored row."""
+        with self._lock:
+            self._map_matrix(self._rows)
+            matrix, codes = self._matrix, self._code_matrix
+        for start in range(0, self._rows, self.SCAN_BLOCK):
+            block = np.asarray(matrix[start:start + self.SCAN_BLOCK][:self._rows - start], dtype=np.float32)
+            codes[start:start + len(block)] = self._encode(block, codebook)
+        codes.flush()
+
+    def _maybe_train_pq(self):
+        if self.quantization != "pq":
+            return
+        alive = int(self._alive[:self._rows].sum())
+        trained = self._state(self._conn(), "pq_trained")
+        if alive >= self.PQ_TRAIN_MIN and (not trained or alive >= 4 * trained):
+            self.train_pq()
+
+    def train_pq(self, iterations: int = 10):
+        """(Re)train the PQ codebook on a sample (k-means per subspace) and re-encode every vector."""
+        with self._lock:
+            self._sync()
+            rows = np.flatnonzero(self._alive[:self._rows])
+            matrix = self._matrix
+        if rows.size < self.PQ_CENTROIDS:
+            return
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, size=min(rows.size, 100 * self.PQ_CENTROIDS), replace=False))
+        data = matrix[sample].astype(np.float32).reshape(len(sample), self.pq_subvectors, -1)
+
+        codebook = np.empty((self.pq_subvectors, self.PQ_CENTROIDS, data.shape[2]), dtype=np.float32)
+        for j in range(self.pq_subvectors):
+            points = data[:, j]
+            centroids = points[rng.choice(len(points), size=self.PQ_CENTROIDS, replace=False)]
+            for _ in range(iterations):
+                assignment = np.argmax(2 * points @ centroids.T - (centroids ** 2).sum(axis=1), axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, points)
+                counts = np.bincount(assignment, minlength=self.PQ_CENTROIDS)
+                # Empty centroids keep their previous position
+                present = counts > 0
+                centroids[present] = sums[present] / counts[present, None]
+            codebook[j] = centroids
+
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Codes are rewritten under the write lock, so no upsert encodes with the old codebook meanwhile
+                self._encode_all(codebook)
+                temporary = f"{self._codebook_path}.{os.getpid()}.tmp.npy"
+                np.save(temporary, codebook)
+                os.replace(temporary, self._codebook_path)
+                version = self._state(conn, "version") + 1
+                self._set_state(conn, "version", version)
+                self._set_state(conn, "pq_version", version)
+                self._set_state(conn, "pq_trained", int(rows.size))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._sync()
+
+    # Writes
+
+    def upsert(self, vectors: List[Vector], namespace: Optional[str] = None):
+        if not vectors:
+            return
+        latest = {vector_id: (values, metadata) for vector_id, values, metadata in vectors}
+        ids = list(latest)
+        values = self._normalize(np.asarray([latest[i][0] for i in ids], dtype=np.float32))
+        if values.shape[1] != self.dimension:
+            raise ValueError(f"Expected {self.dimension}-dimensional vectors, got {values.shape[1]}")
+
+        with self._lock:
+            self._sync()
+            lists = self._assign_lists(values) if self._centroids is not None else np.full(len(ids), -1)
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._state(conn, "version") + 1
+                existing: Dict[str, int] = {}
+                for i in range(0, len(ids), 500):
+                    batch = ids[i:i + 500]
+                    existing.update(conn.execute(
+                        f"SELECT vector_id, row FROM rows WHERE vector_id IN ({','.join('?' * len(batch))})", batch
+                    ).fetchall())
+                new = len(ids) - len(existing)
+                free = iter([row for (row,) in conn.execute(
+                    "SELECT row FROM rows WHERE vector_id IS NULL ORDER BY row LIMIT ?", (new,)
+                )])
+                next_row = conn.execute("SELECT COALESCE(MAX(row), -1) + 1 FROM rows").fetchone()[0]
+                rows = []
+                for vector_id in ids:
+                    row = existing.get(vector_id)
+                    if row is None:
+                        row = next(free, None)
+                    if row is None:
+                        row = next_row
+                        next_row += 1
+                    rows.append(row)
+
+                # Vectors land before the rows that point at them are committed
+                self._map_matrix(max(rows) + 1)
+                self._matrix[rows] = values.astype(self.dtype)
+                self._matrix.flush()
+                if self._code_dtype is not None:
+                    # Another process may have retrained the PQ codebook since the last sync
+                    if self.quantization == "pq" and self._state(conn, "pq_version") != self._pq_version:
+                        self._pq_version = self._state(conn, "pq_version")
+                        self._codebook = np.load(self._codebook_path)
+                    if self.quantization == "int8" or self._codebook is not None:
+                        self._code_matrix[rows] = self._encode(values)
+                        self._code_matrix.flush()
+                written = self._state(conn, "vectors_written") + len(rows)
+                self._set_state(conn, "vectors_written", written)
+                if self._code_dtype is not None:
+                    self._set_state(conn, f"{self.quantization}_codes_written", written)
+                conn.executemany(
+                    "INSERT INTO rows (row, vector_id, document_id, namespace, uploaded_at, list_id, metadata, version) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (row) DO UPDATE SET vector_id = excluded.vector_id, document_id = excluded.document_id, "
+                    "namespace = excluded.namespace, uploaded_at = excluded.uploaded_at, list_id = excluded.list_id, "
+                    "metadata = excluded.metadata, version = excluded.version",
+                    [
+                        (
+                            row,
+                            vector_id,
+                            latest[vector_id][1].get("document_id"),
+                            namespace,
+                            latest[vector_id][1].get("uploaded_at"),
+                            int(list_id),
+                            json.dumps(latest[vector_id][1]),
+                            version
+                        )
+                        for row, vector_id, list_id in zip(rows, ids, lists)
+                    ]
+                )
+                self._set_state(conn, "version", version)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._sync()
+        self._maybe_build_ivf()
+        self._maybe_train_pq()
+
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None):
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT metadata FROM rows WHERE vector_id = ? AND namespace IS ?", (vector_id, namespace)
+                ).fetchone()
+                if row is not None:
+                    version = self._state(conn, "version") + 1
+                    merged = {**json.loads(row[0]), **metadata}
+                    conn.execute(
+                        "UPDATE rows SET metadata = ?, uploaded_at = ?, version = ? WHERE vector_id = ?",
+                        (json.dumps(merged), merged.get("uploaded_at"), version, vector_id)
+                    )
+                    self._set_state(conn, "version", version)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._sync()
+
+    def delete(self, vector_ids: List[str], namespace: Optional[str] = None):
+        for i in range(0, len(vector_ids), 500):
+            batch = vector_ids[i:i + 500]
+            self._free(f"vector_id IN ({','.join('?' * len(batch))}) AND namespace IS ?", [*batch, namespace])
+
+    def delete_document(self, document_id: str, namespace: Optional[str] = None):
+        self._free("document_id = ? AND namespace IS ?", [document_id, namespace])
+
+    def fetch(self, vector_ids: List[str], namespace: Optional[str] = None) -> Dict[str, List[float]]:
+        """Stored values are the normalized vectors, at the index's precision."""
+        found = {}
+        with self._lock:
+            self._sync()
+            conn = self._conn()
+            for i in range(0, len(vector_ids), 500):
+                batch = vector_ids[i:i + 500]
+                rows = conn.execute(
+                    f"SELECT vector_id, row FROM rows WHERE vector_id IN ({','.join('?' * len(batch))}) AND namespace IS ?",
+                    [*batch, namespace]
+                ).fetchall()
+                found.update((vector_id, self._matrix[row].astype(np.float32).tolist()) for vector_id, row in rows)
+        return found
+
+    def _free(self, where: str, params: List[Any]):
+        """Release the rows matching `where` for reuse."""
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._state(conn, "version") + 1
+                conn.execute(
+                    f"UPDATE rows SET vector_id = NULL, document_id = NULL, namespace = NULL, uploaded_at = NULL, metadata = NULL, "
+                    f"list_id = -1, version = ? WHERE {where}",
+                    (version, *params)
+                )
+                self._set_state(conn, "version", version)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._sync()
+
+    # Search
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        return self._search([vector], top_k, filter, namespace, ivf=True)[0]
+
+    def query_batch(
+        self,
+        vectors: List[List[float]],
+        top_k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """Exact top-k for a batch of queries: each block of rows is scored against every query in one product."""
+        if self.index_type == "ivf" and self._centroids is not None:
+            # Every query probes different lists; those searches are already sublinear
+            return [self.query(vector, top_k, filter, namespace) for vector in vectors]
+        return self._search(vectors, top_k, filter, namespace, ivf=False)
+
+    def _search(
+        self,
+        vectors: List[List[float]],
+        top_k: int,
+        filter: Optional[Dict[str, Any]],
+        namespace: Optional[str],
+        ivf: bool
+    ) -> List[List[Dict[str, Any]]]:
+        queries = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1))
+        filter = dict(filter or {})
+        unsupported = set(filter) - {"document_id", "uploaded_at"}
+        if unsupported:
+            raise ValueError(f"Unsupported filter fields: {sorted(unsupported)}")
+
+        with self._lock:
+            self._sync()
+            n = self._rows
+            # Rows allowed by the namespace and document filters
+            rows = self._candidates(namespace, filter.get("document_id"))
+            if ivf and self.index_type == "ivf" and self._centroids is not None and rows.size > self.ivf_min_vectors:
+                order, bounds = self._inverted_lists()
+                probes = np.argsort(-(self._centroids @ queries[0]))[:self.nprobe]
+                # Rows written before the lists were trained (list -1) are always scanned
+                probed = np.sort(np.concatenate([order[bounds[p]:bounds[p + 1]] for p in (0, *(probes + 1))]))
+                rows = np.intersect1d(rows, probed, assume_unique=True)
+            keep = self._alive[rows]
+            if "uploaded_at" in filter:
+                keep &= self._range_mask(self._uploaded[rows], filter["uploaded_at"])
+            rows = rows[keep]
+            ids = self._ids
+            view = (self._matrix, self._codes_view(), self._codebook)
+
+        if rows.size == 0 or top_k <= 0 or not len(queries):
+            return [[] for _ in vectors]
+        return [
+            self._matches([(row, ids[row], score) for row, score in hits])
+            for hits in self._top_k(view, rows, n, queries, top_k)
+        ]
+
+    def _top_k(self, view, rows: np.ndarray, n: int, queries: np.ndarray, top_k: int) -> List[List[Tuple[int, float]]]:
+        """Best (row, score) pairs per query among `rows`, best first.
+
+        When the vectors are quantized, the codes are scanned for the best
+        `top_k * rescore` rows of each query, which are then rescored exactly
+        from the full-precision vectors.
+        """
+        matrix, codes, codebook = view
+        quantized = codes is not None
+        first = min(rows.size, top_k * self.rescore if quantized else top_k)
+        tables = self._pq_tables(codebook, queries) if quantized and codebook is not None else None
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for block_rows, scores in self._scan(codes if quantized else matrix, rows, n, queries, tables):
+            # Keep the best `first` of (current best, this block) for every query
+            scores = np.concatenate([best_scores, scores.T], axis=1)
+            candidates = np.concatenate([best_rows, np.broadcast_to(block_rows, (len(queries), len(block_rows)))], axis=1)
+            if scores.shape[1] > first:
+                top = np.argpartition(-scores, first - 1, axis=1)[:, :first]
+                scores = np.take_along_axis(scores, top, axis=1)
+                candidates = np.take_along_axis(candidates, top, axis=1)
+            best_scores, best_rows = scores, candidates
+
+        results = []
+        for query, query_rows, query_scores in zip(queries, best_rows, best_scores):
+            query_rows = query_rows[query_scores > -np.inf]
+            if quantized:
+                query_rows = np.sort(query_rows)
+                query_scores = matrix[query_rows].astype(np.float32, copy=False) @ query
+            else:
+                query_scores = query_scores[query_scores > -np.inf]
+            order = np.argsort(-query_scores)[:top_k]
+            results.append([(int(query_rows[i]), float(query_scores[i])) for i in order])
+        return results
+
+    def _scan(self, source: np.memmap, rows: np.ndarray, n: int, queries: np.ndarray, tables: Optional[np.ndarray]):
+        """Yield (rows, rows x queries scores) in blocks, scanning contiguously when most rows are wanted."""
+        if rows.size * 4 >= n:
+            wanted = np.zeros(n, dtype=bool)
+            wanted[rows] = True
+            for start in range(0, n, self.SCAN_BLOCK):
+                block = source[start:start + self.SCAN_BLOCK][:n - start]
+                positions = np.flatnonzero(wanted[start:start + len(block)])
+                if positions.size:
+                    yield positions + start, self._block_scores(block, queries, tables)[positions]
+            return
+        for start in range(0, rows.size, self.SCAN_BLOCK):
+            block = rows[start:start + self.SCAN_BLOCK]
+            yield block, self._block_scores(source[block], queries, tables)
+
+    def _block_scores(self, block: np.ndarray, queries: np.ndarray, tables: Optional[np.ndarray]) -> np.ndarray:
+        """Rows x queries scores of a block of vectors, int8 codes or PQ codes."""
+        if tables is not None:
+            # One contiguous gather per subspace is much faster than 2-D fancy indexing
+            codes = np.ascontiguousarray(block["code"].T)
+            scores = np.zeros((codes.shape[1], len(tables)), dtype=np.float32)
+            for q, table in enumerate(tables):
+                for subspace, subspace_codes in enumerate(codes):
+                    scores[:, q] += table[subspace].take(subspace_codes)
+            return scores
+        if block.dtype.names:
+            return (block["code"].astype(np.float32) @ queries.T) * block["scale"][:, None]
+        return block.astype(np.float32, copy=False) @ queries.T
+
+    def _matches(self, hits: List[Tuple[int, str, float]]) -> List[Dict[str, Any]]:
+        """Attach stored metadata to (row, vector_id, score) hits."""
+        if not hits:
+            return []
+        found = dict(
+            ((row, vector_id), metadata)
+            for row, vector_id, metadata in self._conn().execute(
+                f"SELECT row, vector_id, metadata FROM rows WHERE row IN ({','.join('?' * len(hits))})",
+                [row for row, _, _ in hits]
+            )
+        )
+        # Skip rows deleted or reused since the scan
+        return [
+            {"id": vector_id, "score": score, "metadata": json.loads(found[(row, vector_id)])}
+            for row, vector_id, score in hits
+            if (row, vector_id) in found
+        ]
+
+    def _candidates(self, namespace: Optional[str], document_filter: Any) -> np.ndarray:
+        """Sorted rows in `namespace` matching a document_id condition."""
+        if namespace is None:
+            # The default namespace has no posting set; freed rows also match and are dropped as dead
+            selections = [np.flatnonzero(self._namespaces[:self._rows] == -1)]
+        else:
+            selections = [self._posting("namespace", namespace)]
+        if document_filter is not None:
+            if isinstance(document_filter, dict):
+                unsupported = set(document_filter) - {"$eq", "$in"}
+                if unsupported:
+                    raise ValueError(f"Unsupported document_id operators: {sorted(unsupported)}")
+                values = document_filter.get("$in", [])
+                if "$eq" in document_filter:
+                    values = [*values, document_filter["$eq"]]
+            else:
+                values = [document_filter]
+            postings = [self._posting("document_id", value) for value in values]
+            selections.append(np.unique(np.concatenate(postings)) if postings else np.zeros(0, dtype=np.int64))
+        rows = min(selections, key=len)
+        for other in selections:
+            if other is not rows:
+                rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    @staticmethod
+    def _range_mask(values: np.ndarray, condition: Dict[str, float]) -> np.ndarray:
+        """Mask for a $gt/$gte/$lt/$lte condition; rows without a value never match."""
+        operators = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}
+        if not isinstance(condition, dict) or set(condition) - set(operators):
+            raise ValueError(f"Unsupported range condition: {condition}")
+        mask = ~np.isnan(values)
+        for operator, bound in condition.items():
+            mask &= operators[operator](values, bound)
+        return mask
+
+    # IVF
+
+    def _assign_lists(self, vectors: np.ndarray, centroids: Optional[np.ndarray] = None) -> np.ndarray:
+        """Nearest centroid of each (normalized) vector, in blocks to bound memory."""
+        centroids = self._centroids if centroids is None else centroids
+        lists = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), 8192):
+            block = np.asarray(vectors[start:start + 8192], dtype=np.float32)
+            lists[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return lists
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows grouped by list: rows of list l are order[bounds[l + 1]:bounds[l + 2]], unassigned rows first."""
+        if self._inverted is None:
+            lists = self._lists[:self._rows]
+            order = np.argsort(lists, kind="stable").astype(np.int64)
+            bounds = np.searchsorted(lists[order], np.arange(-1, len(self._centroids) + 1))
+            self._inverted = (order, bounds)
+        return self._inverted
+
+    def _maybe_build_ivf(self):
+        if self.index_type != "ivf":
+            return
+        alive = int(self._alive[:self._rows].sum())
+        trained = self._state(self._conn(), "ivf_trained")
+        if alive >= self.ivf_min_vectors and (not trained or alive >= 4 * trained):
+            self.build_ivf()
+
+    def build_ivf(self, iterations: int = 10):
+        """(Re)train the IVF centroids on a sample and assign every vector to a list."""
+        with self._lock:
+            self._sync()
+            rows = np.flatnonzero(self._alive[:self._rows])
+            matrix = self._matrix
+        if rows.size == 0:
+            return
+        nlist = min(self.nlist or max(1, int(np.sqrt(rows.size))), rows.size)
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(rows, size=min(rows.size, max(40 * nlist, 10000)), replace=False))
+        data = matrix[sample].astype(np.float32)
+
+        centroids = data[rng.choice(len(data), size=nlist, replace=False)]
+        for _ in range(iterations):
+            assignment = self._assign_lists(data, centroids)
+            order = np.argsort(assignment, kind="stable")
+            present, starts = np.unique(assignment[order], return_index=True)
+            # Empty lists keep their previous centroid
+            centroids[present] = self._normalize(np.add.reduceat(data[order], starts, axis=0))
+
+        lists = np.empty(rows.size, dtype=np.int32)
+        for start in range(0, rows.size, self.SCAN_BLOCK):
+            block = rows[start:start + self.SCAN_BLOCK]
+            lists[start:start + len(block)] = self._assign_lists(matrix[block], centroids)
+
+        with self._lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._state(conn, "version") + 1
+                temporary = f"{self._centroids_path}.{os.getpid()}.tmp.npy"
+                np.save(temporary, centroids)
+                os.replace(temporary, self._centroids_path)
+                conn.executemany(
+                    "UPDATE rows SET list_id = ?, version = ? WHERE row = ? AND vector_id IS NOT NULL",
+                    [(int(list_id), version, int(row)) for row, list_id in zip(rows, lists)]
+                )
+                self._set_state(conn, "version", version)
+                self._set_state(conn, "ivf_version", version)
+                self._set_state(conn, "ivf_trained", int(rows.size))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._sync()
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            self._sync()
+            return {
+                "backend": "local",
+                "vectors": int(self._alive[:self._rows].sum()),
+                "dimension": self.dimension,
+                "dtype": self.dtype.name,
+                "index_type": self.index_type,
+                "ivf_lists": 0 if self._centroids is None else len(self._centroids),
+                "quantization": self.quantization,
+                "pq_trained": self._codebook is not None,
+                "scan_bytes_per_vector": self._code_dtype.itemsize if self._codes_view() is not None else self.dimension * self.dtype.itemsize
+            }
+
+
+class FakeVectorStore(VectorStore):
+    """In-memory stand-in for a hosted index, with simulated request latency and failures.
+
+    Every call sleeps for `request_latency` plus `per_vector_latency` per
+    vector written, like a round trip to a remote server, and fails with
+    TransientVectorStoreError at `failure_rate`. Like some hosted indexes it
+    can only delete by ID. Used for offline benchmarks and local development.
+    """
+
+    def __init__(
+        self,
+        dimension: int = 768,
+        request_latency: float = 0.02,
+        per_vector_latency: float = 0.0001,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None
+    ):
+        self.dimension = dimension
+        self.request_latency = request_latency
+        self.per_vector_latency = per_vector_latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._random = random.Random(seed)
+        self._namespaces: Dict[str, Dict[str, Tuple[np.ndarray, Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def _request(self, vectors: int = 0):
+        with self._lock:
+            self.requests += 1
+            failed = self._random.random() < self.failure_rate
+            if failed:
+                self.failures += 1
+        time.sleep(self.request_latency + self.per_vector_latency * vectors)
+        if failed:
+            raise TransientVectorStoreError("Fake vector store request failed")
+
+    def upsert(self, vectors: List[Vector], namespace: Optional[str] = None):
+        self._request(len(vectors))
+        with self._lock:
+            stored = self._namespaces.setdefault(namespace or "", {})
+            for vector_id, values, metadata in vectors:
+                array = np.asarray(values, dtype=np.float32)
+                stored[vector_id] = (array / (np.linalg.norm(array) or 1.0), dict(metadata))
+
+    def update_metadata(self, vector_id: str, metadata: Dict[str, Any], namespace: Optional[str] = None):
+        self._request()
+        with self._lock:
+            stored = self._namespaces.get(namespace or "", {})
+            if vector_id in stored:
+                stored[vector_id][1].update(metadata)
+
+    def delete(self, vector_ids: List[str], namespace: Optional[str] = None):
+        self._request()
+        with self._lock:
+            stored = self._namespaces.get(namespace or "", {})
+            for vector_id in vector_ids:
+                stored.pop(vector_id, None)
+
+    def delete_document(self, document_id: str, namespace: Optional[str] = None):
+        raise NotImplementedError("The fake vector store only deletes by ID")
+
+    def fetch(self, vector_ids: List[str], namespace: Optional[str] = None) -> Dict[str, List[float]]:
+        self._request()
+        with self._lock:
+            stored = self._namespaces.get(namespace or "", {})
+            return {vector_id: stored[vector_id][0].tolist() for vector_id in vector_ids if vector_id in stored}
+
+    def query(
+        self,
+        vector: List[float],
+        top_k: int,
+        filter: Optional[Dict[str, Any]] = None,
+        namespace: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        self._request()
+        with self._lock:
+            items = [
+                (vector_id, values, metadata)
+                for vector_id, (values, metadata) in self._namespaces.get(namespace or "", {}).items()
+                if self._matches(metadata, filter or {})
+            ]
+        if not items:
+            return []
+        scores = np.stack([values for _, values, _ in items]) @ np.asarray(vector, dtype=np.float32)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [{"id": items[i][0], "score": float(scores[i]), "metadata": dict(items[i][2])} for i in order]
+
+    @staticmethod
+    def _matches(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+        """Evaluate the filter subset described on VectorStore against one vector's metadata."""
+        operators = {
+            "$eq": lambda value, operand: value == operand,
+            "$in": lambda value, operand: value in operand,
+            "$gt": lambda value, operand: value is not None and value > operand,
+            "$gte": lambda value, operand: value is not None and value >= operand,
+            "$lt": lambda value, operand: value is not None and value < operand,
+            "$lte": lambda value, operand: value is not None and value <= operand,
+        }
+        for key, condition in filter.items():
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            if not all(operators[operator](metadata.get(key), operand) for operator, operand in condition.items()):
+                return False
+        return True
+
+    def describe(self) -> Dict[str, Any]:
+        self._request()
+        with self._lock:
+            return {"backend": "fake", "vectors": sum(len(stored) for stored in self._namespaces.values())}
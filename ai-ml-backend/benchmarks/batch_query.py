@@ -0,0 +1,79 @@
+"""Batch query throughput benchmark.
+
+Runs a checklist of questions against one user's documents in a local
+vector index, first one question at a time (one embedding request and one
+index query each, like repeated /documents/query calls), then in groups of
+increasing size (one batch embedding request and one vectorized top-k per
+group, like /documents/query/batch). Embeddings come from the offline fake
+backend with simulated request latency:
+
+    python benchmarks/batch_query.py --vectors 100000 --questions 512
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from app.services.embedding_backends import FakeEmbeddingBackend  # noqa: E402
+from app.services.embedding_batcher import EmbeddingBatcher  # noqa: E402
+from app.services.vector_stores import LocalVectorStore  # noqa: E402
+
+
+async def one_at_a_time(store, batcher, questions, top_k):
+    for question in questions:
+        embedding = (await batcher.embed([question]))[0]
+        await asyncio.to_thread(store.query, embedding, top_k, None, "reviewer")
+
+
+async def batched(store, batcher, questions, top_k, group_size):
+    async def group(start):
+        embeddings = await batcher.embed(questions[start:start + group_size])
+        return await asyncio.to_thread(store.query_batch, embeddings, top_k, None, "reviewer")
+
+    await asyncio.gather(*(group(start) for start in range(0, len(questions), group_size)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--questions", type=int, default=512)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--groups", default="1,8,32,100")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per embedding request")
+    args = parser.parse_args()
+
+    backend = FakeEmbeddingBackend(dimension=args.dimension, request_latency=args.latency, per_text_latency=0)
+    questions = [f"Checklist item {i}: does the agreement address obligation {i}?" for i in range(args.questions)]
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, args.dimension)
+        for start in range(0, args.vectors, 10000):
+            count = min(10000, args.vectors - start)
+            vectors = rng.normal(size=(count, args.dimension)).astype(np.float32)
+            store.upsert(
+                [(f"chunk{start + i}", vectors[i].tolist(), {"document_id": "contract"}) for i in range(count)],
+                namespace="reviewer"
+            )
+
+        print(f"{args.questions} questions, {args.vectors} vectors x {args.dimension}, {args.latency * 1000:.0f} ms per embedding request")
+        batcher = EmbeddingBatcher(backend, batch_size=100, max_concurrency=4)
+        started = time.perf_counter()
+        asyncio.run(one_at_a_time(store, batcher, questions, args.top_k))
+        elapsed = time.perf_counter() - started
+        print(f"{'one at a time':<14} {elapsed:8.2f}s {args.questions / elapsed:8.1f} questions/s")
+        for group_size in (int(n) for n in args.groups.split(",")):
+            batcher = EmbeddingBatcher(backend, batch_size=min(group_size, 100), max_concurrency=4)
+            started = time.perf_counter()
+            asyncio.run(batched(store, batcher, questions, args.top_k, group_size))
+            elapsed = time.perf_counter() - started
+            print(f"{f'groups of {group_size}':<14} {elapsed:8.2f}s {args.questions / elapsed:8.1f} questions/s")
+
+
+if __name__ == "__main__":
+    main()
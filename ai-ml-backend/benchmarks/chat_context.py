@@ -0,0 +1,94 @@
+"""Document chat prompt size: retrieved, token-budgeted context vs. the whole document.
+
+Ingests a synthetic contract (the generator from chunking.py) with the
+offline fake embedding backend and vector store, then plays a multi-turn
+conversation through ChatService against the fake model. For each turn it
+prints the prompt tokens sent, the tokens the previous whole-document
+prompt would have taken, the share saved, the excerpts used and the time
+spent building the prompt (retrieval included; the fake model answers
+instantly):
+
+    python benchmarks/chat_context.py --megabytes 0.5 --budget 4000 --turns 8
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import make_corpus  # noqa: E402
+from app.core.config import settings  # noqa: E402
+from app.services.chat_service import ChatService  # noqa: E402
+from app.services.chunk_store import ChunkStore, chunk_fingerprint  # noqa: E402
+from app.services.chunker import LegalChunker  # noqa: E402
+from app.services.embeddings import EmbeddingsService  # noqa: E402
+from app.services.llm_backends import FakeLLMBackend  # noqa: E402
+from app.services.llm_gateway import LLMGateway  # noqa: E402
+
+QUESTIONS = [
+    "What is the notice period for termination?",
+    "Who pays for maintenance and repair of the premises?",
+    "Can the tenant assign or sublease without consent?",
+    "What happens on a force majeure event?",
+    "How is the security deposit returned?",
+    "Which governing law and jurisdiction apply?",
+    "What insurance must the lessee carry?",
+    "What are the remedies for default or breach?",
+]
+
+
+async def run(args, directory):
+    settings.EMBEDDING_BACKEND = "fake"
+    settings.VECTOR_STORE = "fake"
+    settings.EMBEDDING_CACHE_ENABLED = False
+    settings.QUERY_CACHE_ENABLED = False
+    settings.HYBRID_SEARCH = False
+    settings.CHAT_CONTEXT_TOKENS = args.budget
+    settings.CHAT_HISTORY_TOKENS = args.history_budget
+
+    chunk_store = ChunkStore(os.path.join(directory, "chunks.sqlite3"))
+    embeddings_service = EmbeddingsService(chunk_store)
+    chunks = LegalChunker(settings.CHUNK_SIZE_TOKENS, settings.CHUNK_OVERLAP_TOKENS).chunk_text(make_corpus(args.megabytes))
+    await embeddings_service.store_embeddings("lease", chunks, {"user_id": "reviewer"})
+    await asyncio.to_thread(chunk_store.save_document, "lease", "reviewer", "lease.pdf")
+    await asyncio.to_thread(chunk_store.replace_manifest, "lease", [
+        {"chunk_index": i, "vector_id": f"lease_{i}", "fingerprint": chunk_fingerprint(chunk["text"]), "metadata": chunk["metadata"]}
+        for i, chunk in enumerate(chunks)
+    ])
+
+    gateway = LLMGateway(FakeLLMBackend(response_tokens=60, first_token_latency=0, per_token_latency=0))
+    chat = ChatService(chunk_store, embeddings_service, gateway=gateway)
+    session_id = await chat.start_chat("lease", "reviewer")
+    print(f"{args.megabytes} MB contract, {len(chunks)} chunks, budget {args.budget} tokens, tokenizer {chat.tokenizer.name}")
+    saved = sent = 0
+    for turn in range(args.turns):
+        question = QUESTIONS[turn % len(QUESTIONS)]
+        started = time.perf_counter()
+        usage = (await chat.chat_with_document(session_id, question, "lease"))["usage"]
+        build_ms = (time.perf_counter() - started) * 1000
+        sent += usage["prompt_tokens"]
+        saved += usage["saved_tokens"]
+        print(
+            f"  turn {turn + 1}: {usage['prompt_tokens']:6d} tokens vs {usage['full_document_tokens']:8d} whole-document  "
+            f"saved {usage['saved_tokens'] / usage['full_document_tokens']:6.1%}  "
+            f"{usage['chunks']:2d} excerpts  build {build_ms:6.1f} ms"
+        )
+    print(f"total: {sent} tokens sent, {saved} saved ({saved / (sent + saved):.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=0.5)
+    parser.add_argument("--budget", type=int, default=4000)
+    parser.add_argument("--history-budget", type=int, default=1000)
+    parser.add_argument("--turns", type=int, default=8)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
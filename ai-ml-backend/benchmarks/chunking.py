@@ -0,0 +1,127 @@
+"""Chunker benchmark: LegalChunker vs. the previous character-based _chunk_text.
+
+Generates a synthetic multi-megabyte legal corpus (articles, numbered
+clauses, lettered sub-clauses, schedules) and reports, for each chunker:
+chunk count, duplicate ratio (share of emitted text that repeats text
+already emitted), exact duplicate chunks, tiny chunks and wall time.
+
+    python benchmarks/chunking.py --megabytes 5
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chunker import LegalChunker  # noqa: E402
+
+WORDS = (
+    "the lessee lessor shall may not pay rent premises term notice agreement party parties "
+    "default breach remedy indemnify liability damages force majeure event termination "
+    "renewal option assignment sublease consent writing deposit security interest insurance "
+    "maintenance repair alteration landlord tenant governing law jurisdiction arbitration"
+).split()
+
+
+def sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(8, 30))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_corpus(megabytes: float, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    parts = []
+    size = 0
+    article = 0
+    while size < megabytes * 1024 * 1024:
+        article += 1
+        lines = [f"ARTICLE {article} {rng.choice(WORDS).upper()} {rng.choice(WORDS).upper()}"]
+        for clause in range(1, rng.randint(3, 9)):
+            lines.append(f"{article}.{clause} " + " ".join(sentence(rng) for _ in range(rng.randint(1, 4))))
+            for letter in "abcd"[:rng.randint(0, 4)]:
+                lines.append(f"({letter}) " + sentence(rng))
+        if article % 25 == 0:
+            lines.append(f"SCHEDULE {article // 25}")
+            lines.extend(sentence(rng) for _ in range(rng.randint(5, 20)))
+        block = "\n".join(lines) + "\n\n"
+        parts.append(block)
+        size += len(block)
+    return "".join(parts)
+
+
+def legacy_chunk_text(text: str, chunk_size: int = 1000, overlap: int = 200, max_chunks: int = 10_000_000):
+    """The previous DocumentProcessor._chunk_text.
+
+    The original loop never terminates once it reaches the end of the text
+    (start = end - overlap keeps re-emitting the tail), so this copy stops
+    after the first chunk that reaches the end. Everything else is unchanged.
+    """
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    chunks = []
+    start = 0
+    text_length = len(text)
+
+    while start < text_length and len(chunks) < max_chunks:
+        end = start + chunk_size
+        if end > text_length:
+            end = text_length
+
+        if end < text_length:
+            last_period = text.rfind('.', start, end)
+            last_newline = text.rfind('\n', start, end)
+            end = max(last_period, last_newline) + 1 if max(last_period, last_newline) > start else end
+
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        if end >= text_length:
+            break
+        start = end - overlap
+
+    return chunks
+
+
+def report(label, chunks, source_size, elapsed, tiny_threshold):
+    emitted = sum(len(chunk) for chunk in chunks)
+    counts = Counter(chunks)
+    duplicates = sum(count - 1 for count in counts.values() if count > 1)
+    tiny = sum(1 for chunk in chunks if len(chunk) < tiny_threshold)
+    print(
+        f"{label:<28} chunks={len(chunks):>8} duplicate_ratio={max(emitted - source_size, 0) / emitted:6.3f} "
+        f"exact_dupes={duplicates:>6} tiny={tiny:>6} time={elapsed:7.3f}s "
+        f"({source_size / 1024 / 1024 / elapsed:6.1f} MB/s)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=5.0)
+    parser.add_argument("--chunk-tokens", type=int, default=200)
+    parser.add_argument("--overlap-tokens", type=int, default=30)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.megabytes)
+    normalized_size = len(re.sub(r"\s+", " ", corpus).strip())
+    print(f"corpus: {len(corpus) / 1024 / 1024:.2f} MB, {len(corpus.split())} words")
+
+    started = time.perf_counter()
+    legacy = legacy_chunk_text(corpus)
+    report("legacy _chunk_text (1000c)", legacy, normalized_size, time.perf_counter() - started, 250)
+
+    chunker = LegalChunker(chunk_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens)
+    started = time.perf_counter()
+    chunks = [chunk["text"] for chunk in chunker.chunk_blocks([(corpus, {})])]
+    elapsed = time.perf_counter() - started
+    # Compare like with like: measure emitted text with whitespace collapsed
+    chunks = [" ".join(chunk.split()) for chunk in chunks]
+    report(f"LegalChunker ({args.chunk_tokens}t/{args.overlap_tokens}t)", chunks, normalized_size, elapsed, 250)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""DOCX extraction throughput benchmark.
+
+Writes a large synthetic lease (numbered clauses, rent schedule tables,
+headers, footers and footnotes) and measures the streaming extractor on its
+own and feeding LegalChunker: MB/s, blocks, chunks and peak Python memory.
+If python-docx is installed, the previous paragraphs-only extraction is
+measured too for comparison:
+
+    python benchmarks/docx_extraction.py --paragraphs 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from xml.sax.saxutils import escape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.chunker import LegalChunker  # noqa: E402
+from app.services.docx_extraction import iter_docx_parts  # noqa: E402
+
+NS = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+WORDS = (
+    "the tenant shall pay rent monthly in advance landlord premises term deposit notice "
+    "repair insurance default interest assignment consent lease agreement clause schedule"
+).split()
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/word/document.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '</Types>'
+)
+
+
+def paragraph(text, style=None):
+    props = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{props}<w:r><w:t xml:space=\"preserve\">{escape(text)}</w:t></w:r></w:p>"
+
+
+def table(rows):
+    body = "".join(
+        "<w:tr>" + "".join(f"<w:tc>{paragraph(cell)}</w:tc>" for cell in row) + "</w:tr>"
+        for row in rows
+    )
+    return f"<w:tbl>{body}</w:tbl>"
+
+
+def write_docx(path, paragraphs, seed=11):
+    rng = random.Random(seed)
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        with archive.open("word/document.xml", "w", force_zip64=True) as f:
+            f.write(f'<?xml version="1.0" encoding="UTF-8"?><w:document {NS}><w:body>'.encode())
+            for i in range(paragraphs):
+                if i % 50 == 0:
+                    f.write(paragraph(f"Article {i // 50 + 1} Terms", "Heading1").encode())
+                if i % 400 == 399:
+                    rows = [["Period", "Monthly rent", "Due date"]] + [
+                        [f"Year {year}", f"{rng.randint(1000, 9000)}.00", f"{rng.randint(1, 28)} of each month"]
+                        for year in range(1, 11)
+                    ]
+                    f.write(table(rows).encode())
+                text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(15, 60))).capitalize() + "."
+                f.write(paragraph(f"{i // 50 + 1}.{i % 50 + 1} {text}").encode())
+            f.write(b"</w:body></w:document>")
+        for n in (1, 2):
+            archive.writestr(f"word/header{n}.xml", f"<w:hdr {NS}>{paragraph('CONFIDENTIAL LEASE AGREEMENT')}</w:hdr>")
+            archive.writestr(f"word/footer{n}.xml", f"<w:ftr {NS}>{paragraph('Initials: ______ / ______')}</w:ftr>")
+        notes = "".join(
+            f'<w:footnote w:id="{n}">{paragraph(f"See clause {n}.1 for the applicable notice period.")}</w:footnote>'
+            for n in range(1, 200)
+        )
+        archive.writestr("word/footnotes.xml", f"<w:footnotes {NS}>{notes}</w:footnotes>")
+
+
+def measure(label, size, fn):
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    # Peak memory is taken from a second run, since tracing slows the first one down severalfold
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<32} {result:<16} time={elapsed:7.2f}s ({size / 1024 / 1024 / elapsed:6.1f} MB/s) peak={peak / 1024 / 1024:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, default=200_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "lease.docx")
+        write_docx(path, args.paragraphs)
+        with zipfile.ZipFile(path) as archive:
+            size = archive.getinfo("word/document.xml").file_size
+        print(f"document.xml: {size / 1024 / 1024:.1f} MB uncompressed, {os.path.getsize(path) / 1024 / 1024:.1f} MB on disk")
+
+        def extract():
+            counts = {}
+            for part, blocks in iter_docx_parts(path):
+                counts[part] = sum(1 for _ in blocks)
+            return f"blocks={sum(counts.values())}"
+
+        def extract_and_chunk():
+            chunker = LegalChunker()
+            chunks = 0
+            for part, blocks in iter_docx_parts(path):
+                chunks += sum(1 for _ in chunker.chunk_blocks(blocks))
+            return f"chunks={chunks}"
+
+        measure("streaming extract", size, extract)
+        measure("streaming extract + chunk", size, extract_and_chunk)
+
+        try:
+            import docx
+        except ImportError:
+            print("python-docx not installed; skipping the previous paragraphs-only extraction")
+            return
+
+        def legacy():
+            doc = docx.Document(path)
+            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+            return f"chars={len(text)}"
+
+        measure("python-docx paragraphs (old)", size, legacy)
+
+
+if __name__ == "__main__":
+    main()
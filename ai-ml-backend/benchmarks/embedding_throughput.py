@@ -0,0 +1,80 @@
+"""Offline embedding throughput benchmark.
+
+Compares the old one-request-per-chunk loop with EmbeddingBatcher at several
+concurrency levels, against FakeEmbeddingBackend (simulated request latency
+and an optional requests-per-second limit, no network access):
+
+    python benchmarks/embedding_throughput.py --chunks 2000 --rps 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.embedding_backends import FakeEmbeddingBackend  # noqa: E402
+from app.services.embedding_batcher import EmbeddingBatcher  # noqa: E402
+
+
+def make_backend(args) -> FakeEmbeddingBackend:
+    return FakeEmbeddingBackend(
+        dimension=args.dimension,
+        request_latency=args.latency,
+        per_text_latency=args.per_text_latency,
+        max_requests_per_second=args.rps
+    )
+
+
+async def serial(texts, args):
+    backend = make_backend(args)
+    batcher = EmbeddingBatcher(backend, batch_size=1, max_concurrency=1)
+    started = time.perf_counter()
+    for text in texts:
+        await batcher.embed([text])
+    return time.perf_counter() - started, backend
+
+
+async def batched(texts, args, concurrency):
+    backend = make_backend(args)
+    batcher = EmbeddingBatcher(backend, batch_size=args.batch_size, max_concurrency=concurrency)
+    started = time.perf_counter()
+    embeddings = await batcher.embed(texts)
+    elapsed = time.perf_counter() - started
+    expected = [backend.embed_text(text) for text in texts[:50]]
+    assert embeddings[:50] == expected, "results out of input order"
+    return elapsed, backend
+
+
+def report(label, texts, elapsed, backend):
+    print(
+        f"{label:<22} {elapsed:8.2f}s {len(texts) / elapsed:10.1f} chunks/s "
+        f"{backend.requests:6d} requests {backend.rate_limited:5d} rate-limited"
+    )
+
+
+async def run(args):
+    texts = [f"Clause {i}. The lessee shall pay rent on the first day of month {i % 12 + 1}." for i in range(args.chunks)]
+    print(f"{args.chunks} chunks, batch size {args.batch_size}, {args.latency * 1000:.0f}ms per request, rps limit {args.rps or 'none'}")
+    if not args.skip_serial:
+        report("serial (1 per request)", texts, *await serial(texts, args))
+    for concurrency in args.concurrency:
+        report(f"batched x{concurrency}", texts, *await batched(texts, args, concurrency))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per request")
+    parser.add_argument("--per-text-latency", type=float, default=0.0005)
+    parser.add_argument("--rps", type=float, default=0, help="Simulated requests-per-second limit (0 = unlimited)")
+    parser.add_argument("--skip-serial", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
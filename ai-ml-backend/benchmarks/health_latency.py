@@ -0,0 +1,108 @@
+"""Measure /health latency while documents are being uploaded.
+
+Run against a live server:
+
+    uvicorn app.main:app --port 8000
+    python benchmarks/health_latency.py --token <jwt> --file contract.pdf
+
+The script first samples /health on an idle server, then again while
+``--uploads`` concurrent uploads are being ingested, and prints p50/p95/p99 for
+both phases. A large gap between the two means something on the upload path
+is blocking the event loop.
+"""
+import argparse
+import asyncio
+import mimetypes
+import os
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label: str, samples: List[float]):
+    if not samples:
+        print(f"{label}: no samples")
+        return
+    print(
+        f"{label}: n={len(samples)} "
+        f"p50={percentile(samples, 50) * 1000:.1f}ms "
+        f"p95={percentile(samples, 95) * 1000:.1f}ms "
+        f"p99={percentile(samples, 99) * 1000:.1f}ms "
+        f"max={max(samples) * 1000:.1f}ms "
+        f"mean={statistics.mean(samples) * 1000:.1f}ms"
+    )
+
+
+async def probe_health(client: httpx.AsyncClient, path: str, stop: asyncio.Event, samples: List[float], interval: float):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await client.get(path)
+        samples.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+
+async def upload(client: httpx.AsyncClient, token: str, file_path: str):
+    content_type = mimetypes.guess_type(file_path)[0] or "application/pdf"
+    with open(file_path, "rb") as f:
+        files = {"file": (os.path.basename(file_path), f.read(), content_type)}
+    headers = {"Authorization": f"Bearer {token}"}
+    response = await client.post("/documents/upload", files=files, headers=headers)
+    response.raise_for_status()
+
+    # Uploads are ingested in the background; wait for the job to settle
+    job_id = response.json()["job_id"]
+    while True:
+        job = (await client.get(f"/documents/jobs/{job_id}", headers=headers)).json()
+        if job["status"] in ("completed", "failed"):
+            return
+        await asyncio.sleep(0.5)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.probes + args.uploads + 4)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        idle: List[float] = []
+        stop = asyncio.Event()
+        probes = [asyncio.create_task(probe_health(client, args.path, stop, idle, args.interval)) for _ in range(args.probes)]
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        await asyncio.gather(*probes)
+
+        loaded: List[float] = []
+        stop = asyncio.Event()
+        probes = [asyncio.create_task(probe_health(client, args.path, stop, loaded, args.interval)) for _ in range(args.probes)]
+        started = time.perf_counter()
+        await asyncio.gather(*(upload(client, args.token, args.file) for _ in range(args.uploads)))
+        upload_seconds = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*probes)
+
+    report("idle   ", idle)
+    report("loaded ", loaded)
+    print(f"{args.uploads} uploads finished in {upload_seconds:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/health/")
+    parser.add_argument("--token", required=True, help="Bearer token for /documents/upload")
+    parser.add_argument("--file", required=True, help="Document to upload")
+    parser.add_argument("--uploads", type=int, default=4, help="Concurrent uploads")
+    parser.add_argument("--probes", type=int, default=8, help="Concurrent health probes")
+    parser.add_argument("--interval", type=float, default=0.05, help="Pause between probes, in seconds")
+    parser.add_argument("--idle-seconds", type=float, default=5.0)
+    parser.add_argument("--timeout", type=float, default=300.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""Hybrid retrieval benchmark: BM25, vector and fused recall and latency on a legal test set.
+
+Generates contracts between uniquely named parties, one chunk per numbered
+clause (force majeure, indemnity, rent review, ...), each using its
+Title Case defined term. Each query targets one known clause, either by
+section number ("Section 12.4(c) of the Harlow Bay Logistics Ltd agreement") or by
+defined term and party ("Force Majeure Harlow Bay Logistics Ltd"), and
+recall@k is the share of queries whose clause is in the top k.
+
+No embedding model is called: a hashed bag of subword pieces (numbers are
+split into digits, as subword tokenizers do) stands in for it, so the
+vector figures show the failure mode on exact tokens rather than the
+quality of a real model. The fused matches are then re-ranked with the
+term overlap scorer, fused with the retrieval rank (as /documents/query
+does) and by the scorer alone, to compare quality with re-ranking on and
+off. Postings size is compared with raw 4-byte doc ID and frequency pairs:
+
+    python benchmarks/hybrid_search.py --documents 2000
+"""
+import argparse
+import hashlib
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from app.services.lexical_index import LexicalIndex, decode_postings, reciprocal_rank_fusion  # noqa: E402
+from app.services.reranker import Reranker, TermOverlapScorer  # noqa: E402
+from app.services.vector_stores import LocalVectorStore  # noqa: E402
+
+FIRST = "Harlow Meridian Ashford Keystone Brightwater Northgate Halcyon Redfern Calloway Westmere Thornbury Oakridge".split()
+MIDDLE = "Bay River Crown Summit Atlas Pioneer Harbour Granite Silver Cedar Falcon Beacon".split()
+SECOND = "Logistics Holdings Properties Capital Foods Energy Textiles Media Pharma Shipping Robotics Estates".split()
+SUFFIX = "Ltd LLP Inc GmbH Pvt".split()
+CLAUSES = {
+    "Force Majeure": "Neither party is liable for delay caused by a Force Majeure Event, provided notice is given within {n} days",
+    "Indemnified Losses": "The {role} shall indemnify the other party against all Indemnified Losses arising from breach",
+    "Rent Review Date": "On each Rent Review Date the annual rent shall be increased by {n} percent",
+    "Confidential Information": "Each party shall keep the Confidential Information of the other party secret for {n} years",
+    "Termination Notice": "Either party may end this agreement by serving a Termination Notice of at least {n} days",
+    "Governing Law": "This agreement and any dispute shall be governed by the Governing Law of {place}",
+    "Security Deposit": "The {role} shall pay a Security Deposit equal to {n} months of rent on signing",
+    "Permitted Use": "The premises may only be used for the Permitted Use of {use} and for no other purpose",
+    "Limitation Period": "No claim may be brought after the Limitation Period of {n} years has expired",
+    "Assignment Consent": "The {role} shall not assign this agreement without Assignment Consent in writing",
+}
+PLACES = "England Delaware Singapore Ontario Maharashtra Bavaria".split()
+USES = "warehousing retail offices manufacturing laboratories".split()
+ROLES = "Tenant Supplier Licensee Contractor Borrower".split()
+
+
+def subword_embedding(text, dimension=256):
+    """Hashed bag of lowercased words, with numbers broken into single characters."""
+    vector = np.zeros(dimension, dtype=np.float32)
+    for piece in re.findall(r"[a-z]+|[0-9]", text.lower()):
+        digest = hashlib.blake2b(piece.encode(), digest_size=8).digest()
+        slot = int.from_bytes(digest[:4], "little") % dimension
+        vector[slot] += 1.0 if digest[4] & 1 else -1.0
+    return vector
+
+
+def build_corpus(documents, seed=7):
+    """Return (chunks, queries): chunks are (vector_id, text, document_id); queries are (kind, text, vector_id)."""
+    rng = random.Random(seed)
+    names = [f"{a} {m} {b} {c}" for a in FIRST for m in MIDDLE for b in SECOND for c in SUFFIX]
+    if documents > len(names):
+        sys.exit(f"At most {len(names)} documents have distinct party names")
+    parties = rng.sample(names, documents)
+    chunks, queries = [], []
+    for d, party in enumerate(parties):
+        document_id = f"doc{d}"
+        for position, term in enumerate(rng.sample(list(CLAUSES), 7)):
+            section = f"{position + 1}.{rng.randint(1, 9)}({rng.choice('abcdef')})"
+            body = CLAUSES[term].format(
+                n=rng.randint(2, 90), role=rng.choice(ROLES), place=rng.choice(PLACES), use=rng.choice(USES)
+            )
+            vector_id = f"{document_id}_{position}"
+            chunks.append((vector_id, f"Section {section} of the agreement with {party}. {body}.", document_id))
+            queries.append(("section", f"Section {section} of the {party} agreement", vector_id))
+            queries.append(("defined term", f"{term} {party}", vector_id))
+    return chunks, queries
+
+
+def timed(fn, items):
+    results, latencies = [], []
+    for item in items:
+        started = time.perf_counter()
+        results.append(fn(item))
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return results, statistics.median(latencies) * 1000, latencies[int(0.95 * (len(latencies) - 1))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--candidates", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args()
+
+    chunks, queries = build_corpus(args.documents)
+    queries = random.Random(1).sample(queries, min(args.queries, len(queries)))
+    with tempfile.TemporaryDirectory() as directory:
+        lexical = LexicalIndex(os.path.join(directory, "lexical.sqlite3"))
+        vectors = LocalVectorStore(os.path.join(directory, "vectors"), 256)
+        started = time.perf_counter()
+        for start in range(0, len(chunks), args.batch_size):
+            lexical.upsert([
+                (vector_id, {"text": text, "document_id": document_id})
+                for vector_id, text, document_id in chunks[start:start + args.batch_size]
+            ])
+        index_seconds = time.perf_counter() - started
+        for start in range(0, len(chunks), 5000):
+            vectors.upsert([
+                (vector_id, subword_embedding(text).tolist(), {"text": text, "document_id": document_id})
+                for vector_id, text, document_id in chunks[start:start + 5000]
+            ])
+
+        stats = lexical.describe()
+        postings = sum(
+            len(decode_postings(data)[0])
+            for (data,) in lexical._conn().execute("SELECT data FROM postings")
+        )
+        print(
+            f"chunks={len(chunks)} bm25 index={len(chunks) / index_seconds:7.0f} chunks/s segments={stats['segments']} "
+            f"postings={postings} size={stats['postings_bytes'] / 1024:.0f} KB "
+            f"({postings * 8 / max(stats['postings_bytes'], 1):.1f}x smaller than raw pairs)"
+        )
+
+        texts = [text for _, text, _ in queries]
+        embedded = [subword_embedding(text).tolist() for text in texts]
+        bm25, bm25_p50, bm25_p95 = timed(lambda text: lexical.query(text, args.candidates), texts)
+        dense, dense_p50, dense_p95 = timed(lambda vector: vectors.query(vector, args.candidates), embedded)
+        started = time.perf_counter()
+        hybrid = [reciprocal_rank_fusion([d, b]) for d, b in zip(dense, bm25)]
+        fusion_ms = (time.perf_counter() - started) / len(queries) * 1000
+        text_of = {vector_id: text for vector_id, text, _ in chunks}
+        reranked = {}
+        for label, weight in (("rerank", 1.0), ("scorer", 0.0)):
+            reranker = Reranker(TermOverlapScorer(), retrieval_weight=weight)
+            started = time.perf_counter()
+            reranked[label] = [
+                reranker.rerank(text, [{**match, "text": text_of[match["id"]]} for match in matches], args.top_k)
+                for text, matches in zip(texts, hybrid)
+            ]
+            reranked[f"{label}_ms"] = (time.perf_counter() - started) / len(queries) * 1000
+
+        print(f"{'ranker':<8} {'p50 ms':>8} {'p95 ms':>8}  recall@{args.top_k} by query kind")
+        for label, ranked, p50, p95 in (
+            ("vector", dense, dense_p50, dense_p95),
+            ("bm25", bm25, bm25_p50, bm25_p95),
+            ("hybrid", hybrid, dense_p50 + bm25_p50 + fusion_ms, dense_p95 + bm25_p95 + fusion_ms),
+            # Mean re-ranking time added on top of the hybrid latencies
+            *(
+                (f"+{label}", reranked[label], dense_p50 + bm25_p50 + fusion_ms + reranked[f"{label}_ms"],
+                 dense_p95 + bm25_p95 + fusion_ms + reranked[f"{label}_ms"])
+                for label in ("rerank", "scorer")
+            ),
+        ):
+            recall = {}
+            for (kind, _, target), matches in zip(queries, ranked):
+                recall.setdefault(kind, []).append(target in [match["id"] for match in matches[:args.top_k]])
+            summary = "  ".join(f"{kind}={statistics.mean(hits):.3f}" for kind, hits in sorted(recall.items()))
+            print(f"{label:<8} {p50:8.2f} {p95:8.2f}  {summary}")
+
+
+if __name__ == "__main__":
+    main()
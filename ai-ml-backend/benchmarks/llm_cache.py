@@ -0,0 +1,133 @@
+"""LLM response cache benchmark against the offline fake model.
+
+Summarizes and extracts clauses from a set of synthetic documents through
+LLMService several times over, as repeated /documents/summary calls and
+re-analysis of unchanged documents do. The first pass is cold; later passes
+are answered from the cache. Each pass reports:
+
+- wall time and cache hit rate
+- model latency saved by the hits
+
+A last pass with a cache budget smaller than the responses shows LRU
+eviction at work, and a bypass pass shows the cost of forcing fresh
+responses. Finally, the same question is posted to /chat/analyze three
+times (cold, cached, then with bypass_cache) to check the cache end to end
+through the HTTP route:
+
+    python benchmarks/llm_cache.py --documents 50 --passes 3 --latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.metrics import metrics  # noqa: E402
+from app.services.llm import LLMService  # noqa: E402
+from app.services.llm_backends import FakeLLMBackend  # noqa: E402
+from app.services.llm_cache import LLMResponseCache  # noqa: E402
+from app.services.llm_gateway import LLMGateway  # noqa: E402
+
+
+async def run_pass(service, documents, bypass_cache=False):
+    await asyncio.gather(*(
+        call
+        for text in documents
+        for call in (
+            service.generate_summary(text, bypass_cache=bypass_cache),
+            service.extract_clauses(text, bypass_cache=bypass_cache)
+        )
+    ))
+
+
+async def measure(label, service, documents, bypass_cache=False):
+    before = metrics.snapshot()
+    started = time.perf_counter()
+    await run_pass(service, documents, bypass_cache)
+    elapsed = time.perf_counter() - started
+    after = metrics.snapshot()
+
+    def delta(name):
+        return after["counters"].get(name, 0) - before["counters"].get(name, 0)
+
+    def saved():
+        timing, earlier = after["timings"].get("llm_cache.saved_latency"), before["timings"].get("llm_cache.saved_latency")
+        total = timing["mean"] * timing["count"] if timing else 0
+        return total - (earlier["mean"] * earlier["count"] if earlier else 0)
+
+    hits, misses = delta("llm_cache.hits"), delta("llm_cache.misses")
+    lookups = hits + misses
+    print(
+        f"{label:<24} {elapsed:6.2f}s  hit rate {hits / lookups if lookups else 0:6.1%}  "
+        f"saved {saved():7.1f}s of model time  evictions {int(delta('llm_cache.evictions'))}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--passes", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds to the first token")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens per simulated response")
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    documents = [f"LEASE AGREEMENT {i}\n" + f"1.{i} The tenant shall pay rent monthly. " * 200 for i in range(args.documents)]
+    backend = FakeLLMBackend(response_tokens=args.tokens, first_token_latency=args.latency, per_token_latency=0.001)
+    print(f"{args.documents} documents x 2 prompts, {args.latency * 1000:.0f} ms to first token, {args.concurrency} in flight")
+
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, backend, documents, directory))
+        print(f"model calls: {backend.requests}")
+        check_route(directory)
+
+
+async def run(args, backend, documents, directory):
+    cache = LLMResponseCache(os.path.join(directory, "llm_cache.sqlite3"), max_bytes=64 * 1024 * 1024)
+    service = LLMService(LLMGateway(backend, max_concurrency=args.concurrency, cache=cache))
+    for i in range(args.passes):
+        await measure("cold" if i == 0 else f"warm pass {i}", service, documents)
+    await measure("bypass", service, documents, bypass_cache=True)
+
+    # Room for about a quarter of the responses: each pass evicts entries the next one needs
+    small = LLMResponseCache(os.path.join(directory, "small.sqlite3"), max_bytes=args.documents * args.tokens * 3)
+    service = LLMService(LLMGateway(backend, max_concurrency=args.concurrency, cache=small))
+    for i in range(2):
+        await measure(f"small budget pass {i + 1}", service, documents)
+
+
+def check_route(directory):
+    # Imported here: the routers build their services from these settings on import
+    from app.core.config import settings
+    settings.LLM_BACKEND = "fake"
+    settings.EMBEDDING_BACKEND = "fake"
+    settings.VECTOR_STORE = "fake"
+    for name in ("CHUNK_STORE_PATH", "JOB_DB_PATH", "LEXICAL_INDEX_PATH", "EMBEDDING_CACHE_PATH", "LLM_CACHE_PATH", "SUMMARY_STORE_PATH", "PDF_ROUTE_CACHE_PATH"):
+        setattr(settings, name, os.path.join(directory, f"route_{name.lower()}.sqlite3"))
+    settings.QUERY_CACHE_PATH = os.path.join(directory, "route_query_cache")
+    settings.VECTOR_STORE_PATH = os.path.join(directory, "route_vectors")
+    settings.UPLOAD_DIR = os.path.join(directory, "uploads")
+
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core.security import verify_token
+    from app.routers import chat
+    from app.services.llm_gateway import get_llm_gateway
+
+    app = FastAPI()
+    app.include_router(chat.router, prefix="/chat")
+    app.dependency_overrides[verify_token] = lambda: {"sub": "reviewer"}
+    client = TestClient(app)
+    backend = get_llm_gateway().backend
+    body = {"document_content": "The tenant shall give 30 days written notice.", "question": "What is the notice period?"}
+    print("/chat/analyze:")
+    for label, bypass_cache in (("cold", False), ("cached", False), ("bypass", True)):
+        before = backend.requests
+        response = client.post("/chat/analyze", json={**body, "bypass_cache": bypass_cache})
+        print(f"  {label:<8} HTTP {response.status_code}  model calls {backend.requests - before}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""LLM gateway load test against the offline fake model.
+
+Sends a burst of concurrent prompts, as many simultaneous /documents/query
+and /chat requests would, first the old way (a blocking generate_content
+call inside the request coroutine, which stalls the event loop for the
+whole response), then through LLMGateway at several concurrency limits.
+A share of the prompts repeats an earlier one, to show coalescing of
+identical in-flight prompts, and a last run fails a share of model calls
+to show the cost of retries. For each run it prints:
+
+- prompts/second and p50/p95 latency
+- the worst event loop stall, measured by a 10 ms ticker
+- model calls made and prompts coalesced
+
+    python benchmarks/llm_gateway.py --prompts 200 --latency 0.5 --duplicates 0.3
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.metrics import metrics  # noqa: E402
+from app.services.llm_backends import FakeLLMBackend  # noqa: E402
+from app.services.llm_gateway import LLMGateway  # noqa: E402
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def ticker(stalls, interval=0.01):
+    """Record how late each 10 ms tick fires; a late tick means the loop was blocked."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        stalls.append(time.perf_counter() - started - interval)
+
+
+async def load(call, prompts):
+    """Run every prompt concurrently; return per-prompt latencies, total seconds and the worst loop stall."""
+    stalls = []
+    tick = asyncio.create_task(ticker(stalls))
+    await asyncio.sleep(0)
+    latencies = []
+    started = time.perf_counter()
+
+    async def one(prompt):
+        # Every prompt arrives at the start of the burst, so queueing counts toward its latency
+        await call(prompt)
+        latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(one(prompt) for prompt in prompts))
+    elapsed = time.perf_counter() - started
+    # Let the ticker wake once more, so a stall at the very end is recorded too
+    await asyncio.sleep(0.02)
+    tick.cancel()
+    return latencies, elapsed, max(stalls, default=0.0)
+
+
+def report(label, prompts, latencies, elapsed, stall, calls, coalesced=0):
+    print(
+        f"{label:<26} {len(prompts) / elapsed:7.1f} prompts/s  "
+        f"p50 {percentile(latencies, 50):6.2f}s  p95 {percentile(latencies, 95):6.2f}s  "
+        f"loop stall {stall * 1000:7.0f} ms  model calls {calls:4d}  coalesced {coalesced}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds to the first token")
+    parser.add_argument("--tokens", type=int, default=50, help="Tokens per simulated response")
+    parser.add_argument("--per-token-latency", type=float, default=0.005)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Share of prompts that repeat an earlier one")
+    parser.add_argument("--concurrency", default="4,16,64")
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--blocking-prompts", type=int, default=20, help="Prompts for the blocking run, which is serial")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    prompts = []
+    for i in range(args.prompts):
+        if prompts and rng.random() < args.duplicates:
+            prompts.append(rng.choice(prompts))
+        else:
+            prompts.append(f"Question {i}: what is the notice period for termination in lease {i}?")
+
+    def fake(failure_rate=0.0):
+        return FakeLLMBackend(
+            response_tokens=args.tokens,
+            first_token_latency=args.latency,
+            per_token_latency=args.per_token_latency,
+            failure_rate=failure_rate,
+            seed=1
+        )
+
+    print(f"{args.prompts} prompts ({args.duplicates:.0%} repeats), {args.latency * 1000:.0f} ms to first token, {args.tokens} tokens")
+
+    # The old services called the synchronous SDK from async handlers: each call holds the loop
+    backend = fake()
+    blocking_prompts = prompts[:args.blocking_prompts]
+
+    async def blocking(prompt):
+        backend.requests += 1
+        time.sleep(backend.first_token_latency + backend.per_token_latency * backend.response_tokens)
+
+    report("blocking (old)", blocking_prompts, *asyncio.run(load(blocking, blocking_prompts)), backend.requests)
+
+    def run(label, limit, failure_rate=0.0):
+        backend = fake(failure_rate)
+        gateway = LLMGateway(backend, max_concurrency=limit, timeout=30.0, max_retries=5, base_backoff=0.1)
+        before = metrics.snapshot()["counters"]
+        result = asyncio.run(load(lambda prompt: gateway.generate(prompt, "bench"), prompts))
+        after = metrics.snapshot()["counters"]
+        coalesced = int(after.get("bench.coalesced", 0) - before.get("bench.coalesced", 0))
+        report(label, prompts, *result, backend.requests, coalesced)
+        return int(after.get("bench.retries", 0) - before.get("bench.retries", 0))
+
+    limits = [int(n) for n in args.concurrency.split(",")]
+    for limit in limits:
+        run(f"gateway x{limit}", limit)
+    if args.failure_rate:
+        retries = run(f"gateway x{limits[-1]}, {args.failure_rate:.0%} fail", limits[-1], args.failure_rate)
+        print(f"  {retries} retries")
+    print(f"{len(set(prompts))} distinct prompts")
+
+
+if __name__ == "__main__":
+    main()
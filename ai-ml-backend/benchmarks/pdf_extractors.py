@@ -0,0 +1,62 @@
+"""PDF extractor routing report.
+
+Runs every page of a corpus of PDFs through each extractor, and through the
+automatic routing, and prints pages/second and the route distribution so the
+PDF_* routing thresholds can be tuned on real documents:
+
+    python benchmarks/pdf_extractors.py path/to/pdfs
+"""
+import argparse
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+from app.services.pdf_extraction import PDFPLUMBER, PYMUPDF, extract_pdf_pages  # noqa: E402
+
+
+def run(paths, forced_route=None):
+    """Extract every page; return (pages, seconds, per-route seconds, route counts)."""
+    pages = 0
+    route_seconds = defaultdict(float)
+    route_counts = Counter()
+    started = time.perf_counter()
+    for path in paths:
+        with fitz.open(path) as doc:
+            page_count = doc.page_count
+        routes = {n: forced_route for n in range(1, page_count + 1)} if forced_route else None
+        for _, _, route, seconds in extract_pdf_pages(path, 0, page_count, routes):
+            pages += 1
+            route_seconds[route] += seconds
+            route_counts[route] += 1
+    return pages, time.perf_counter() - started, route_seconds, route_counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Directory of PDF files (searched recursively)")
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(root, name)
+        for root, _, names in os.walk(args.corpus)
+        for name in names
+        if name.lower().endswith(".pdf")
+    )
+    if not paths:
+        sys.exit(f"No PDFs found under {args.corpus}")
+    print(f"{len(paths)} PDFs")
+
+    for label, route in (("all pymupdf", PYMUPDF), ("all pdfplumber", PDFPLUMBER), ("auto routing", None)):
+        pages, elapsed, route_seconds, route_counts = run(paths, route)
+        print(f"{label:<16} pages={pages:>6} time={elapsed:8.2f}s ({pages / elapsed:7.1f} pages/s)")
+        if route is None:
+            for name, count in route_counts.most_common():
+                print(f"  {name:<12} pages={count:>6} mean={route_seconds[name] / count * 1000:7.2f} ms/page")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Quantized vector storage benchmark: bytes per chunk, recall@k and latency.
+
+Fills a LocalVectorStore with clustered synthetic embeddings once per
+quantization mode (none, int8, pq) and reports the bytes a search scans per
+vector, the index size on disk, and recall@k and latency of held-out queries
+against exact float32 search. Chunk text is measured separately: the bytes
+it would add to every vector's metadata, against its compressed size in the
+chunk store, using generated contract clauses:
+
+    python benchmarks/quantization.py --vectors 100000 --dimension 768
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from app.services.chunk_store import ChunkStore, chunk_fingerprint  # noqa: E402
+from app.services.vector_stores import LocalVectorStore  # noqa: E402
+
+CLAUSES = [
+    "The {role} shall indemnify and hold harmless the other party against all losses, damages, liabilities, costs and expenses arising from any breach of its obligations under this Agreement",
+    "Either party may terminate this Agreement by giving not less than {n} days written notice to the other party, without prejudice to any rights accrued before the date of termination",
+    "Each party shall keep the Confidential Information of the other party confidential and shall not disclose it to any third party for a period of {n} years after the end of the Term",
+    "Neither party shall be liable for any delay or failure to perform its obligations under this Agreement to the extent caused by a force majeure event, provided that it notifies the other party within {n} days",
+    "This Agreement shall be governed by and construed in accordance with the laws of India, and any dispute shall be referred to arbitration under the Arbitration and Conciliation Act, 1996",
+    "The {role} shall pay the fees set out in Schedule {n} within thirty (30) days of the date of each invoice, failing which interest shall accrue at {n} percent per annum",
+    "The {role} shall not assign, transfer or subcontract any of its rights or obligations under this Agreement without the prior written consent of the other party",
+]
+ROLES = ["Tenant", "Landlord", "Supplier", "Licensee", "Contractor", "Company"]
+
+
+def clustered(rng, centers, count):
+    """Vectors scattered around random cluster centers, like topic-clustered chunks."""
+    labels = rng.integers(0, len(centers), size=count)
+    return (centers[labels] + rng.normal(scale=0.6, size=(count, centers.shape[1]))).astype(np.float32)
+
+
+def chunk_texts(count, seed=3):
+    """Chunks of three to six clauses each, with a section heading."""
+    rng = random.Random(seed)
+    return [
+        f"Section {i % 40 + 1}.{rng.randint(1, 9)}\n" + ". ".join(
+            rng.choice(CLAUSES).format(role=rng.choice(ROLES), n=rng.randint(2, 90)) for _ in range(rng.randint(3, 6))
+        ) + "."
+        for i in range(count)
+    ]
+
+
+def directory_bytes(path, prefix):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.startswith(prefix))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--modes", default="none,int8,pq")
+    parser.add_argument("--pq-subvectors", type=int, default=0)
+    parser.add_argument("--rescore", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--chunks", type=int, default=5000, help="Chunk texts generated for the text size figures")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(max(16, args.vectors // 500), args.dimension))
+    vectors = clustered(rng, centers, args.vectors)
+    queries = clustered(rng, centers, args.queries)
+
+    with tempfile.TemporaryDirectory() as directory:
+        texts = chunk_texts(args.chunks)
+        store = ChunkStore(os.path.join(directory, "chunks.sqlite3"))
+        store.put_texts({chunk_fingerprint(text): text for text in texts})
+        stored = store._conn().execute("SELECT SUM(LENGTH(text)) FROM chunk_texts").fetchone()[0]
+        raw = sum(len(text.encode("utf-8")) for text in texts)
+        metadata = {"document_id": "contract", "chunk_index": 0, "section": "12.4", "page_start": 3, "page_end": 3}
+        print(
+            f"chunk text: {raw / len(texts):.0f} B/chunk in vector metadata, "
+            f"{stored / len(texts):.0f} B/chunk compressed in the chunk store ({raw / stored:.1f}x); "
+            f"metadata without text {len(json.dumps({**metadata, 'fingerprint': 'f' * 64})):.0f} B/chunk"
+        )
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        exact = [
+            {f"chunk{i}" for i in np.argpartition(-(normalized @ query), args.top_k)[:args.top_k]}
+            for query in queries
+        ]
+        print(f"{args.vectors} vectors x {args.dimension}, recall@{args.top_k} against exact float32 search")
+        print(f"{'mode':<6} {'scan B/vec':>10} {'disk B/vec':>10} {'recall':>7} {'p50 ms':>7} {'p95 ms':>7}")
+        for mode in args.modes.split(","):
+            path = os.path.join(directory, mode)
+            index = LocalVectorStore(path, args.dimension, quantization=mode, pq_subvectors=args.pq_subvectors, rescore=args.rescore)
+            for start in range(0, args.vectors, args.batch_size):
+                index.upsert([
+                    (f"chunk{start + i}", vectors[start + i].tolist(), {"document_id": "contract"})
+                    for i in range(min(args.batch_size, args.vectors - start))
+                ])
+            latencies, results = [], []
+            for query in queries:
+                started = time.perf_counter()
+                results.append({match["id"] for match in index.query(query.tolist(), args.top_k)})
+                latencies.append(time.perf_counter() - started)
+            latencies.sort()
+            stats = index.describe()
+            recall = statistics.mean(len(found & truth) / args.top_k for found, truth in zip(results, exact))
+            disk = directory_bytes(path, "vectors") + directory_bytes(path, "codes")
+            print(
+                f"{mode:<6} {stats['scan_bytes_per_vector']:>10} {disk / args.vectors:>10.0f} {recall:>7.3f} "
+                f"{statistics.median(latencies) * 1000:>7.2f} {latencies[int(0.95 * (len(latencies) - 1))] * 1000:>7.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
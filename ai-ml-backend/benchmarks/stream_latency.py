@@ -0,0 +1,104 @@
+"""Compare time to first token of streamed and buffered /documents/query answers.
+
+Run against a live server with some documents already ingested:
+
+    uvicorn app.main:app --port 8000
+    python benchmarks/stream_latency.py --token <jwt> --query "What is the notice period for termination?"
+
+Each round sends the question once with ``stream=true`` and once without.
+For the stream it records the time to the `sources` event, to the first
+`token` event and to `done`. For the buffered request the first byte is
+the whole answer. Percentiles of both are printed, along with the server's
+own time-to-first-token timing from /health/metrics.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import List
+
+import httpx
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def report(label: str, samples: List[float]):
+    if not samples:
+        print(f"{label}: no samples")
+        return
+    print(
+        f"{label}: n={len(samples)} "
+        f"p50={percentile(samples, 50) * 1000:.0f}ms "
+        f"p95={percentile(samples, 95) * 1000:.0f}ms "
+        f"mean={statistics.mean(samples) * 1000:.0f}ms"
+    )
+
+
+async def streamed(client: httpx.AsyncClient, params: dict, headers: dict):
+    """Return (seconds to sources, seconds to first token, seconds to done)."""
+    started = time.perf_counter()
+    sources = first = None
+    async with client.stream("POST", "/documents/query", params={**params, "stream": "true"}, headers=headers) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                elapsed = time.perf_counter() - started
+                if event == "sources" and sources is None:
+                    sources = elapsed
+                elif event == "token" and first is None:
+                    first = elapsed
+                elif event == "error":
+                    raise RuntimeError(json.loads(line[len("data: "):])["detail"])
+    return sources, first, time.perf_counter() - started
+
+
+async def buffered(client: httpx.AsyncClient, params: dict, headers: dict) -> float:
+    started = time.perf_counter()
+    response = await client.post("/documents/query", params=params, headers=headers)
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def run(args):
+    headers = {"Authorization": f"Bearer {args.token}"}
+    params = {"query": args.query, "top_k": args.top_k}
+    to_sources, to_first_token, to_done, whole = [], [], [], []
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        for _ in range(args.rounds):
+            sources, first, done = await streamed(client, params, headers)
+            to_sources.append(sources)
+            if first is not None:
+                to_first_token.append(first)
+            to_done.append(done)
+            whole.append(await buffered(client, params, headers))
+        server = (await client.get("/health/metrics")).json()["timings"].get("llm.answer.time_to_first_token")
+
+    report("stream: sources     ", to_sources)
+    report("stream: first token ", to_first_token)
+    report("stream: done        ", to_done)
+    report("buffered: response  ", whole)
+    if server:
+        print(f"server llm.answer.time_to_first_token: p50={server['p50'] * 1000:.0f}ms p95={server['p95'] * 1000:.0f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--token", required=True, help="Bearer token for /documents/query")
+    parser.add_argument("--query", required=True)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
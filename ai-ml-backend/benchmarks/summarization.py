@@ -0,0 +1,100 @@
+"""Hierarchical summarization benchmark against the offline fake model.
+
+Chunks a synthetic contract (the generator from chunking.py) into a chunk
+store and summarizes it with HierarchicalSummarizer. Runs:
+
+- cold: every node generated
+- unchanged: every node reused from the summary store
+- edited: a few chunks changed or inserted in the middle, so only the
+  nodes on their branches are generated again
+- refresh: every node generated again
+
+Each run reports wall time, tree depth and nodes generated vs. reused. The
+token count of the single whole-document prompt used before is printed for
+comparison:
+
+    python benchmarks/summarization.py --megabytes 1 --latency 0.5 --edits 3
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import make_corpus, sentence  # noqa: E402
+from app.services.chunk_store import ChunkStore, chunk_fingerprint  # noqa: E402
+from app.services.chunker import LegalChunker  # noqa: E402
+from app.services.llm_backends import FakeLLMBackend  # noqa: E402
+from app.services.llm_gateway import LLMGateway  # noqa: E402
+from app.services.summarizer import HierarchicalSummarizer  # noqa: E402
+from app.services.summary_store import SummaryStore  # noqa: E402
+from app.services.tokenizer import Tokenizer  # noqa: E402
+
+
+def store_chunks(chunk_store, texts):
+    fingerprints = [chunk_fingerprint(text) for text in texts]
+    chunk_store.put_texts(dict(zip(fingerprints, texts)))
+    chunk_store.replace_manifest("contract", [
+        {"chunk_index": i, "vector_id": f"contract_{i}", "fingerprint": fingerprint, "metadata": {}}
+        for i, fingerprint in enumerate(fingerprints)
+    ])
+
+
+async def run(args, directory):
+    texts = [chunk["text"] for chunk in LegalChunker(200, 30).chunk_text(make_corpus(args.megabytes))]
+    chunk_store = ChunkStore(os.path.join(directory, "chunks.sqlite3"))
+    store_chunks(chunk_store, texts)
+    tokenizer = Tokenizer()
+    backend = FakeLLMBackend(response_tokens=args.summary_tokens, first_token_latency=args.latency, per_token_latency=0.001)
+    summarizer = HierarchicalSummarizer(
+        LLMGateway(backend, max_concurrency=args.concurrency),
+        chunk_store,
+        SummaryStore(os.path.join(directory, "summaries.sqlite3")),
+        tokenizer,
+        group_tokens=args.group_tokens,
+        max_concurrency=args.concurrency
+    )
+    whole = tokenizer.count("\n\n".join(texts))
+    print(f"{args.megabytes} MB contract, {len(texts)} chunks; the single-prompt summary would send {whole} tokens ({tokenizer.name} count)")
+
+    async def measure(label, refresh=False):
+        started = time.perf_counter()
+        result = await summarizer.summarize("contract", refresh=refresh)
+        print(
+            f"  {label:<10} {time.perf_counter() - started:6.2f}s  depth {result['depth']}  "
+            f"nodes {result['nodes']:4d}  generated {result['generated']:4d}  reused {result['reused']:4d}"
+        )
+
+    await measure("cold")
+    await measure("unchanged")
+    rng = random.Random(1)
+    for _ in range(args.edits):
+        position = rng.randrange(len(texts))
+        if rng.random() < 0.5:
+            texts[position] = texts[position] + " " + sentence(rng)
+        else:
+            texts.insert(position, " ".join(sentence(rng) for _ in range(8)))
+    store_chunks(chunk_store, texts)
+    await measure(f"{args.edits} edits")
+    await measure("refresh", refresh=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=1.0)
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds to the first token")
+    parser.add_argument("--summary-tokens", type=int, default=150, help="Tokens per simulated summary")
+    parser.add_argument("--group-tokens", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--edits", type=int, default=3)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        asyncio.run(run(args, directory))
+
+
+if __name__ == "__main__":
+    main()
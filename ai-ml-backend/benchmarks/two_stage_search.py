@@ -0,0 +1,101 @@
+"""Two-stage (coarse-to-fine) search benchmark: latency and recall as the document count grows.
+
+Builds one user's corpus of synthetic documents in a LocalVectorStore.
+Documents share a handful of topics (leases, NDAs, loan agreements, ...),
+each has its own direction on top of its topic, and every chunk adds noise
+to its document's direction, so chunks cluster by document more loosely than
+by topic. Document centroids go in the document namespace, as ingestion
+stores them. Each query is a noisy copy of one chunk. For every document
+count it reports flat search and two-stage search at several
+TWO_STAGE_DOCUMENTS values:
+
+- p50 latency
+- recall@k against flat search
+- how often the queried chunk is in the top k
+
+    python benchmarks/two_stage_search.py --documents 100,1000,5000 --chunks-per-document 50
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from app.services.vector_stores import LocalVectorStore  # noqa: E402
+
+NAMESPACE = "reviewer"
+DOCUMENT_NAMESPACE = "reviewer#documents"  # EmbeddingsService.document_namespace("reviewer")
+
+
+def normalized(matrix):
+    return matrix / np.linalg.norm(matrix, axis=-1, keepdims=True)
+
+
+def two_stage(store, query, top_k, documents):
+    picked = [match["id"] for match in store.query(query, documents, namespace=DOCUMENT_NAMESPACE)]
+    return store.query(query, top_k, {"document_id": {"$in": picked}}, namespace=NAMESPACE)
+
+
+def run(count, args):
+    rng = np.random.default_rng(count)
+    topics = normalized(rng.normal(size=(args.topics, args.dimension)))
+    directions = normalized(topics[rng.integers(0, args.topics, size=count)] + 0.8 * normalized(rng.normal(size=(count, args.dimension))))
+    with tempfile.TemporaryDirectory() as directory:
+        store = LocalVectorStore(directory, args.dimension)
+        chunk_vectors = []
+        for d in range(count):
+            chunks = normalized(directions[d] + args.noise * normalized(rng.normal(size=(args.chunks_per_document, args.dimension))))
+            chunk_vectors.append(chunks)
+            store.upsert([
+                (f"doc{d}_{i}", chunks[i].tolist(), {"document_id": f"doc{d}"}) for i in range(len(chunks))
+            ], namespace=NAMESPACE)
+            store.upsert([(f"doc{d}", normalized(chunks.sum(axis=0)).tolist(), {"document_id": f"doc{d}"})], namespace=DOCUMENT_NAMESPACE)
+
+        targets = [(int(rng.integers(0, count)), int(rng.integers(0, args.chunks_per_document))) for _ in range(args.queries)]
+        queries = [
+            normalized(chunk_vectors[d][i] + args.query_noise * normalized(rng.normal(size=args.dimension))).tolist()
+            for d, i in targets
+        ]
+
+        def measure(search):
+            latencies, results = [], []
+            for query in queries:
+                started = time.perf_counter()
+                results.append([match["id"] for match in search(query)])
+                latencies.append(time.perf_counter() - started)
+            return results, statistics.median(latencies) * 1000
+
+        flat, flat_ms = measure(lambda query: store.query(query, args.top_k, namespace=NAMESPACE))
+        rows = [("flat", flat, flat_ms)]
+        for documents in (int(n) for n in args.first_stage.split(",")):
+            rows.append((f"two-stage top {documents}", *measure(lambda query: two_stage(store, query, args.top_k, documents))))
+
+        print(f"{count} documents, {count * args.chunks_per_document} chunks")
+        for label, results, p50 in rows:
+            recall = statistics.mean(len(set(found) & set(truth)) / args.top_k for found, truth in zip(results, flat))
+            hits = statistics.mean(f"doc{d}_{i}" in found for found, (d, i) in zip(results, targets))
+            print(f"  {label:<18} p50 {p50:7.2f} ms  recall@{args.top_k} vs flat {recall:.3f}  target hit {hits:.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", default="100,1000,5000")
+    parser.add_argument("--chunks-per-document", type=int, default=50)
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--topics", type=int, default=8)
+    parser.add_argument("--noise", type=float, default=1.5, help="Chunk spread around its document's direction")
+    parser.add_argument("--query-noise", type=float, default=1.0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--first-stage", default="1,3,10")
+    args = parser.parse_args()
+    for count in (int(n) for n in args.documents.split(",")):
+        run(count, args)
+
+
+if __name__ == "__main__":
+    main()
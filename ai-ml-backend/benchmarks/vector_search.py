@@ -0,0 +1,94 @@
+"""Local vector index benchmark: IVF recall and latency against exact search.
+
+Fills a LocalVectorStore with clustered synthetic embeddings at each size,
+then for a set of held-out queries reports exact (flat) latency, IVF
+latency and recall@k at several probe counts, and the latency of queries
+confined to a small user's namespace (200 vectors) in the shared index:
+
+    python benchmarks/vector_search.py --sizes 10000,100000,1000000 --dimension 768
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from app.services.vector_stores import LocalVectorStore  # noqa: E402
+
+
+def clustered(rng, centers, count):
+    """Vectors scattered around random cluster centers, like topic-clustered chunks."""
+    labels = rng.integers(0, len(centers), size=count)
+    return (centers[labels] + rng.normal(scale=0.6, size=(count, centers.shape[1]))).astype(np.float32)
+
+
+def timed_queries(store, queries, top_k, namespace=None):
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append([match["id"] for match in store.query(query, top_k, namespace=namespace)])
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return results, statistics.median(latencies) * 1000, latencies[int(0.95 * (len(latencies) - 1))] * 1000
+
+
+def run(size, args):
+    rng = np.random.default_rng(size)
+    centers = rng.normal(size=(max(16, size // 500), args.dimension))
+    with tempfile.TemporaryDirectory() as directory:
+        exact = LocalVectorStore(directory, args.dimension, dtype=args.dtype)
+        started = time.perf_counter()
+        for start in range(0, size, args.batch_size):
+            count = min(args.batch_size, size - start)
+            vectors = clustered(rng, centers, count)
+            exact.upsert([
+                (f"doc{(start + i) // 100}_{start + i}", vectors[i].tolist(), {"document_id": f"doc{(start + i) // 100}"})
+                for i in range(count)
+            ])
+        insert_seconds = time.perf_counter() - started
+        small = clustered(rng, centers, 200)
+        exact.upsert([(f"small_{i}", small[i].tolist(), {"document_id": "small"}) for i in range(200)], namespace="small-user")
+
+        ivf = LocalVectorStore(directory, args.dimension, dtype=args.dtype, index_type="ivf")
+        started = time.perf_counter()
+        ivf.build_ivf()
+        build_seconds = time.perf_counter() - started
+
+        queries = [vector.tolist() for vector in clustered(rng, centers, args.queries)]
+        truth, p50, p95 = timed_queries(exact, queries, args.top_k)
+        print(
+            f"n={size:>8} insert={size / insert_seconds:8.0f} vec/s ivf_build={build_seconds:6.1f}s "
+            f"lists={ivf.describe()['ivf_lists']}"
+        )
+        print(f"  exact          p50={p50:8.2f} ms p95={p95:8.2f} ms recall@{args.top_k}=1.000")
+        for nprobe in args.nprobe:
+            ivf.nprobe = nprobe
+            found, p50, p95 = timed_queries(ivf, queries, args.top_k)
+            recall = statistics.mean(len(set(a) & set(b)) / len(a) for a, b in zip(truth, found))
+            print(f"  ivf nprobe={nprobe:<3} p50={p50:8.2f} ms p95={p95:8.2f} ms recall@{args.top_k}={recall:.3f}")
+        _, p50, p95 = timed_queries(ivf, queries, args.top_k, namespace="small-user")
+        print(f"  small user     p50={p50:8.2f} ms p95={p95:8.2f} ms (namespace of 200 vectors)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000")
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", default="4,8,16,32")
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+    args.nprobe = [int(n) for n in args.nprobe.split(",")]
+
+    for size in (int(n) for n in args.sizes.split(",")):
+        run(size, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Vector upsert throughput benchmark against the offline fake vector store.
+
+Upserts a document's vectors into a FakeVectorStore, which simulates the
+round trip of a hosted index, first the old way (batches of 100 sent one
+after another), then through AsyncVectorClient at several pool sizes, then
+with a share of requests failing transiently to show the cost of retries.
+Deleting the same vectors by ID is timed as well:
+
+    python benchmarks/vector_upsert.py --vectors 20000 --latency 0.03
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+from app.services.vector_client import AsyncVectorClient  # noqa: E402
+from app.services.vector_stores import FakeVectorStore  # noqa: E402
+
+
+async def sequential(store, vectors, batch_size):
+    for i in range(0, len(vectors), batch_size):
+        await asyncio.to_thread(store.upsert, vectors[i:i + batch_size], "reviewer")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20_000)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--pools", default="1,4,8,16")
+    parser.add_argument("--latency", type=float, default=0.03, help="Simulated seconds per request")
+    parser.add_argument("--per-vector-latency", type=float, default=0.00005)
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    values = rng.normal(size=(args.vectors, args.dimension)).astype(np.float32)
+    vectors = [(f"contract_{i}", values[i].tolist(), {"document_id": "contract"}) for i in range(args.vectors)]
+    ids = [vector_id for vector_id, _, _ in vectors]
+
+    def fake(failure_rate=0.0):
+        return FakeVectorStore(args.dimension, args.latency, args.per_vector_latency, failure_rate=failure_rate, seed=1)
+
+    print(f"{args.vectors} vectors x {args.dimension}, {args.latency * 1000:.0f} ms per request, batches of {args.batch_size}")
+    store = fake()
+    started = time.perf_counter()
+    asyncio.run(sequential(store, vectors, args.batch_size))
+    elapsed = time.perf_counter() - started
+    print(f"{'sequential':<22} {elapsed:7.2f}s {args.vectors / elapsed:9.0f} vectors/s")
+
+    for pool_size in (int(n) for n in args.pools.split(",")):
+        store = fake()
+        client = AsyncVectorClient(store, pool_size=pool_size, batch_size=args.batch_size)
+        started = time.perf_counter()
+        asyncio.run(client.upsert(vectors, "reviewer"))
+        elapsed = time.perf_counter() - started
+        print(f"{f'pool of {pool_size}':<22} {elapsed:7.2f}s {args.vectors / elapsed:9.0f} vectors/s")
+
+    pool_size = max(int(n) for n in args.pools.split(","))
+    store = fake(args.failure_rate)
+    client = AsyncVectorClient(store, pool_size=pool_size, batch_size=args.batch_size, max_retries=10, base_backoff=0.05)
+    started = time.perf_counter()
+    asyncio.run(client.upsert(vectors, "reviewer"))
+    elapsed = time.perf_counter() - started
+    failures, store.failure_rate = store.failures, 0.0
+    stored = store.describe()["vectors"]
+    print(
+        f"{f'pool of {pool_size}, {args.failure_rate:.0%} fail':<22} {elapsed:7.2f}s {args.vectors / elapsed:9.0f} vectors/s "
+        f"({failures} requests retried, {stored} of {args.vectors} stored)"
+    )
+
+    started = time.perf_counter()
+    asyncio.run(client.delete(ids, "reviewer"))
+    elapsed = time.perf_counter() - started
+    print(f"{'delete by id':<22} {elapsed:7.2f}s {args.vectors / elapsed:9.0f} vectors/s ({store.describe()['vectors']} left)")
+
+
+if __name__ == "__main__":
+    main()